@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+APM metrics for the Observability Data Generator
+Aggregates emitted transactions and spans into 1-minute transaction, service_transaction and service_destination metric documents
+"""
+
+import random
+
+INTERVAL_US = 60 * 1000000
+# A bucket closes once events are this far past its end, so a trace's late spans still land in it
+GRACE_US = 10 * 1000000
+INDICES = {
+    'transaction': 'metrics-apm.transaction.1m-default',
+    'service_transaction': 'metrics-apm.service_transaction.1m-default',
+    'service_destination': 'metrics-apm.service_destination.1m-default'
+}
+METRIC_PROCESSOR = {'event': 'metric', 'name': 'metric'}
+METRIC_AGENT = {'name': 'python'}
+
+
+def apm_metrics_options(value):
+    """Aggregator options from an apm_metrics option (True or {"sample_rate": 0.1}); raises ValueError"""
+    if not value:
+        return None
+    if value is True:
+        value = {}
+    if not isinstance(value, dict):
+        raise ValueError('apm_metrics must be true or an object of options')
+    unknown = set(value) - {'sample_rate'}
+    if unknown:
+        raise ValueError(f'Unknown apm_metrics options: {", ".join(sorted(unknown))}')
+    sample_rate = value.get('sample_rate', 1.0)
+    if not isinstance(sample_rate, (int, float)) or isinstance(sample_rate, bool) or not 0 <= sample_rate <= 1:
+        raise ValueError('apm_metrics.sample_rate must be between 0 and 1')
+    return {'sample_rate': float(sample_rate)}
+
+
+def histogram_value(us):
+    """Duration rounded down to two significant digits, the resolution of APM Server's latency histograms"""
+    if us < 100:
+        return us
+    scale = 10 ** (len(str(us)) - 2)
+    return us - us % scale
+
+
+class LatencyHistogram:
+    """Counts of durations per two-digit value, plus their exact sum and count"""
+
+    __slots__ = ('counts', 'sum_us', 'count')
+
+    def __init__(self):
+        self.counts = {}
+        self.sum_us = 0
+        self.count = 0
+
+    def add(self, duration_us):
+        value = histogram_value(duration_us)
+        self.counts[value] = self.counts.get(value, 0) + 1
+        self.sum_us += duration_us
+        self.count += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for value, count in other.counts.items():
+            counts[value] = counts.get(value, 0) + count
+        self.sum_us += other.sum_us
+        self.count += other.count
+
+    def document(self):
+        """{histogram, summary} as stored in transaction.duration"""
+        values = sorted(self.counts)
+        return {
+            'histogram': {'values': values, 'counts': [self.counts[value] for value in values]},
+            'summary': {'sum': self.sum_us, 'value_count': self.count}
+        }
+
+
+class ApmMetricsAggregator:
+    """Pre-aggregates what a generator emits the way APM Server does, one bucket per minute of event time
+
+    Every transaction goes into a latency histogram per service, transaction
+    name and outcome (transaction metricset); these are merged per service
+    at close (service_transaction, with success counts). Every exit span
+    adds to the response time of its caller -> dependency edge
+    (service_destination). A bucket is written to the sink once events are GRACE_US past its end, and
+    whatever is open is written by close(). With a sample_rate below 1 only
+    that share of traces is indexed as documents, while the metrics still
+    count every trace.
+    """
+
+    def __init__(self, generator, sample_rate=1.0):
+        self.generator = generator
+        self.sink = generator.sink
+        self.sample_rate = sample_rate
+        # Own stream so sampling leaves the generator's draws alone; only created when sampling
+        self._random = random.Random(generator.rng.getrandbits(64)) if sample_rate < 1 else None
+        self._sampled = True
+        self._buckets = {}
+        self._close_at = float('inf')
+        self.traces_sampled_out = 0
+
+    def _bucket(self, timestamp_us):
+        """(transactions, destinations) of the minute an event falls in, closing finished minutes"""
+        if timestamp_us >= self._close_at:
+            self._close(timestamp_us - GRACE_US)
+        start = timestamp_us - timestamp_us % INTERVAL_US
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            bucket = self._buckets[start] = ({}, {})
+            self._close_at = min(self._close_at, start + INTERVAL_US + GRACE_US)
+        return bucket
+
+    def transaction(self, service, trace_id, transaction_id, transaction_us, duration_us, is_error, span_count,
+                    transaction, node_name, host, client_ip, parent_id=None, *_):
+        """Count a transaction; returns whether its trace is sampled (decided at the root)"""
+        if parent_id is None and self._random is not None:
+            self._sampled = self._random.random() < self.sample_rate
+            if not self._sampled:
+                self.traces_sampled_out += 1
+        transactions = self._bucket(transaction_us)[0]
+        key = (service, transaction[0], is_error, parent_id is None)
+        histogram = transactions.get(key)
+        if histogram is None:
+            histogram = transactions[key] = LatencyHistogram()
+        histogram.add(duration_us)
+        return self._sampled
+
+    def span(self, trace_id, parent_id, span_id, caller, service, span_us, duration_us, is_error, node_name,
+             statement):
+        """Count an exit span on its edge; returns whether its trace is sampled"""
+        destinations = self._bucket(span_us)[1]
+        key = (caller, service, is_error)
+        edge = destinations.get(key)
+        if edge is None:
+            destinations[key] = [1, duration_us]
+        else:
+            edge[0] += 1
+            edge[1] += duration_us
+        return self._sampled
+
+    def _common(self, start_us, metricset):
+        gen = self.generator
+        return {
+            '@timestamp': gen.format_timestamp(start_us),
+            'processor': METRIC_PROCESSOR,
+            'metricset': {'name': metricset, 'interval': '1m'},
+            'data_stream': {'type': 'metrics', 'dataset': f'apm.{metricset}.1m', 'namespace': 'default'},
+            'agent': METRIC_AGENT,
+            'observer': gen.OBSERVER,
+            'labels': gen._span_labels
+        }
+
+    def _documents(self, start_us, bucket):
+        """(index, document) pairs for one closed minute"""
+        gen = self.generator
+        transactions, destinations = bucket
+        services = {}
+        for (service, name, is_error, root), histogram in transactions.items():
+            yield INDICES['transaction'], dict(
+                self._common(start_us, 'transaction'),
+                service={'name': service.name, 'environment': 'production', 'language': gen.SERVICE_LANGUAGE},
+                transaction={'name': name, 'type': 'request', 'result': 'HTTP 5xx' if is_error else 'HTTP 2xx',
+                             'root': root, 'duration': histogram.document()},
+                event=gen.OUTCOME_FAILURE if is_error else gen.OUTCOME_SUCCESS,
+                _doc_count=histogram.count
+            )
+            merged = services.get(service)
+            if merged is None:
+                merged = services[service] = [LatencyHistogram(), 0]
+            merged[0].merge(histogram)
+            if is_error:
+                merged[1] += histogram.count
+        for service, (histogram, failures) in services.items():
+            yield INDICES['service_transaction'], dict(
+                self._common(start_us, 'service_transaction'),
+                service={'name': service.name, 'environment': 'production', 'language': gen.SERVICE_LANGUAGE},
+                transaction={'type': 'request', 'duration': histogram.document()},
+                event={'success_count': {'sum': histogram.count - failures,
+                                         'value_count': histogram.count}},
+                _doc_count=histogram.count
+            )
+        for (caller, service, is_error), (count, sum_us) in destinations.items():
+            yield INDICES['service_destination'], dict(
+                self._common(start_us, 'service_destination'),
+                service={'name': caller.name, 'environment': 'production', 'target': service.target},
+                span={'name': service.span_name, 'destination': {'service': {
+                    'resource': service.destination['service']['resource'],
+                    'response_time': {'count': count, 'sum': {'us': sum_us}}
+                }}},
+                event=gen.OUTCOME_FAILURE if is_error else gen.OUTCOME_SUCCESS,
+                _doc_count=count
+            )
+
+    def _close(self, watermark_us):
+        """Write and forget every bucket that ended before watermark_us"""
+        written = 0
+        for start in sorted(self._buckets):
+            if start + INTERVAL_US > watermark_us:
+                break
+            for index, document in self._documents(start, self._buckets.pop(start)):
+                self.sink.add(index, document)
+                written += 1
+        self._close_at = min(self._buckets, default=float('inf')) + INTERVAL_US + GRACE_US
+        if written:
+            self.generator.stats.add('apm_metrics', written)
+
+    def close(self):
+        """Write every open bucket, e.g. when the run ends"""
+        self._close(float('inf'))
+
+    def get_stats(self):
+        return {
+            'apm_metrics_buckets_open': len(self._buckets),
+            'traces_sampled_out': self.traces_sampled_out
+        }
@@ -4,20 +4,24 @@ Enhanced Flask Web Application for High-Quality Observability Data
 Uses improved generator with proper service maps and dependencies
 """
 
-from flask import Flask, render_template, request, jsonify
+import os
+
+from flask import Flask, Response, render_template, request, jsonify
 from elasticsearch import Elasticsearch
-from generator_enhanced import EnhancedObservabilityGenerator, IndustryConfig
+from generator_enhanced import IndustryConfig
 from demo_scenarios import DemoScenarios
-import threading
-import time
+from job_manager import DEFAULT_OUTPUT_DIR, EMPTY_STATS, JobManager
+from instrumentation import profiler, render_prometheus, stage_timer
+from stats_stream import StatsBroadcaster
 
 app = Flask(__name__)
 
 # Global state
 es_client = None
-generator = None
-generation_thread = None
-stop_generation = False
+es_config = None
+# Every generation runs as a job; jobs share the client and one bulk pipeline
+# File output requested over the API stays inside GENERATOR_OUTPUT_DIR
+job_manager = JobManager(output_dir=os.environ.get('GENERATOR_OUTPUT_DIR', DEFAULT_OUTPUT_DIR))
 
 @app.route('/')
 def index():
@@ -27,7 +31,7 @@ def index():
 @app.route('/api/connect', methods=['POST'])
 def connect_elasticsearch():
     """Connect to Elasticsearch with enhanced validation"""
-    global es_client
+    global es_client, es_config
     
     data = request.json
     cloud_id = data.get('cloud_id')
@@ -37,42 +41,45 @@ def connect_elasticsearch():
         return jsonify({'error': 'Cloud ID and API Key are required'}), 400
     
     try:
-        es_client = Elasticsearch(
-            cloud_id=cloud_id,
-            api_key=api_key,
-            request_timeout=30,
-            max_retries=3,
-            retry_on_timeout=True
-        )
+        es_config = {
+            'cloud_id': cloud_id,
+            'api_key': api_key,
+            'request_timeout': 30,
+            'max_retries': 3,
+            'retry_on_timeout': True
+        }
+        es_client = Elasticsearch(**es_config)
+        job_manager.connect(es_client, es_config)
         
         # Test connection and validate permissions
         info = es_client.info()
         
-        # Try to check if we can write to traces
+        # Ask for the write privilege instead of writing (and deleting) a test document
+        can_write = None
         try:
-            # Test write permission
-            test_doc = {
-                '@timestamp': '2024-01-01T00:00:00.000Z',
-                'test': 'connection_validation'
-            }
-            es_client.index(index='traces-apm-test', document=test_doc)
-            # Clean up test document
-            es_client.delete_by_query(
-                index='traces-apm-test',
-                body={'query': {'match': {'test': 'connection_validation'}}}
-            )
-        except Exception as write_error:
-            print(f"Warning: Write test failed: {write_error}")
-            # Continue anyway, we'll handle errors during generation
+            privileges = es_client.security.has_privileges(index=[{
+                'names': ['traces-apm-default', 'logs-*', 'synthetics-*', 'metrics-generator-default',
+                          'metrics-apm.*'],
+                'privileges': ['create_doc']
+            }])
+            can_write = privileges['has_all_requested']
+            if not can_write:
+                print("Warning: API key cannot create documents in every generator index")
+        except Exception as privilege_error:
+            # Security disabled or the key may not query its own privileges; errors surface during generation
+            print(f"Warning: Privilege check failed: {privilege_error}")
         
         return jsonify({
             'success': True,
             'cluster_name': info['cluster_name'],
-            'version': info['version']['number']
+            'version': info['version']['number'],
+            'can_write': can_write
         })
     
     except Exception as e:
         es_client = None
+        es_config = None
+        job_manager.connect(None, None)
         return jsonify({'error': f'Connection failed: {str(e)}'}), 500
 
 @app.route('/api/industries', methods=['GET'])
@@ -117,127 +124,189 @@ def get_scenarios():
 
 @app.route('/api/generate', methods=['POST'])
 def start_generation():
-    """Start enhanced data generation"""
-    global generator, generation_thread, stop_generation, es_client
-    
-    if not es_client:
-        return jsonify({'error': 'Not connected to Elasticsearch'}), 400
-    
-    data = request.json
-    industry = data.get('industry')
-    scenario_key = data.get('scenario')
-    duration_minutes = data.get('duration', 10)
-    events_per_second = data.get('rate', 17)
-    use_llm = data.get('use_llm', False)
-    llm_provider = data.get('llm_provider', 'openai')
-    llm_api_key = data.get('llm_api_key', '')
-    
-    if industry not in IndustryConfig.INDUSTRIES:
-        return jsonify({'error': 'Invalid industry'}), 400
-    
-    # Get scenario configuration
-    scenario = None
-    if scenario_key:
-        all_scenarios = DemoScenarios.get_scenarios_for_industry(industry)
-        scenario = all_scenarios.get(scenario_key)
-    
-    # Create enhanced generator
+    """Start enhanced data generation as a new job; jobs already running keep going"""
+    data = request.json or {}
     try:
-        generator = EnhancedObservabilityGenerator(
-            es_client, 
-            industry,
-            scenario=scenario,
-            use_llm=use_llm,
-            llm_provider=llm_provider,
-            llm_api_key=llm_api_key
-        )
-        print(f"✅ Generator created for {industry}")
-        if scenario:
-            print(f"📋 Scenario: {scenario.get('name')}")
-            print(f"   Error rate: {scenario.get('error_rate', 0.02)*100}%")
-            print(f"   Latency multiplier: {scenario.get('latency_multiplier', 1.0)}x")
+        job = job_manager.create(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': f'Failed to create generator: {str(e)}'}), 500
+        return jsonify({'error': f'Failed to start generation: {str(e)}'}), 500
     
-    stop_generation = False
-    
-    # Start generation in background thread
-    def generate():
-        global stop_generation
-        start_time = time.time()
-        end_time = start_time + (duration_minutes * 60)
-        
-        print(f"🚀 Starting data generation...")
-        print(f"   Duration: {duration_minutes} minutes")
-        print(f"   Rate: {events_per_second} events/second")
-        
-        batch_count = 0
-        error_count = 0
-        
-        while time.time() < end_time and not stop_generation:
-            try:
-                generator.generate_batch(events_per_second)
-                batch_count += 1
-                
-                # Log progress every 30 seconds
-                if batch_count % 30 == 0:
-                    stats = generator.get_stats()
-                    print(f"📊 Progress: {stats['traces']} traces, {stats['logs']} logs, {stats['synthetics']} synthetics")
-                
-                time.sleep(1)
-            except Exception as e:
-                error_count += 1
-                print(f"❌ Error generating batch {batch_count}: {e}")
-                
-                # Stop if too many consecutive errors
-                if error_count > 10:
-                    print("⚠️ Too many errors, stopping generation")
-                    break
-                
-                time.sleep(1)
-        
-        print(f"✅ Generation completed! Generated {batch_count} batches")
-        stats = generator.get_stats()
-        print(f"📈 Final stats: {stats['traces']} traces, {stats['logs']} logs, {stats['synthetics']} synthetics")
-    
-    generation_thread = threading.Thread(target=generate)
-    generation_thread.daemon = True
-    generation_thread.start()
-    
-    return jsonify({'success': True, 'message': 'Generation started'})
+    return jsonify({'success': True, 'message': f'Generation started as job {job.id}', 'job_id': job.id})
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+def jobs():
+    """List jobs, or start one with the same payload as /api/generate"""
+    if request.method == 'POST':
+        return start_generation()
+    return jsonify({
+        'jobs': [dict(job.describe(), stats=job.get_stats()) for job in job_manager.list()],
+        **job_manager.get_stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_detail(job_id):
+    """Inspect a job, or forget a finished one"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if request.method == 'DELETE':
+        try:
+            job_manager.remove(job_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({'success': True})
+    return jsonify(dict(job.describe(), stats=job.get_stats()))
+
+@app.route('/api/jobs/<job_id>/stop', methods=['POST'])
+def stop_job(job_id):
+    """Stop one job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    job.stop()
+    print(f"⏹️ Stop requested for job {job_id}")
+    return jsonify({'success': True, 'job': job.describe()})
+
+@app.route('/api/jobs/<job_id>/resize', methods=['POST'])
+def resize_job(job_id):
+    """Change a running job's rate, rate profile and/or duration ({"rate": 500, "duration": 30})"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    data = request.json or {}
+    try:
+        job.resize(events_per_second=data.get('rate'), duration_minutes=data.get('duration'),
+                   rate_profile=data.get('rate_profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'job': job.describe()})
+
+@app.route('/api/jobs/<job_id>/rate', methods=['POST'])
+def set_job_rate(job_id):
+    """Change a running job's target rate ({"rate": 1000}) or rate profile ({"rate_profile": {...}})"""
+    data = request.json or {}
+    if data.get('rate') is None and data.get('rate_profile') is None:
+        return jsonify({'error': 'rate or rate_profile is required'}), 400
+    return resize_job(job_id)
+
+@app.route('/api/bootstrap', methods=['GET', 'POST', 'DELETE'])
+def index_bootstrap():
+    """Install index templates and load-test settings (POST, optional settings object), restore them (DELETE)"""
+    try:
+        if request.method == 'POST':
+            job_manager.hold_bootstrap((request.json or {}).get('settings') or True)
+        elif request.method == 'DELETE':
+            job_manager.drop_bootstrap()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+    if job_manager.bootstrap is None:
+        return jsonify({'installed': False})
+    return jsonify(job_manager.bootstrap.describe())
 
 @app.route('/api/stop', methods=['POST'])
 def stop_generation_api():
-    """Stop data generation"""
-    global stop_generation
-    stop_generation = True
+    """Stop every running job"""
+    job_manager.stop_all()
     print("⏹️ Stop requested by user")
     return jsonify({'success': True})
 
+def current_stats():
+    """Statistics of the most recent job plus job counts"""
+    job = job_manager.latest()
+    stats = job.get_stats() if job else dict(EMPTY_STATS)
+    stats.update(job_manager.get_stats())
+    if job:
+        stats['job_id'] = job.id
+    return stats
+
+def stream_snapshot():
+    """Statistics pushed to live viewers: the most recent job plus a summary of every job"""
+    stats = current_stats()
+    stats['jobs'] = [job.describe() for job in job_manager.list()]
+    return stats
+
+# One producer aggregates stats per tick for every /api/stats/stream viewer
+stats_broadcaster = StatsBroadcaster(stream_snapshot, interval_seconds=1.0)
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get generation statistics"""
-    global generator
-    
-    if not generator:
-        return jsonify({
-            'traces': 0,
-            'logs': 0,
-            'synthetics': 0,
-            'elapsed_seconds': 0,
-            'traces_per_second': 0
-        })
-    
-    stats = generator.get_stats()
-    return jsonify(stats)
+    return jsonify(current_stats())
+
+@app.route('/api/stats/stream', methods=['GET'])
+def stream_stats():
+    """Push generation statistics every second as Server-Sent Events"""
+    return Response(stats_broadcaster.events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Per-job generation statistics and stage timing histograms in Prometheus text format"""
+    series = [
+        ({'job': job.id, 'industry': job.config['industry'], 'scenario': job.config['scenario_key'] or 'normal'},
+         job.get_stats())
+        for job in job_manager.list()
+    ]
+    manager_stats = job_manager.get_stats()
+    pipeline_stats = manager_stats.pop('pipeline')
+    series.append(({}, dict(manager_stats, **{f'pipeline_{key}': value for key, value in pipeline_stats.items()})))
+    return Response(render_prometheus(series), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/instrumentation', methods=['GET', 'POST'])
+def instrumentation():
+    """Turn per-stage timing on or off ({"enabled": true, "reset": true}) and get a summary"""
+    if request.method == 'POST':
+        data = request.json or {}
+        if data.get('reset'):
+            stage_timer.reset()
+        if 'enabled' in data:
+            stage_timer.enable(bool(data['enabled']))
+            print(f"⏱️ Stage timing {'enabled' if stage_timer.enabled else 'disabled'}")
+    return jsonify({'enabled': stage_timer.enabled, 'stages': stage_timer.summary()})
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def sampling_profile():
+    """Start/stop the sampling profiler ({"action": "start", "interval_ms": 5, "job_id": "1"}) and get its report"""
+    if request.method == 'POST':
+        data = request.json or {}
+        top = data.get('top', 25)
+    else:
+        top = request.args.get('top', 25, type=int)
+    if not isinstance(top, int) or isinstance(top, bool) or top <= 0:
+        return jsonify({'error': 'top must be a positive integer'}), 400
+    if request.method == 'POST':
+        action = data.get('action')
+        if action == 'start':
+            interval_ms = data.get('interval_ms', 5)
+            if (not isinstance(interval_ms, (int, float)) or isinstance(interval_ms, bool)
+                    or not 0 < interval_ms < float('inf')):
+                return jsonify({'error': 'interval_ms must be a positive number'}), 400
+            # Sample the job threads (one job, or all running ones); worker processes are not visible from here
+            jobs = [job_manager.get(data['job_id'])] if data.get('job_id') else job_manager.running()
+            thread_ids = [job.thread.ident for job in jobs if job and job.is_alive()] or None
+            profiler.start(interval=interval_ms / 1000, thread_ids=thread_ids)
+            print("🔬 Sampling profiler started")
+        elif action == 'stop':
+            profiler.stop()
+            print("🔬 Sampling profiler stopped")
+        else:
+            return jsonify({'error': 'Invalid action, expected start or stop'}), 400
+    return jsonify(profiler.report(top))
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    running = len(job_manager.running())
     return jsonify({
         'status': 'healthy',
         'es_connected': es_client is not None,
-        'generating': generation_thread is not None and generation_thread.is_alive()
+        'generating': running > 0,
+        'jobs_running': running,
+        'stream_viewers': stats_broadcaster.subscribers
     })
 
 if __name__ == '__main__':
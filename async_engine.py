@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Asyncio generation engine for the Observability Data Generator
+Keeps several _bulk requests in flight on an AsyncElasticsearch client
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from backpressure import AdaptiveLimit
+from rate_scheduler import RateScheduler
+from sinks import ElasticsearchBulkSink
+
+
+class AsyncBulkSink(ElasticsearchBulkSink):
+    """Bulk sink that hands full buffers to an AsyncGenerationEngine instead of sending them"""
+
+    def __init__(self, max_docs=1000, max_bytes=5 * 1024 * 1024, max_age_seconds=1.0, **options):
+        super().__init__(None, max_docs=max_docs, max_bytes=max_bytes, max_age_seconds=max_age_seconds, **options)
+        self._ready = deque()
+
+    def _send(self, index, buffer):
+        """Park the buffer until the engine picks it up"""
+        with self._lock:
+            self._ready.append((index, buffer))
+
+    def take_ready(self):
+        """Remove and return every buffer that is ready to send"""
+        with self._lock:
+            ready = list(self._ready)
+            self._ready.clear()
+        return ready
+
+    async def send_async(self, es_client, index, buffer):
+        """Send one buffer with an async client, resending rejected items with backoff; True if any were"""
+        lines, docs, attempt = buffer.lines, buffer.docs, 0
+        while True:
+            start = time.perf_counter()
+            body = b''.join(lines)
+            try:
+                response = await es_client.bulk(index=index, operations=body)
+            except Exception as e:
+                response = e
+            retry = self._handle_result(index, lines, docs, len(body), response, start, attempt)
+            if retry is None:
+                return attempt > 0
+            lines, docs = retry
+            delay = self._start_retry(docs, attempt)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._end_retry(docs)
+            attempt += 1
+
+    def pending(self):
+        """Documents buffered, waiting to be sent or waiting for a retry"""
+        with self._lock:
+            return (sum(buffer.docs for buffer in self._buffers.values())
+                    + sum(buffer.docs for _, buffer in self._ready) + self._retrying)
+
+
+class AsyncGenerationEngine:
+    """Generates documents on an event loop while up to `concurrency` bulk requests are in flight"""
+
+    def __init__(self, generator, es_client, concurrency=4, chunk_size=500, max_catchup_seconds=2.0,
+                 rate_profile=None):
+        if not isinstance(generator.sink, AsyncBulkSink):
+            raise ValueError('AsyncGenerationEngine requires a generator using AsyncBulkSink')
+
+        self.generator = generator
+        self.sink = generator.sink
+        self.es = es_client
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_catchup_seconds = max_catchup_seconds
+        self.rate_profile = rate_profile
+        # Requests in flight shrink when the cluster slows down or rejects, and grow back up to concurrency
+        self.limit = None
+        if self.sink.batch_size is not None:
+            self.limit = AdaptiveLimit(concurrency, 1, concurrency,
+                                       target_latency_seconds=self.sink.batch_size.target_latency_seconds, step=1)
+
+        self.scheduler = None
+        self.deadline = None
+        self._queue = None
+        self._slots = None
+        self._stop = False
+        self.stats = {
+            'concurrency': concurrency,
+            'bulk_concurrency': concurrency,
+            'bulk_in_flight': 0,
+            'bulk_queued': 0,
+            'backpressure_waits': 0
+        }
+
+    def stop(self):
+        """Ask the engine to finish after the current chunk"""
+        self._stop = True
+
+    async def run(self, events_per_second, duration_seconds):
+        """Generate at the requested rate for the given duration, then drain all bulk requests"""
+        loop = asyncio.get_running_loop()
+        senders = self._start_senders()
+
+        self.scheduler = RateScheduler(events_per_second, max_catchup_seconds=self.max_catchup_seconds,
+                                       clock=loop.time, profile=self.rate_profile)
+        # Kept on the engine so the run can be extended or shortened while it is going
+        self.deadline = loop.time() + duration_seconds
+
+        try:
+            while not self._stop and loop.time() < self.deadline:
+                remaining = await self.scheduler.wait_async()
+                while remaining > 0 and not self._stop:
+                    chunk = min(self.chunk_size, remaining)
+                    self.generator.generate_batch(chunk)
+                    remaining -= chunk
+                    await self._enqueue_ready()
+
+                self.sink.flush_expired()
+                await self._enqueue_ready()
+        finally:
+            await self._drain(senders)
+
+    async def run_unthrottled(self, next_chunk):
+        """Generate as fast as the senders keep up, asking next_chunk() for each batch size until it returns 0"""
+        senders = self._start_senders()
+        try:
+            while not self._stop:
+                chunk = next_chunk()
+                if chunk <= 0:
+                    break
+                self.generator.generate_batch(chunk)
+                await self._enqueue_ready()
+                # Let senders process responses between chunks even when the queue has room
+                await asyncio.sleep(0)
+        finally:
+            await self._drain(senders)
+
+    def _start_senders(self):
+        """Create the bounded send queue and its sender tasks"""
+        # At most one queued batch per sender: when every sender is busy the producer waits
+        self._queue = asyncio.Queue(maxsize=self.concurrency)
+        self._slots = asyncio.Condition()
+        return [asyncio.create_task(self._sender()) for _ in range(self.concurrency)]
+
+    async def _drain(self, senders):
+        """Flush the sink, wait for every queued request and stop the senders"""
+        self.generator.flush_apm_metrics()
+        self.sink.flush()
+        await self._enqueue_ready()
+        await self._queue.join()
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+
+    async def _enqueue_ready(self):
+        """Move ready buffers to the send queue, waiting when the cluster falls behind"""
+        for item in self.sink.take_ready():
+            if self._queue.full():
+                self.stats['backpressure_waits'] += 1
+            await self._queue.put(item)
+            self.stats['bulk_queued'] = self._queue.qsize()
+
+    async def _sender(self):
+        """Send queued buffers one at a time, waiting while the adaptive limit is reached"""
+        while True:
+            index, buffer = await self._queue.get()
+            if self.limit is not None:
+                async with self._slots:
+                    await self._slots.wait_for(lambda: self.stats['bulk_in_flight'] < self.limit.value)
+            self.stats['bulk_in_flight'] += 1
+            start = time.perf_counter()
+            retried = True
+            try:
+                retried = await self.sink.send_async(self.es, index, buffer)
+            finally:
+                self.stats['bulk_in_flight'] -= 1
+                self.stats['bulk_queued'] = self._queue.qsize()
+                if self.limit is not None:
+                    self.stats['bulk_concurrency'] = self.limit.observe(time.perf_counter() - start, retried)
+                    async with self._slots:
+                        self._slots.notify_all()
+                self._queue.task_done()
+
+    def get_stats(self):
+        """Get engine and rate statistics"""
+        stats = dict(self.stats)
+        if self.scheduler:
+            stats.update(self.scheduler.get_stats())
+        return stats
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Backfill mode for the Observability Data Generator
+Generates historical data against a simulated clock as fast as the sink accepts it
+"""
+
+import time
+
+from fast_ids import TimestampFormatter, VirtualClock, now_us, parse_time_us
+
+
+def split_time_range(start_us, end_us, parts):
+    """Split [start, end) into contiguous slices, one per worker"""
+    step = (end_us - start_us) // parts
+    bounds = [start_us + i * step for i in range(parts)] + [end_us]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def backfill_settings(value):
+    """Validated backfill object ({"start_time": ..., "end_time": ...}) of a job, or None; raises ValueError
+
+    Times are ISO-8601 strings or epoch seconds; a missing end_time means now.
+    """
+    if not value:
+        return None
+    if not isinstance(value, dict):
+        raise ValueError('backfill must be an object with a start_time')
+    unknown = set(value) - {'start_time', 'end_time'}
+    if unknown:
+        raise ValueError(f'Unknown backfill options: {", ".join(sorted(unknown))}')
+    if value.get('start_time') is None:
+        raise ValueError('backfill.start_time is required')
+    times = {}
+    for key in ('start_time', 'end_time'):
+        time_value = value.get(key)
+        if time_value is None:
+            continue
+        if not isinstance(time_value, (str, int, float)) or isinstance(time_value, bool):
+            raise ValueError(f'backfill.{key} must be an ISO-8601 string or epoch seconds')
+        try:
+            times[key] = parse_time_us(time_value)
+        except (ValueError, OverflowError):
+            raise ValueError(f'Invalid backfill.{key}: {time_value}')
+    if times.get('end_time', now_us()) <= times['start_time']:
+        raise ValueError('Backfill end_time must be after start_time')
+    return dict(value)
+
+
+class BackfillRunner:
+    """Drives a generator from start_time to end_time at a virtual events/sec, unthrottled"""
+
+    # Most simulated time one chunk covers while following a profile, so rate changes land on time
+    PROFILE_STEP_SECONDS = 10
+
+    def __init__(self, generator, start_time, end_time=None, events_per_second=17, chunk_size=500, profile=None):
+        self.generator = generator
+        self.start_us = parse_time_us(start_time)
+        self.end_us = parse_time_us(end_time) if end_time is not None else now_us()
+        if self.end_us <= self.start_us:
+            raise ValueError('Backfill end_time must be after start_time')
+
+        self.events_per_second = events_per_second
+        self.chunk_size = chunk_size
+        self.clock = VirtualClock(self.start_us, events_per_second)
+        generator.clock = self.clock
+        # Traces that would run past end_us start early enough to finish by then
+        generator.end_us = self.end_us
+        # Profiles follow simulated time, so a week-long backfill can carry daily peaks
+        self.profile = profile
+        self._profile_start_us = self.start_us
+        # Fraction of an event carried between chunks, so low rates still produce their events
+        self._carry = 0.0
+
+        self._stop = False
+        self._format = TimestampFormatter()
+        self.started_at = None
+        self.finished_at = None
+        self.events_generated = 0
+
+    def stop(self):
+        """Stop after the current chunk"""
+        self._stop = True
+
+    def done(self):
+        """True once the simulated clock has reached end_time or a stop was requested"""
+        return self._stop or self.clock.now_us >= self.end_us
+
+    def run(self, should_stop=None, on_progress=None, progress_interval=0.5):
+        """Generate the whole range synchronously, then flush the sink"""
+        self.started_at = time.monotonic()
+        next_progress = self.started_at
+        try:
+            while not (should_stop and should_stop()):
+                count = self._next_chunk()
+                if count <= 0:
+                    break
+                self.generator.generate_batch(count)
+                if on_progress and time.monotonic() >= next_progress:
+                    on_progress()
+                    next_progress = time.monotonic() + progress_interval
+        finally:
+            self.generator.close()
+            self.finished_at = time.monotonic()
+
+    async def run_async(self, engine):
+        """Generate the whole range through an AsyncGenerationEngine's concurrent bulk senders"""
+        self.started_at = time.monotonic()
+        try:
+            await engine.run_unthrottled(self._next_chunk)
+        finally:
+            self.finished_at = time.monotonic()
+
+    def _next_chunk(self):
+        """Events in the next chunk, with the clock stepped to spread them over its span; 0 when the range is covered
+
+        A chunk spans the time left, at most PROFILE_STEP_SECONDS when a
+        profile is followed. When fewer than one event is due in that span
+        (a zero rate, say) the clock skips ahead to its end instead.
+        """
+        while not self.done():
+            now = self.clock.now_us
+            span_us = self.end_us - now
+            if self.profile is not None:
+                span_us = min(span_us, self.PROFILE_STEP_SECONDS * 1000000)
+                # Rate at the middle of the span, so ramps and curves get the area under them
+                self.events_per_second = self.profile.rate_at((now + span_us / 2 - self._profile_start_us) / 1000000)
+            rate = max(0, self.events_per_second)
+            expected = rate * span_us / 1000000 + self._carry
+            if expected > self.chunk_size:
+                # A full chunk ends before the span does: step at the rate itself
+                count = self.chunk_size
+                self._carry = 0.0
+                self.clock.set_rate(rate)
+            else:
+                count = int(expected)
+                self._carry = expected - count if rate > 0 else 0.0
+                if count == 0:
+                    self.clock.now_us = now + span_us
+                    continue
+                # Event i is stamped now + i * span / count: all of them before the span ends
+                self.clock.set_rate(count * 1000000 / span_us)
+            self.events_generated += count
+            return count
+        return 0
+
+    def set_rate(self, events_per_second):
+        """Change the simulated rate from the current position on; replaces any rate profile"""
+        self.profile = None
+        self.events_per_second = events_per_second
+        self.clock.set_rate(events_per_second)
+
+    def set_profile(self, profile, start_us=None):
+        """Follow a rate profile from start_us (default: the current simulated position) on"""
+        self.profile = profile
+        self._profile_start_us = start_us if start_us is not None else self.clock.now_us
+
+    def get_stats(self):
+        """Progress through simulated time and wall-clock throughput"""
+        position = min(self.clock.now_us, self.end_us)
+        covered = (position - self.start_us) / 1000000
+        total = (self.end_us - self.start_us) / 1000000
+        elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0
+        docs = self.generator.get_stats()['docs_indexed']
+        return {
+            'backfill_start': self._format(self.start_us),
+            'backfill_end': self._format(self.end_us),
+            'backfill_position': self._format(position),
+            'backfill_progress_percent': round(100 * covered / total, 2),
+            'simulated_seconds_covered': int(covered),
+            'simulated_seconds_per_second': round(covered / elapsed, 2) if elapsed > 0 else 0,
+            'backfill_events': self.events_generated,
+            'docs_per_second': round(docs / elapsed, 2) if elapsed > 0 else 0,
+            'backfill_complete': self.clock.now_us >= self.end_us
+        }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Backpressure handling for the Observability Data Generator
+Retry classification, exponential backoff and latency-driven limits for bulk size and concurrency
+"""
+
+import random
+import threading
+
+try:
+    from elastic_transport import ConnectionError as TransportConnectionError, ConnectionTimeout
+    TRANSIENT_ERRORS = (TransportConnectionError, ConnectionTimeout, ConnectionError, TimeoutError)
+except ImportError:
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+# Responses that mean "try again later" rather than "this request is wrong"
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def is_retriable_error(error):
+    """True for a whole-request failure worth retrying: overload statuses, connection errors and timeouts"""
+    status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status in RETRY_STATUSES
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def is_rejected_item(result):
+    """True for a bulk item the cluster refused because it was overloaded (429 / es_rejected_execution)"""
+    if result.get('status') == 429:
+        return True
+    error = result.get('error')
+    return isinstance(error, dict) and error.get('type') == 'es_rejected_execution_exception'
+
+
+class Backoff:
+    """Exponential backoff with full jitter, capped at max_seconds"""
+
+    def __init__(self, initial_seconds=0.5, max_seconds=30.0, multiplier=2.0):
+        self.initial_seconds = initial_seconds
+        self.max_seconds = max_seconds
+        self.multiplier = multiplier
+        # Own stream: retries must not consume the generator's seeded randomness
+        self._random = random.Random()
+
+    def delay(self, attempt):
+        """Seconds to wait before retry number attempt (0-based)"""
+        ceiling = min(self.max_seconds, self.initial_seconds * self.multiplier ** attempt)
+        return self._random.uniform(ceiling / 2, ceiling)
+
+
+class AdaptiveLimit:
+    """Integer limit tuned by additive increase / multiplicative decrease from request outcomes
+
+    Rejections halve the limit, requests slower than the target latency
+    shrink it by a fifth, and requests well under the target grow it by
+    step (at least 1) until maximum.
+    """
+
+    def __init__(self, value, minimum=1, maximum=None, target_latency_seconds=1.0, step=None):
+        self.minimum = minimum
+        self.maximum = maximum if maximum is not None else value
+        self.value = max(minimum, min(value, self.maximum))
+        self.target_latency_seconds = target_latency_seconds
+        self.step = step
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, rejected=False):
+        """Adjust the limit after one request and return the new value"""
+        with self._lock:
+            if rejected:
+                self.value = max(self.minimum, self.value // 2)
+            elif seconds > self.target_latency_seconds:
+                self.value = max(self.minimum, int(self.value * 0.8))
+            elif seconds < self.target_latency_seconds / 2:
+                step = self.step if self.step is not None else max(1, self.value // 10)
+                self.value = min(self.maximum, self.value + step)
+            return self.value
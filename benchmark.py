@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Generator benchmark suite for the Observability Data Generator
+Measures throughput, per-signal cost and memory for every industry and scenario against an in-memory sink
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from demo_scenarios import DemoScenarios
+from generator_enhanced import EnhancedObservabilityGenerator, IndustryConfig
+from sinks import MemorySink
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Metric -> True when higher is better; used to decide what counts as a regression
+METRICS = {
+    'docs_per_second': True,
+    'us_per_trace': False,
+    'us_per_span': False,
+    'us_per_log': False,
+    'us_per_synthetic': False,
+    'peak_memory_kb': False
+}
+
+
+def list_cases(industries=None, scenarios=True):
+    """(industry, scenario key) pairs to run; scenario None is normal operation"""
+    cases = []
+    for industry in industries or IndustryConfig.INDUSTRIES:
+        cases.append((industry, None))
+        if scenarios:
+            cases.extend((industry, key) for key in DemoScenarios.get_scenarios_for_industry(industry))
+    return cases
+
+
+def case_name(industry, scenario_key):
+    """Key of a case in results and baselines"""
+    return f'{industry}/{scenario_key or "normal"}'
+
+
+def _generator(industry, scenario_key, encode, vectorized):
+    """Fresh seeded generator on a memory sink so every run does the same work"""
+    scenario = DemoScenarios.get_scenario(industry, scenario_key) if scenario_key else None
+    sink = MemorySink(encode=encode)
+    generator = EnhancedObservabilityGenerator(None, industry, scenario=scenario, sink=sink, seed=1,
+                                               start_time=0, events_per_second=1000, vectorized=vectorized)
+    return generator, sink
+
+
+def _time_signal(generate, count):
+    """Seconds taken by count calls of a generation function"""
+    start = time.perf_counter()
+    for _ in range(count):
+        generate()
+    return time.perf_counter() - start
+
+
+def benchmark_case(industry, scenario_key, events=2000, repeat=3, encode=True, vectorized=False, memory=True):
+    """Measure one industry/scenario; timings are the best of repeat runs"""
+    batch = 500
+    best = {}
+
+    for _ in range(repeat):
+        # Whole batches: the mix of signals as the app produces it
+        generator, sink = _generator(industry, scenario_key, encode, vectorized)
+        start = time.perf_counter()
+        for offset in range(0, events, batch):
+            generator.generate_batch(min(batch, events - offset))
+        elapsed = time.perf_counter() - start
+        docs = sink.get_stats()['docs_indexed']
+        run = {'docs_per_second': docs / elapsed}
+
+        # Each signal on its own
+        traces = events * 6 // 10
+        generator, sink = _generator(industry, scenario_key, encode, vectorized)
+        if vectorized:
+            start = time.perf_counter()
+            generator._vectorized.generate(traces)
+            elapsed = time.perf_counter() - start
+        else:
+            elapsed = _time_signal(generator.generate_distributed_trace, traces)
+        trace_docs = sink.get_stats()['docs_indexed']
+        run['us_per_trace'] = elapsed / traces * 1e6
+        # Per trace event: each span or transaction document
+        run['us_per_span'] = elapsed / trace_docs * 1e6
+        run['docs_per_trace'] = trace_docs / traces
+        run['us_per_log'] = _time_signal(generator.generate_log, events * 3 // 10) / (events * 3 // 10) * 1e6
+        run['us_per_synthetic'] = (_time_signal(generator.generate_synthetic_check, events // 10)
+                                   / (events // 10) * 1e6)
+
+        for metric, value in run.items():
+            if metric not in best:
+                best[metric] = value
+            elif METRICS.get(metric, False):
+                best[metric] = max(best[metric], value)
+            else:
+                best[metric] = min(best[metric], value)
+
+    result = {metric: round(value, 2) for metric, value in best.items()}
+    if memory:
+        result.update(profile_memory(industry, scenario_key, events, encode, vectorized))
+    return result
+
+
+def profile_memory(industry, scenario_key, events=2000, encode=True, vectorized=False, top=5):
+    """Peak traced memory, allocated blocks and the biggest allocation sites while generating batches"""
+    generator, _ = _generator(industry, scenario_key, encode, vectorized)
+    generator.generate_batch(100)  # Warm caches so they are not counted as per-event cost
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        generator.generate_batch(events)
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    return {
+        'peak_memory_kb': round(peak / 1024, 1),
+        'allocated_blocks': sum(stat.count_diff for stat in diff if stat.count_diff > 0),
+        'top_allocations': [
+            f'{stat.traceback[0].filename.rsplit("/", 1)[-1]}:{stat.traceback[0].lineno} '
+            f'{stat.size_diff / 1024:.1f} KiB'
+            for stat in diff[:top]
+        ]
+    }
+
+
+def run_suite(cases, events=2000, repeat=3, encode=True, vectorized=False, memory=True, verbose=True):
+    """Benchmark every case and return results with the environment they were measured in"""
+    results = {}
+    for industry, scenario_key in cases:
+        name = case_name(industry, scenario_key)
+        results[name] = benchmark_case(industry, scenario_key, events, repeat, encode, vectorized, memory)
+        if verbose:
+            r = results[name]
+            print(f"  {name:40} {r['docs_per_second']:>10,.0f} docs/s  {r['us_per_trace']:>8.1f} µs/trace  "
+                  f"{r['us_per_log']:>6.1f} µs/log", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'events': events,
+            'repeat': repeat,
+            'encode': encode,
+            'vectorized': vectorized,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            # Commit the code was measured at; uncommitted changes are not included
+            'commit': _git('rev-parse', 'HEAD')
+        },
+        'results': results
+    }
+
+
+def _git(*args):
+    """Output of a git command in the repository, or None when git is unavailable"""
+    try:
+        return subprocess.run(('git',) + args, capture_output=True, text=True, check=True, cwd=ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measured_modules():
+    """Repository modules loaded by the benchmark, i.e. the code its numbers depend on"""
+    paths = (getattr(module, '__file__', None) for module in list(sys.modules.values()))
+    return {os.path.relpath(path, ROOT) for path in paths
+            if path and os.path.dirname(os.path.abspath(path)) == ROOT} - {'benchmark.py'}
+
+
+def stale_modules(baseline):
+    """Measured modules changed since the commit a baseline was recorded at; None when that cannot be told"""
+    commit = baseline.get('meta', {}).get('commit')
+    if not commit:
+        return None
+    changed = _git('diff', '--name-only', commit, '--', '*.py')
+    if changed is None:
+        return None
+    return sorted(set(changed.splitlines()) & measured_modules())
+
+
+def compare(results, baseline, tolerance=0.2):
+    """List regressions beyond tolerance (a fraction) for cases present in both runs"""
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f'{name} {metric}: {old} -> {new} ({change:+.0%})')
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the generator offline against an in-memory sink')
+    parser.add_argument('--industry', action='append', choices=sorted(IndustryConfig.INDUSTRIES),
+                        help='Industry to benchmark (repeatable, default all)')
+    parser.add_argument('--no-scenarios', action='store_true', help='Only benchmark normal operation')
+    parser.add_argument('--events', type=int, default=2000, help='Events per measured run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the best one is kept')
+    parser.add_argument('--no-encode', action='store_true', help='Skip JSON serialization')
+    parser.add_argument('--vectorized', action='store_true', help='Benchmark the NumPy batch path')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before failing (0.2 = 20%%)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = list_cases(args.industry, scenarios=not args.no_scenarios)
+
+    print(f"⏱️  Benchmarking {len(cases)} cases ({args.events} events, best of {args.repeat})", file=sys.stderr)
+    results = run_suite(cases, args.events, args.repeat, encode=not args.no_encode,
+                        vectorized=args.vectorized, memory=not args.no_memory)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📁 Wrote {args.output}", file=sys.stderr)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Updated baseline {args.baseline}", file=sys.stderr)
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️  No baseline at {args.baseline}; run with --update-baseline to create one", file=sys.stderr)
+        return 0
+
+    stale = stale_modules(baseline)
+    if stale is None:
+        print(f"⚠️  {args.baseline} does not record a commit git can find; its numbers may be stale",
+              file=sys.stderr)
+    elif stale:
+        print(f"⚠️  {args.baseline} predates changes to {', '.join(stale)}; re-record it with --update-baseline "
+              f"after changes that affect speed", file=sys.stderr)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} regressions against {args.baseline}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"   {regression}", file=sys.stderr)
+        return 1
+    print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
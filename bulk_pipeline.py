@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Shared bulk pipeline for the Observability Data Generator
+A pool of sender threads that sends full bulk buffers for every job over one Elasticsearch client
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+from backpressure import AdaptiveLimit
+from sinks import ElasticsearchBulkSink, _IndexBuffer
+
+
+class BulkPipeline:
+    """Bounded queue of ready bulk buffers drained by a fixed set of sender threads
+
+    Generation threads only serialize and buffer; the round trips happen on
+    the senders, so several jobs keep up to `senders` requests in flight on
+    one client (and one connection pool) between them. When the queue is
+    full, submitting blocks, which slows the producing jobs down to what the
+    cluster accepts. With adaptive on, fewer senders send at once while
+    requests are slow or rejected. Rejected items wait out their backoff off
+    the senders and are queued again when it ends, so one overloaded job
+    never holds a sender that other jobs need.
+    """
+
+    def __init__(self, senders=4, max_queued=None, adaptive=True, target_latency_seconds=1.0):
+        self.senders = senders
+        self._queue = queue.Queue(maxsize=max_queued or senders * 2)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        # Retries waiting out their backoff: a heap of (due, sequence, item), fed to the queue by a timer thread
+        self._due = threading.Condition(self._lock)
+        self._scheduled = []
+        self._sequence = itertools.count()
+        self._retries = 0
+        self._stopping = False
+        self.limit = None
+        if adaptive:
+            self.limit = AdaptiveLimit(senders, 1, senders, target_latency_seconds=target_latency_seconds, step=1)
+        self.stats = {
+            'bulk_concurrency': senders,
+            'bulk_in_flight': 0,
+            'bulk_submitted': 0,
+            'backpressure_waits': 0
+        }
+
+    def _start(self):
+        """Start the sender threads on first use"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for number in range(self.senders):
+                thread = threading.Thread(target=self._run, name=f'bulk-sender-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._run_retries, name='bulk-retry', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, sink, index, buffer):
+        """Queue one buffer to be sent by the sink, blocking while the queue is full"""
+        self._start()
+        if self._queue.full():
+            with self._lock:
+                self.stats['backpressure_waits'] += 1
+        self._queue.put((sink, index, buffer, 0))
+        with self._lock:
+            self.stats['bulk_submitted'] += 1
+
+    def retry(self, sink, index, buffer, attempt, delay):
+        """Queue a buffer for attempt number `attempt` once delay seconds have passed, without blocking"""
+        with self._due:
+            self._retries += 1
+            heapq.heappush(self._scheduled, (time.monotonic() + delay, next(self._sequence),
+                                             (sink, index, buffer, attempt)))
+            self._due.notify_all()
+
+    def _run_retries(self):
+        """Move retries whose backoff is over into the send queue"""
+        while True:
+            with self._due:
+                while not self._scheduled or self._scheduled[0][0] > time.monotonic():
+                    if self._stopping:
+                        return
+                    self._due.wait(self._scheduled[0][0] - time.monotonic() if self._scheduled else None)
+                item = heapq.heappop(self._scheduled)[2]
+            self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            sink, index, buffer, attempt = item
+            with self._slots:
+                if self.limit is not None:
+                    self._slots.wait_for(lambda: self.stats['bulk_in_flight'] < self.limit.value)
+                self.stats['bulk_in_flight'] += 1
+            start = time.perf_counter()
+            retried = True
+            try:
+                retried = sink._send_now(index, buffer, attempt)
+            except Exception as e:
+                print(f"❌ Bulk sender error: {e}")
+            finally:
+                with self._slots:
+                    self.stats['bulk_in_flight'] -= 1
+                    if self.limit is not None:
+                        self.stats['bulk_concurrency'] = self.limit.observe(time.perf_counter() - start, retried)
+                    if attempt:
+                        self._retries -= 1
+                        self._due.notify_all()
+                    self._slots.notify_all()
+                self._queue.task_done()
+
+    def close(self):
+        """Send everything still queued or waiting to be retried, then stop the sender threads"""
+        # Queued buffers may still be rejected and scheduled, so drain the queue before counting retries
+        self._queue.join()
+        with self._due:
+            self._due.wait_for(lambda: self._retries == 0)
+            threads, self._threads = self._threads, []
+            self._stopping = True
+            self._due.notify_all()
+        for _ in threads[:-1]:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def get_stats(self):
+        """Queue depth and requests in flight"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['bulk_queued'] = self._queue.qsize()
+        stats['bulk_retries_waiting'] = len(self._scheduled)
+        stats['senders'] = self.senders
+        return stats
+
+
+class PipelinedBulkSink(ElasticsearchBulkSink):
+    """Bulk sink that hands full buffers to a shared BulkPipeline instead of sending them itself"""
+
+    def __init__(self, es_client, pipeline, max_docs=1000, max_bytes=5 * 1024 * 1024, max_age_seconds=1.0,
+                 **options):
+        super().__init__(es_client, max_docs=max_docs, max_bytes=max_bytes, max_age_seconds=max_age_seconds,
+                         **options)
+        self.pipeline = pipeline
+        self._in_pipeline = 0
+        self._sent = threading.Condition(self._lock)
+
+    def _send(self, index, buffer):
+        """Submit the buffer to the pipeline"""
+        with self._lock:
+            self._in_pipeline += buffer.docs
+        self.pipeline.submit(self, index, buffer)
+
+    def _send_now(self, index, buffer, attempt=0):
+        """Send one buffer on a pipeline sender thread; True if any of it had to be retried
+
+        Items to resend go back to the pipeline with their backoff delay
+        rather than being slept on here.
+        """
+        if attempt:
+            self._end_retry(buffer.docs)
+        try:
+            retry = self._send_once(index, buffer.lines, buffer.docs, attempt)
+            if retry is None:
+                return attempt > 0
+            resend = _IndexBuffer()
+            resend.lines, resend.docs = retry
+            resend.size = sum(map(len, resend.lines))
+            with self._lock:
+                self._in_pipeline += resend.docs
+            self.pipeline.retry(self, index, resend, attempt + 1, self._start_retry(resend.docs, attempt))
+            return True
+        finally:
+            with self._sent:
+                self._in_pipeline -= buffer.docs
+                self._sent.notify_all()
+
+    def close(self):
+        """Flush and wait until the pipeline has sent every buffer of this sink"""
+        self.flush()
+        with self._sent:
+            self._sent.wait_for(lambda: self._in_pipeline == 0)
+
+    def pending(self):
+        """Documents buffered here or waiting in the pipeline (including retries)"""
+        with self._lock:
+            return sum(buffer.docs for buffer in self._buffers.values()) + self._in_pipeline
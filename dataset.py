@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Recorded datasets for the Observability Data Generator
+Writes a run's output as segmented bulk-format files with a time-range manifest and replays them into _bulk
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+
+from bulk_pipeline import BulkPipeline, PipelinedBulkSink
+from encoding import dumps
+from fast_ids import TimestampFormatter, TimestampParser, now_us, parse_time_us
+from sinks import Sink, bulk_options, encode_action, open_output
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST = 'manifest.json'
+EXTENSIONS = {None: '.ndjson', 'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'gzip'
+
+# Generated documents start with their @timestamp, and trace events follow it with timestamp.us
+TIMESTAMP_PREFIX = b'{"@timestamp":"'
+TIMESTAMP_US_PREFIX = b'","timestamp":{"us":'
+TIMESTAMP_END = len(TIMESTAMP_PREFIX) + 27
+
+# Every document starts with an action line, and JSON lines never contain a raw newline
+DOCUMENT_BOUNDARY = b'\n{"create":'
+
+
+class _Segment:
+    """One open segment file of an index"""
+
+    __slots__ = ('index', 'number', 'name', 'file', 'raw', 'action', 'docs', 'bytes', 'start_us', 'end_us')
+
+    def __init__(self, index, number, name, file, raw):
+        self.index = index
+        self.number = number
+        self.name = name
+        self.file = file
+        self.raw = raw
+        self.action = encode_action(index)
+        self.docs = 0
+        self.bytes = 0
+        self.start_us = None
+        self.end_us = None
+
+
+class DatasetSink(Sink):
+    """Records a run as a dataset directory: per-index segments of bulk-format NDJSON plus a manifest
+
+    A segment is closed after segment_docs documents or segment_bytes
+    (uncompressed) and listed in manifest.json with its time range, so a
+    replay can pick a window and order segments by time. The manifest is
+    rewritten whenever a segment is finished, so an interrupted run still
+    leaves a usable dataset.
+    """
+
+    accepts_encoded = True
+
+    def __init__(self, path, compression=DEFAULT_COMPRESSION, segment_docs=250000, segment_bytes=256 * 1024 * 1024,
+                 metadata=None, compression_level=3):
+        super().__init__()
+        if compression not in EXTENSIONS:
+            raise ValueError(f'Unsupported compression: {compression}')
+        if segment_docs <= 0 or segment_bytes <= 0:
+            raise ValueError('segment_docs and segment_bytes must be positive')
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            raise ValueError(f'{path} already contains a dataset')
+        self.path = path
+        self.compression = compression
+        self.compression_level = compression_level
+        self.segment_docs = segment_docs
+        self.segment_bytes = segment_bytes
+        self.metadata = metadata or {}
+        self.created = now_us()
+
+        self._open = {}
+        self._numbers = {}
+        self._finished = []
+        self._parse_timestamp = TimestampParser()
+        self._format_timestamp = TimestampFormatter()
+
+    def add(self, index, document):
+        """Append the action and source lines for one document"""
+        self.add_encoded(index, dumps(document) + b'\n')
+
+    def add_encoded(self, index, line):
+        """Append the action line and an already serialized source line to the index's current segment"""
+        timestamp_us = None
+        if line.startswith(TIMESTAMP_PREFIX):
+            try:
+                timestamp_us = self._parse_timestamp(line[len(TIMESTAMP_PREFIX):TIMESTAMP_END].decode('ascii'))
+            except ValueError:
+                pass
+
+        with self._lock:
+            segment = self._open.get(index)
+            if segment is None:
+                segment = self._open_segment(index)
+            segment.file.write(segment.action)
+            segment.file.write(line)
+            size = len(segment.action) + len(line)
+            segment.docs += 1
+            segment.bytes += size
+            if timestamp_us is not None:
+                if segment.start_us is None or timestamp_us < segment.start_us:
+                    segment.start_us = timestamp_us
+                if segment.end_us is None or timestamp_us > segment.end_us:
+                    segment.end_us = timestamp_us
+            if segment.docs >= self.segment_docs or segment.bytes >= self.segment_bytes:
+                self._finish(segment)
+                self._write_manifest()
+        self._count(index, size)
+
+    def _open_segment(self, index):
+        number = self._numbers.get(index, 0)
+        self._numbers[index] = number + 1
+        name = f'{index}-{number:05d}{EXTENSIONS[self.compression]}'
+        file, raw = open_output(os.path.join(self.path, name), self.compression, self.compression_level)
+        segment = self._open[index] = _Segment(index, number, name, file, raw)
+        return segment
+
+    def _finish(self, segment):
+        """Close a segment and add it to the manifest"""
+        segment.file.close()
+        if segment.raw is not None:
+            segment.raw.close()
+        del self._open[segment.index]
+        record = {
+            'index': segment.index,
+            'file': segment.name,
+            'docs': segment.docs,
+            'bytes': segment.bytes,
+            'file_bytes': os.path.getsize(os.path.join(self.path, segment.name)),
+            'start_us': segment.start_us,
+            'end_us': segment.end_us
+        }
+        if segment.start_us is not None:
+            record['start'] = self._format_timestamp(segment.start_us)
+            record['end'] = self._format_timestamp(segment.end_us)
+        self._finished.append(record)
+
+    def _write_manifest(self):
+        """Replace manifest.json with the finished segments, atomically"""
+        segments = sorted(self._finished, key=lambda record: (record['start_us'] is None, record['start_us'] or 0))
+        timed = [record for record in segments if record['start_us'] is not None]
+        indices = {}
+        for record in segments:
+            indices[record['index']] = indices.get(record['index'], 0) + record['docs']
+        manifest = {
+            'version': 1,
+            'created': self._format_timestamp(self.created),
+            'compression': self.compression,
+            'metadata': self.metadata,
+            'docs': sum(record['docs'] for record in segments),
+            'bytes': sum(record['bytes'] for record in segments),
+            'start_us': min((record['start_us'] for record in timed), default=None),
+            'end_us': max((record['end_us'] for record in timed), default=None),
+            'indices': indices,
+            'segments': segments
+        }
+        temporary = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temporary, os.path.join(self.path, MANIFEST))
+
+    def flush(self):
+        """Push buffered bytes of the open segments to disk"""
+        with self._lock:
+            for segment in self._open.values():
+                segment.file.flush()
+
+    def close(self):
+        """Finish every open segment and write the final manifest"""
+        with self._lock:
+            for segment in list(self._open.values()):
+                self._finish(segment)
+            self._write_manifest()
+
+
+def load_segments(path, start=None, end=None):
+    """Segments of a dataset (or of a directory of per-worker datasets) overlapping [start, end], oldest first
+
+    Each segment is its manifest record plus 'path' and 'compression'.
+    start and end take anything parse_time_us does.
+    """
+    directories = [path]
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        directories = sorted(os.path.join(path, name) for name in os.listdir(path)
+                             if os.path.exists(os.path.join(path, name, MANIFEST)))
+        if not directories:
+            raise ValueError(f'No dataset found in {path}')
+
+    start_us = parse_time_us(start) if start is not None else None
+    end_us = parse_time_us(end) if end is not None else None
+    segments = []
+    for directory in directories:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file)
+        for record in manifest['segments']:
+            if record['start_us'] is not None:
+                if start_us is not None and record['end_us'] < start_us:
+                    continue
+                if end_us is not None and record['start_us'] > end_us:
+                    continue
+            segments.append(dict(record, path=os.path.join(directory, record['file']),
+                                 compression=manifest['compression']))
+    segments.sort(key=lambda record: (record['start_us'] is None, record['start_us'] or 0))
+    return segments
+
+
+def _cut(data, start, end, max_bytes):
+    """Slices of data[start:end] of about max_bytes that end between documents"""
+    while start < end:
+        stop = min(start + max_bytes, end)
+        if stop < end:
+            boundary = data.rfind(DOCUMENT_BOUNDARY, start, stop)
+            if boundary <= start:
+                # A single document larger than max_bytes goes out on its own
+                boundary = data.find(DOCUMENT_BOUNDARY, stop, end)
+                boundary = end - 1 if boundary < 0 else boundary
+            stop = boundary + 1
+        yield data[start:stop]
+        start = stop
+
+
+def read_chunks(path, compression=None, max_bytes=5 * 1024 * 1024):
+    """Bulk bodies of about max_bytes from one segment file, read through a memory map"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if compression is None:
+                # Cut straight out of the page cache, no read buffers in between
+                yield from _cut(data, 0, len(data), max_bytes)
+                return
+
+            if compression == 'gzip':
+                stream = gzip.GzipFile(fileobj=data)
+            elif zstandard is not None:
+                stream = zstandard.ZstdDecompressor().stream_reader(data)
+            else:
+                raise RuntimeError('zstd compression requires the zstandard package')
+            with stream:
+                pending = b''
+                while True:
+                    block = stream.read(max_bytes)
+                    if not block:
+                        break
+                    pending += block
+                    boundary = pending.rfind(DOCUMENT_BOUNDARY)
+                    if boundary < 0:
+                        continue
+                    yield from _cut(pending, 0, boundary + 1, max_bytes)
+                    pending = pending[boundary + 1:]
+                if pending:
+                    yield pending
+
+
+class Retimestamper:
+    """Shifts @timestamp and timestamp.us of serialized documents by a fixed offset without decoding them"""
+
+    def __init__(self, offset_us):
+        self.offset_us = offset_us
+        self._parse = TimestampParser()
+        self._format = TimestampFormatter()
+
+    def __call__(self, line):
+        if not line.startswith(TIMESTAMP_PREFIX):
+            return line
+        timestamp_us = self._parse(line[len(TIMESTAMP_PREFIX):TIMESTAMP_END].decode('ascii')) + self.offset_us
+        rest = line[TIMESTAMP_END:]
+        if rest.startswith(TIMESTAMP_US_PREFIX):
+            end = rest.index(b'}', len(TIMESTAMP_US_PREFIX))
+            shifted = int(rest[len(TIMESTAMP_US_PREFIX):end]) + self.offset_us
+            rest = TIMESTAMP_US_PREFIX + str(shifted).encode('ascii') + rest[end:]
+        return TIMESTAMP_PREFIX + self._format(timestamp_us).encode('ascii') + rest
+
+
+class DatasetReplayer:
+    """Streams a recorded dataset into _bulk over a shared pool of sender threads
+
+    Segments are memory-mapped and cut into requests at document boundaries
+    without parsing anything, so the cost per document is a copy; documents
+    are only touched to retimestamp them. With retimestamp, the dataset's
+    first event is moved to the moment each pass starts. Requests go through
+    the same retrying, adaptive bulk sink as live generation.
+    """
+
+    def __init__(self, es_client, path, concurrency=4, max_bytes=5 * 1024 * 1024, retimestamp=False, start=None,
+                 end=None, sink_config=None):
+        self.segments = load_segments(path, start, end)
+        if not self.segments:
+            raise ValueError(f'No segments of {path} in the requested time range')
+        self.max_bytes = max_bytes
+        self.retimestamp = retimestamp
+        self.pipeline = BulkPipeline(senders=concurrency)
+        self.sink = PipelinedBulkSink(es_client, self.pipeline, **bulk_options(sink_config))
+        self._stop = threading.Event()
+        self.start_time = None
+        self.stats = {
+            'segments_total': len(self.segments),
+            'segments_replayed': 0,
+            'passes': 0
+        }
+
+    def stop(self):
+        """Stop after the current request"""
+        self._stop.set()
+
+    def run(self, passes=1):
+        """Replay the dataset passes times, then wait for every request to finish"""
+        self.start_time = time.monotonic()
+        first_us = min((segment['start_us'] for segment in self.segments if segment['start_us'] is not None),
+                       default=None)
+        try:
+            for _ in range(passes):
+                shift = None
+                if self.retimestamp and first_us is not None:
+                    shift = Retimestamper(now_us() - first_us)
+                for segment in self.segments:
+                    if self._stop.is_set():
+                        return
+                    self._replay_segment(segment, shift)
+                    self.stats['segments_replayed'] += 1
+                self.stats['passes'] += 1
+        finally:
+            self.sink.close()
+            self.pipeline.close()
+
+    def _replay_segment(self, segment, shift):
+        for chunk in read_chunks(segment['path'], segment['compression'], self.max_bytes):
+            if self._stop.is_set():
+                return
+            lines = chunk.splitlines(keepends=True)
+            if len(lines) % 2:
+                # Cut short by an interrupted recording
+                lines.pop()
+            if not lines:
+                continue
+            if not lines[-1].endswith(b'\n'):
+                lines[-1] += b'\n'
+            if shift is not None:
+                lines[1::2] = [shift(line) for line in lines[1::2]]
+            self.sink.add_bulk(segment['index'], lines)
+
+    def get_stats(self):
+        """Replay progress, sink and pipeline statistics"""
+        stats = self.sink.get_stats()
+        stats.update(self.stats)
+        elapsed = time.monotonic() - self.start_time if self.start_time is not None else 0
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        stats['docs_per_second_average'] = round(stats['docs_indexed'] / elapsed, 2) if elapsed > 0 else 0
+        stats['pipeline'] = self.pipeline.get_stats()
+        return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded dataset into Elasticsearch')
+    parser.add_argument('path', help='Dataset directory (or a directory of per-worker datasets)')
+    parser.add_argument('--info', action='store_true', help='List the segments and exit')
+    parser.add_argument('--url', default=None, help='Elasticsearch URL')
+    parser.add_argument('--cloud-id', default=None, help='Elastic Cloud ID')
+    parser.add_argument('--api-key', default=None, help='API key')
+    parser.add_argument('--concurrency', type=int, default=4, help='Bulk requests in flight')
+    parser.add_argument('--max-bytes', type=int, default=5 * 1024 * 1024, help='Bytes per bulk request')
+    parser.add_argument('--retimestamp', action='store_true', help='Move the dataset to start now')
+    parser.add_argument('--passes', type=int, default=1, help='Times to replay the dataset')
+    parser.add_argument('--start', default=None, help='Only replay segments after this time (ISO-8601)')
+    parser.add_argument('--end', default=None, help='Only replay segments before this time (ISO-8601)')
+    parser.add_argument('--bootstrap', action='store_true',
+                        help='Install index templates and load-test settings for the replay, restore them afterwards')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.info:
+        try:
+            segments = load_segments(args.path, args.start, args.end)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+        for segment in segments:
+            print(f"{segment['file']:48} {segment['docs']:>9} docs  {segment['bytes'] / 1e6:>8.1f} MB  "
+                  f"{segment.get('start', '-')} → {segment.get('end', '-')}")
+        print(f"📦 {len(segments)} segments, {sum(segment['docs'] for segment in segments)} documents")
+        return 0
+
+    if not args.url and not args.cloud_id:
+        print("❌ --url or --cloud-id is required", file=sys.stderr)
+        return 1
+    from elasticsearch import Elasticsearch
+    es_config = {'request_timeout': 30, 'max_retries': 3, 'retry_on_timeout': True}
+    if args.cloud_id:
+        es_config['cloud_id'] = args.cloud_id
+    else:
+        es_config['hosts'] = [args.url]
+    if args.api_key:
+        es_config['api_key'] = args.api_key
+
+    es_client = Elasticsearch(**es_config)
+    try:
+        replayer = DatasetReplayer(es_client, args.path, concurrency=args.concurrency,
+                                   max_bytes=args.max_bytes, retimestamp=args.retimestamp, start=args.start,
+                                   end=args.end)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    bootstrap = None
+    if args.bootstrap:
+        from index_bootstrap import IndexBootstrap
+        bootstrap = IndexBootstrap(es_client)
+        try:
+            bootstrap.install()
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+
+    print(f"▶️  Replaying {len(replayer.segments)} segments x{args.passes} with {args.concurrency} senders",
+          file=sys.stderr)
+    try:
+        replayer.run(args.passes)
+    except KeyboardInterrupt:
+        replayer.stop()
+    finally:
+        if bootstrap:
+            bootstrap.restore()
+    stats = replayer.get_stats()
+    print(f"✅ {stats['docs_indexed']} documents in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['docs_per_second_average']:,.0f} docs/sec), {stats['docs_failed']} failed", file=sys.stderr)
+    return 0 if stats['docs_failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,7 +17,10 @@ class DemoScenarios:
                 'duration_minutes': 15,
                 'error_rate': 0.05,
                 'latency_multiplier': 3.0,
-                'affected_services': ['search-service', 'recommendation-engine', 'checkout-service']
+                'affected_services': ['search-service', 'recommendation-engine', 'checkout-service'],
+                # 10x traffic: ramp up over 2 minutes after the first, hold for 10, ramp back down
+                'rate_profile': {'type': 'spike', 'multiplier': 10, 'start_seconds': 60, 'ramp_seconds': 120,
+                                 'hold_seconds': 600}
             },
             'payment-failures': {
                 'name': 'Payment Gateway Failures',
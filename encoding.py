@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Document encoding for the Observability Data Generator
+Fast JSON serialization and pre-encoded document templates for trace events
+"""
+
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj):
+        """Serialize to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=str)
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+    def dumps(obj):
+        """Serialize to compact UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+
+_MARKER = re.compile(r'"@@(\d+)@@"')
+
+
+def compile_template(document, fields):
+    """Turn a document into a str.format template for its variable fields
+
+    fields is a sequence of (path, is_string) pairs; path is the tuple of keys
+    leading to a value that changes per event. The document is mutated, so
+    pass a freshly built one.
+    """
+    for position, (path, _) in enumerate(fields):
+        parent = document
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = f'@@{position}@@'
+
+    text = dumps(document).decode('utf-8').replace('{', '{{').replace('}', '}}')
+
+    def placeholder(match):
+        position = int(match.group(1))
+        return f'"{{{position}}}"' if fields[position][1] else f'{{{position}}}'
+
+    return _MARKER.sub(placeholder, text) + '\n'
+
+
+class TraceEncoder:
+    """Encodes transactions and spans by filling cached templates instead of serializing whole dicts
+
+    Everything that is fixed for a service, node, transaction name and outcome
+    (agent, observer, processor, labels, url, service.language, ...) is
+    serialized once. Per event only timestamps, ids, durations, counts, host
+    names and addresses are formatted in. The bytes match encoding the
+    generator's dict documents with dumps().
+    """
+
+    # Variable fields of a transaction; the last two differ between entry and downstream transactions
+    TRANSACTION_FIELDS = (
+        (('@timestamp',), True),
+        (('timestamp', 'us'), False),
+        (('trace', 'id'), True),
+        (('transaction', 'id'), True),
+        (('transaction', 'duration', 'us'), False),
+        (('transaction', 'span_count', 'started'), False),
+        (('host', 'hostname'), False),
+        (('host', 'name'), False),
+        (('host', 'ip'), True),
+        (('client', 'ip'), True)
+    )
+    ENTRY_FIELDS = TRANSACTION_FIELDS
+    DOWNSTREAM_FIELDS = TRANSACTION_FIELDS + ((('parent', 'id'), True),)
+
+    SPAN_FIELDS = (
+        (('@timestamp',), True),
+        (('timestamp', 'us'), False),
+        (('trace', 'id'), True),
+        (('parent', 'id'), True),
+        (('span', 'id'), True),
+        (('span', 'duration', 'us'), False)
+    )
+
+    # With entity pools, node and host names take too many values to key templates by; they are filled in instead
+    INSTANCE_FIELDS = (
+        (('service', 'node', 'name'), True),
+        (('agent', 'ephemeral_id'), True),
+        (('container', 'id'), True),
+        (('kubernetes', 'pod', 'name'), True),
+        (('kubernetes', 'node', 'name'), True)
+    )
+    VISITOR_FIELDS = (
+        (('user', 'id'), True),
+        (('session', 'id'), True)
+    )
+    POOLED_TRANSACTION_FIELDS = tuple((path, True) if path[0] == 'host' else (path, is_string)
+                                      for path, is_string in TRANSACTION_FIELDS)
+    POOLED_ENTRY_FIELDS = POOLED_TRANSACTION_FIELDS + INSTANCE_FIELDS + VISITOR_FIELDS
+    POOLED_DOWNSTREAM_FIELDS = POOLED_TRANSACTION_FIELDS + ((('parent', 'id'), True),) + INSTANCE_FIELDS
+    POOLED_SPAN_FIELDS = SPAN_FIELDS + ((('service', 'node', 'name'), True),)
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.pooled = generator.entities is not None
+        self.format_timestamp = generator.format_timestamp
+        self._transactions = {}
+        self._spans = {}
+        self._strings = {}
+
+    def _string(self, value):
+        """JSON-encoded form of a string that comes from a small fixed set (host names)"""
+        encoded = self._strings.get(value)
+        if encoded is None:
+            encoded = self._strings[value] = dumps(value).decode('utf-8')
+        return encoded
+
+    def transaction(self, service, trace_id, transaction_id, transaction_us, duration_us, is_error, span_count,
+                    transaction, node_name, host, client_ip, parent_id=None, user_agent=None, instance=None,
+                    visitor=None):
+        """Encoded line for a transaction; same arguments as the generator's _transaction_document"""
+        if instance is not None:
+            return self._pooled_transaction(service, trace_id, transaction_id, transaction_us, duration_us, is_error,
+                                            span_count, transaction, host, client_ip, parent_id, user_agent,
+                                            instance, visitor)
+        key = (service.name, transaction, is_error, node_name, user_agent)
+        template = self._transactions.get(key)
+        if template is None:
+            document = self.generator._transaction_document(
+                service, '', '', 0, 0, is_error, 0, transaction, node_name,
+                {'hostname': '', 'name': '', 'ip': ''}, '', parent_id, user_agent
+            )
+            fields = self.ENTRY_FIELDS if parent_id is None else self.DOWNSTREAM_FIELDS
+            template = self._transactions[key] = compile_template(document, fields).format
+
+        return template(
+            self.format_timestamp(transaction_us), transaction_us, trace_id, transaction_id, duration_us,
+            span_count, self._string(host['hostname']), self._string(host['name']), host['ip'], client_ip,
+            parent_id
+        ).encode('utf-8')
+
+    def _pooled_transaction(self, service, trace_id, transaction_id, transaction_us, duration_us, is_error,
+                            span_count, transaction, host, client_ip, parent_id, user_agent, instance, visitor):
+        """Encoded transaction from a template keyed without node names, which are filled in"""
+        key = (service.name, transaction, is_error, parent_id is None, user_agent)
+        template = self._transactions.get(key)
+        if template is None:
+            blank_visitor = None if visitor is None else visitor._make(('',) * len(visitor))
+            document = self.generator._transaction_document(
+                service, '', '', 0, 0, is_error, 0, transaction, '', {'hostname': '', 'name': '', 'ip': ''}, '',
+                parent_id, user_agent, instance._make(('',) * len(instance)), blank_visitor
+            )
+            fields = self.POOLED_ENTRY_FIELDS if parent_id is None else self.POOLED_DOWNSTREAM_FIELDS
+            template = self._transactions[key] = compile_template(document, fields).format
+
+        values = [self.format_timestamp(transaction_us), transaction_us, trace_id, transaction_id, duration_us,
+                  span_count, host['hostname'], host['name'], host['ip'], client_ip]
+        if parent_id is not None:
+            values.append(parent_id)
+        values.extend((instance.node_name, instance.ephemeral_id, instance.container_id, instance.node_name,
+                       instance.host_name))
+        if visitor is not None:
+            values.extend((visitor.user_id, visitor.session_id))
+        return template(*values).encode('utf-8')
+
+    def span(self, trace_id, parent_id, span_id, caller, service, span_us, duration_us, is_error, node_name,
+             statement):
+        """Encoded line for an exit span; same arguments as the generator's _span_document"""
+        if self.pooled:
+            key = (caller.name, service.name, is_error, statement)
+            template = self._spans.get(key)
+            if template is None:
+                document = self.generator._span_document('', '', '', caller, service, 0, 0, is_error, '', statement)
+                template = self._spans[key] = compile_template(document, self.POOLED_SPAN_FIELDS).format
+            return template(self.format_timestamp(span_us), span_us, trace_id, parent_id, span_id, duration_us,
+                            node_name).encode('utf-8')
+
+        key = (caller.name, service.name, is_error, node_name, statement)
+        template = self._spans.get(key)
+        if template is None:
+            document = self.generator._span_document('', '', '', caller, service, 0, 0, is_error, node_name,
+                                                     statement)
+            template = self._spans[key] = compile_template(document, self.SPAN_FIELDS).format
+
+        return template(self.format_timestamp(span_us), span_us, trace_id, parent_id, span_id,
+                        duration_us).encode('utf-8')
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Entity pools for the Observability Data Generator
+High-cardinality hosts, pods, containers, users, sessions and IPs with Zipf popularity, sampled in O(1)
+"""
+
+import functools
+import math
+import zlib
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MASK64 = (1 << 64) - 1
+
+# Pool sizes used when a job just asks for entity pools; industries override what differs
+DEFAULT_SIZES = {'hosts': 500, 'pods': 100, 'users': 100000}
+INDUSTRY_SIZES = {
+    'ecommerce': {'users': 1000000},
+    'banking': {'users': 500000},
+    'insurance': {'users': 200000},
+    'gaming': {'users': 2000000, 'pods': 300},
+    'healthcare': {'users': 300000},
+    'logistics': {'hosts': 1000, 'users': 50000}
+}
+MAX_POOL_SIZE = 50000000
+# Hosts are numbered into 10.0.0.0/8, which has room for 2^24 - 1 of them after skipping 10.0.0.0
+MAX_SIZES = {'hosts': (1 << 24) - 1}
+
+# Characters Kubernetes uses for generated name suffixes (no vowels, no look-alikes)
+POD_ALPHABET = 'bcdfghjklmnpqrstvwxz2456789'
+
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14.2; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPad; CPU OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.6099.144 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.6099.144 Mobile Safari/537.36',
+    'okhttp/4.12.0',
+    'python-requests/2.31.0'
+)
+
+# Drawn per pod and per visitor; pool-generated values are plain ASCII, safe to format into JSON templates
+Instance = namedtuple('Instance', ('node_name', 'host_name', 'host_ip', 'container_id', 'ephemeral_id'))
+Visitor = namedtuple('Visitor', ('user_id', 'session_id', 'client_ip', 'user_agent'))
+
+
+def mix64(value):
+    """SplitMix64 finalizer: a well-spread 64-bit hash of an integer"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def _alias_tables(size, exponent):
+    """Vose's alias tables for ranks weighted 1 / (rank + 1) ** exponent"""
+    if numpy is not None:
+        weights = 1.0 / numpy.arange(1, size + 1, dtype=numpy.float64) ** exponent
+        scaled = array('d', (weights * (size / weights.sum())).tobytes())
+    else:
+        weights = [1.0 / (rank + 1) ** exponent for rank in range(size)]
+        factor = size / math.fsum(weights)
+        scaled = array('d', (weight * factor for weight in weights))
+        del weights
+
+    threshold = array('d', bytes(8 * size))
+    alias = array('i', bytes(4 * size))
+    small = [rank for rank in range(size) if scaled[rank] < 1.0]
+    large = [rank for rank in range(size) if scaled[rank] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large[-1]
+        threshold[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        if scaled[more] < 1.0:
+            small.append(large.pop())
+    # What is left is 1.0 up to rounding error
+    for rank in small + large:
+        threshold[rank] = 1.0
+        alias[rank] = rank
+    return threshold, alias
+
+
+class ZipfSampler:
+    """Draws ranks 0..size-1 with probability proportional to 1 / (rank + 1) ** exponent (alias method)
+
+    Only two flat arrays are kept, a float64 threshold and an int32 alias
+    per rank (12 bytes per entity), and a draw is one random number, an
+    index and a comparison whatever the size.
+    """
+
+    def __init__(self, size, exponent=1.0):
+        self.size = size
+        self.exponent = exponent
+        self.threshold, self.alias = _alias_tables(size, exponent)
+        if numpy is not None:
+            # Zero-copy views for batch draws
+            self._thresholds = numpy.frombuffer(self.threshold, dtype=numpy.float64)
+            self._aliases = numpy.frombuffer(self.alias, dtype=numpy.int32)
+
+    def sample(self, rng):
+        """One rank drawn with a random.Random"""
+        position = rng.random() * self.size
+        rank = int(position)
+        return rank if position - rank < self.threshold[rank] else self.alias[rank]
+
+    def sample_array(self, rng, shape):
+        """Array of ranks drawn with a numpy.random.Generator"""
+        positions = rng.random(shape) * self.size
+        ranks = positions.astype(numpy.int64)
+        return numpy.where(positions - ranks < self._thresholds[ranks], ranks, self._aliases[ranks])
+
+    @property
+    def nbytes(self):
+        return self.threshold.itemsize * len(self.threshold) + self.alias.itemsize * len(self.alias)
+
+
+@functools.lru_cache(maxsize=16)
+def zipf_sampler(size, exponent=1.0):
+    """Shared read-only sampler, so generators and jobs in one process build each table once"""
+    return ZipfSampler(size, exponent)
+
+
+class EntityPool:
+    """Entity ids 0..size-1 with Zipf popularity; the popular ids are spread over the range, not bunched at 0"""
+
+    def __init__(self, size, exponent=1.0):
+        self.size = size
+        self.sampler = zipf_sampler(size, exponent)
+        # Ranks map to ids through a stride coprime with the size, a permutation that needs no table
+        stride = 2654435761 % size or 1
+        while math.gcd(stride, size) != 1:
+            stride += 1
+        self.stride = stride
+
+    def sample(self, rng):
+        """One entity id drawn with a random.Random"""
+        return self.sampler.sample(rng) * self.stride % self.size
+
+    def sample_array(self, rng, shape):
+        """Array of entity ids drawn with a numpy.random.Generator"""
+        return self.sampler.sample_array(rng, shape) * self.stride % self.size
+
+
+def resolve_sizes(industry, config):
+    """Pool sizes for an industry from an entities option (True or a dict of overrides); raises ValueError"""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    if not isinstance(config, dict):
+        raise ValueError('entities must be true or an object of pool sizes')
+    unknown = set(config) - set(DEFAULT_SIZES) - {'exponent', 'session_minutes'}
+    if unknown:
+        raise ValueError(f'Unknown entity pool options: {", ".join(sorted(unknown))}')
+
+    options = dict(DEFAULT_SIZES, **INDUSTRY_SIZES.get(industry, {}))
+    options.update(exponent=1.0, session_minutes=30)
+    options.update(config)
+    for name in DEFAULT_SIZES:
+        size = options[name]
+        limit = MAX_SIZES.get(name, MAX_POOL_SIZE)
+        if not isinstance(size, int) or isinstance(size, bool) or not 1 <= size <= limit:
+            raise ValueError(f'entities.{name} must be an integer between 1 and {limit}')
+    for name in ('exponent', 'session_minutes'):
+        if not isinstance(options[name], (int, float)) or options[name] <= 0:
+            raise ValueError(f'entities.{name} must be a positive number')
+    return options
+
+
+class EntityPools:
+    """The hosts, pods, containers, users, sessions and IPs of one industry's fleet and customer base
+
+    Nothing is stored per entity besides the sampling tables: names, addresses
+    and ids are derived from the entity id by hashing, so a pod always runs
+    on the same host in the same container and a user keeps their IP and
+    browser. Sessions are a user's activity within a session_minutes window.
+    Recently built instances and visitors are kept in small LRU caches, which
+    the Zipf skew makes effective.
+    """
+
+    def __init__(self, industry, hosts, pods, users, exponent=1.0, session_minutes=30, cache_size=65536):
+        self.industry = industry
+        self.hosts = EntityPool(hosts, exponent)
+        self.pods = EntityPool(pods, exponent)
+        self.users = EntityPool(users, exponent)
+        self.session_us = int(session_minutes * 60 * 1000000)
+        # Stable across runs and processes, unlike hash()
+        self._salt = mix64(zlib.crc32(industry.encode('utf-8')))
+        self.instance = functools.lru_cache(maxsize=cache_size)(self._instance)
+        self._user = functools.lru_cache(maxsize=cache_size)(self._user_attributes)
+
+    def _key(self, *parts):
+        key = self._salt
+        for part in parts:
+            key = mix64(key ^ part)
+        return key
+
+    def host_ip(self, host):
+        """Private address of a host"""
+        host += 1
+        return f'10.{host >> 16 & 255}.{host >> 8 & 255}.{host & 255}'
+
+    def host_name(self, host):
+        """Host name in the style of cloud VMs, derived from the address"""
+        host += 1
+        return f'ip-10-{host >> 16 & 255}-{host >> 8 & 255}-{host & 255}.{self.industry}.internal'
+
+    def sample_host_ip(self, rng):
+        """Address of a host drawn by popularity"""
+        return self.host_ip(self.hosts.sample(rng))
+
+    def _instance(self, service_name, pod):
+        """Pod, container, host and agent of one instance of a service"""
+        service_key = self._key(zlib.crc32(service_name.encode('utf-8')))
+        key = mix64(service_key ^ pod)
+
+        # <deployment>-<replica set hash>-<5 character pod suffix>, like a Kubernetes deployment's pods
+        replica_set = f'{service_key & 0xffffffffff:010x}'
+        suffix, value = [], key
+        for _ in range(5):
+            value, digit = divmod(value, len(POD_ALPHABET))
+            suffix.append(POD_ALPHABET[digit])
+        node_name = f'{service_name}-{replica_set}-{"".join(suffix)}'
+
+        host = key % self.hosts.size
+        container = ''.join(f'{mix64(key + part):016x}' for part in range(4))
+        high, low = mix64(key ^ 0xa9e7), mix64(key ^ 0x5eed)
+        ephemeral_id = (f'{high >> 32:08x}-{high >> 16 & 0xffff:04x}-4{high & 0xfff:03x}-'
+                        f'{0x8000 | low >> 48 & 0x3fff:04x}-{low & 0xffffffffffff:012x}')
+        return Instance(node_name, self.host_name(host), self.host_ip(host), container, ephemeral_id)
+
+    def sample_instance(self, service_name, rng):
+        """Instance of a service drawn by popularity"""
+        return self.instance(service_name, self.pods.sample(rng))
+
+    def _user_attributes(self, user):
+        """(user id, client IP, user agent) of one user"""
+        key = self._key(user, 0x05e4)
+        # Public-looking address; 10.x and 127.x are left out
+        client_ip = f'{11 + (key & 0xff) % 115}.{key >> 8 & 255}.{key >> 16 & 255}.{1 + (key >> 24 & 255) % 254}'
+        return f'user-{user:08d}', client_ip, USER_AGENTS[(key >> 32) % len(USER_AGENTS)]
+
+    def visitor(self, user, timestamp_us):
+        """User, session, address and browser behind an entry transaction at the given time"""
+        user_id, client_ip, user_agent = self._user(user)
+        session = self._key(user, timestamp_us // self.session_us)
+        return Visitor(user_id, f'{session:016x}', client_ip, user_agent)
+
+    def sample_visitor(self, rng, timestamp_us):
+        """Visitor drawn by popularity"""
+        return self.visitor(self.users.sample(rng), timestamp_us)
+
+    def get_stats(self):
+        """Pool sizes and the memory their sampling tables use"""
+        pools = {'hosts': self.hosts, 'pods': self.pods, 'users': self.users}
+        return {
+            'sizes': {name: pool.size for name, pool in pools.items()},
+            'table_bytes': sum(pool.sampler.nbytes for pool in pools.values())
+        }
+
+
+def create_entity_pools(industry, config):
+    """EntityPools for an industry from an entities option, or None when it is off; raises ValueError"""
+    options = resolve_sizes(industry, config)
+    if options is None:
+        return None
+    return EntityPools(industry, **options)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Fast ID and timestamp helpers for the Observability Data Generator
+W3C trace-context ids drawn in bulk from a PRNG, and an integer-microsecond time base
+"""
+
+import calendar
+import random
+import time
+from datetime import datetime, timezone
+
+
+class IdGenerator:
+    """Hands out W3C ids (16 hex chars for spans, 32 for traces) from a bulk-refilled pool"""
+
+    INVALID_ID = '0' * 16
+
+    def __init__(self, rng=None, batch_size=4096):
+        self.rng = rng if rng is not None else random.Random()
+        self.batch_size = batch_size
+        self._ids = []
+
+    def _refill(self):
+        """Draw batch_size random 64-bit ids in one call"""
+        count = self.batch_size
+        data = self.rng.getrandbits(64 * count).to_bytes(8 * count, 'big').hex()
+        # All-zero ids are invalid in trace-context; drop the (astronomically rare) occurrence
+        self._ids = [data[i:i + 16] for i in range(0, 16 * count, 16) if data[i:i + 16] != self.INVALID_ID]
+
+    def span_id(self):
+        """64-bit id used for spans and transactions"""
+        if not self._ids:
+            self._refill()
+        return self._ids.pop()
+
+    def trace_id(self):
+        """128-bit trace id"""
+        if len(self._ids) < 2:
+            self._refill()
+        ids = self._ids
+        return ids.pop() + ids.pop()
+
+    def uuid(self):
+        """Random UUID-formatted string (version 4 layout) for ids like agent.ephemeral_id"""
+        h = self.trace_id()
+        return f'{h[:8]}-{h[8:12]}-4{h[13:16]}-{"89ab"[int(h[16], 16) & 3]}{h[17:20]}-{h[20:]}'
+
+
+def now_us():
+    """Current wall-clock time in integer microseconds since the epoch"""
+    return time.time_ns() // 1000
+
+
+def parse_time_us(value):
+    """Convert epoch seconds, a datetime or an ISO-8601 string to epoch microseconds"""
+    if isinstance(value, (int, float)):
+        return int(value * 1000000)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+class VirtualClock:
+    """Simulated time that starts at a fixed instant and advances a fixed step per event"""
+
+    def __init__(self, start_us, events_per_second):
+        self.now_us = start_us
+        self.set_rate(events_per_second)
+
+    def set_rate(self, events_per_second):
+        """Change how far each event moves the clock"""
+        self.step_us = 1000000 / events_per_second if events_per_second > 0 else 0
+        self._fraction = 0.0
+
+    def __call__(self):
+        current = self.now_us
+        self._fraction += self.step_us
+        whole = int(self._fraction)
+        self._fraction -= whole
+        self.now_us += whole
+        return current
+
+
+class TimestampFormatter:
+    """Formats integer microseconds as ISO-8601 UTC, caching the per-second prefix"""
+
+    def __init__(self, cache_size=64):
+        self.cache_size = cache_size
+        self._prefixes = {}
+
+    def __call__(self, timestamp_us):
+        second, micros = divmod(timestamp_us, 1000000)
+        prefix = self._prefixes.get(second)
+        if prefix is None:
+            if len(self._prefixes) >= self.cache_size:
+                self._prefixes.clear()
+            prefix = self._prefixes[second] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        return f'{prefix}.{micros:06d}Z'
+
+
+class TimestampParser:
+    """Parses TimestampFormatter output (YYYY-MM-DDTHH:MM:SS.ffffffZ) back to microseconds, caching per second"""
+
+    def __init__(self, cache_size=64):
+        self.cache_size = cache_size
+        self._seconds = {}
+
+    def __call__(self, text):
+        prefix = text[:19]
+        second = self._seconds.get(prefix)
+        if second is None:
+            if len(self._seconds) >= self.cache_size:
+                self._seconds.clear()
+            second = self._seconds[prefix] = calendar.timegm(time.strptime(prefix, '%Y-%m-%dT%H:%M:%S'))
+        return second * 1000000 + int(text[20:26])
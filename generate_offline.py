@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Offline generation for the Observability Data Generator
+Writes datasets to a file/stdout sink or measures raw generation speed without a cluster
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from generator_enhanced import EnhancedObservabilityGenerator, IndustryConfig
+from demo_scenarios import DemoScenarios
+from backfill import BackfillRunner
+from instrumentation import stage_timer
+from rate_profiles import create_profile
+from sinks import create_sink
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate observability data without Elasticsearch')
+    parser.add_argument('--industry', default='ecommerce', choices=sorted(IndustryConfig.INDUSTRIES))
+    parser.add_argument('--scenario', default=None, help='Scenario key from demo_scenarios.py')
+    parser.add_argument('--events', type=int, default=100000, help='Approximate number of events to generate')
+    parser.add_argument('--batch', type=int, default=1000, help='Events per generate_batch call')
+    parser.add_argument('--sink', default='memory', choices=['file', 'dataset', 'stdout', 'memory'])
+    parser.add_argument('--output', default='dataset.ndjson',
+                        help='Output path for the file sink, or directory for the dataset sink')
+    parser.add_argument('--compression', default=None, choices=['gzip', 'zstd'])
+    parser.add_argument('--encode', action='store_true', help='Serialize documents in the memory sink')
+    parser.add_argument('--trace-depth', type=int, default=3, help='Maximum depth of service calls per trace')
+    parser.add_argument('--fan-out', type=int, default=3, help='Maximum dependencies called per service (0 = all)')
+    parser.add_argument('--vectorized', action='store_true', help='Draw trace attributes in NumPy batches')
+    parser.add_argument('--entities', type=json.loads, default=None,
+                        help='High-cardinality entity pools: true, or sizes as JSON, e.g. \'{"users": 2000000}\'')
+    parser.add_argument('--correlated-logs', type=float, nargs='?', const=1.0, default=None, metavar='SHARE',
+                        help='Emit logs inside traces; SHARE of normal spans log (errors and slow ones always do)')
+    parser.add_argument('--apm-metrics', type=float, nargs='?', const=1.0, default=None, metavar='SAMPLE_RATE',
+                        help='Write 1-minute APM metric documents; index only SAMPLE_RATE of the traces as documents')
+    parser.add_argument('--instrument', action='store_true', help='Print time spent per generation stage')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible output')
+    parser.add_argument('--start-time', default=None,
+                        help='Fixed start time (ISO-8601 or epoch seconds) for simulated timestamps')
+    parser.add_argument('--end-time', default=None,
+                        help='Backfill from --start-time to this time instead of generating --events')
+    parser.add_argument('--rate', type=int, default=1000, help='Simulated events/second when --start-time is set')
+    parser.add_argument('--rate-profile', type=json.loads, default=None,
+                        help='Backfill rate profile as JSON, e.g. \'{"type": "diurnal", "amplitude": 0.8}\'')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    scenario = None
+    if args.scenario:
+        scenario = DemoScenarios.get_scenario(args.industry, args.scenario)
+        if scenario is None:
+            print(f"❌ Unknown scenario '{args.scenario}' for {args.industry}", file=sys.stderr)
+            return 1
+
+    sink_config = {
+        'type': args.sink,
+        'path': args.output,
+        'encode': args.encode,
+        'metadata': {
+            'industry': args.industry,
+            'scenario': args.scenario,
+            'seed': args.seed,
+            'start_time': args.start_time,
+            'rate': args.rate,
+            'entities': args.entities,
+            'correlated_logs': args.correlated_logs,
+            'apm_metrics': args.apm_metrics
+        }
+    }
+    # Only when given, so the dataset sink keeps its default compression
+    if args.compression:
+        sink_config['compression'] = args.compression
+    try:
+        sink = create_sink(sink_config)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    start_time, end_time = (
+        float(value) if value is not None and value.replace('.', '', 1).isdigit() else value
+        for value in (args.start_time, args.end_time)
+    )
+    if end_time is not None and start_time is None:
+        print("❌ --end-time requires --start-time", file=sys.stderr)
+        return 1
+    if args.rate_profile and end_time is None:
+        print("❌ --rate-profile requires --end-time", file=sys.stderr)
+        return 1
+
+    apm_metrics = None if args.apm_metrics is None else {'sample_rate': args.apm_metrics}
+    try:
+        generator = EnhancedObservabilityGenerator(None, args.industry, scenario=scenario, sink=sink,
+                                                   max_depth=args.trace_depth, max_fan_out=args.fan_out or None,
+                                                   seed=args.seed, start_time=start_time,
+                                                   events_per_second=args.rate, vectorized=args.vectorized,
+                                                   entities=args.entities, correlated_logs=args.correlated_logs,
+                                                   apm_metrics=apm_metrics)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    stage_timer.enable(args.instrument)
+    start = time.perf_counter()
+    if end_time is not None:
+        runner = BackfillRunner(generator, start_time, end_time, events_per_second=args.rate, chunk_size=args.batch)
+        try:
+            profile = create_profile(args.rate_profile, args.rate, runner.start_us)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+        if profile:
+            runner.set_profile(profile)
+        runner.run()
+    else:
+        generated = 0
+        while generated < args.events:
+            batch = min(args.batch, args.events - generated)
+            generator.generate_batch(batch)
+            generated += batch
+        generator.close()
+    elapsed = time.perf_counter() - start
+
+    stats = sink.get_stats()
+    docs = stats['docs_indexed']
+    print(f"✅ {docs} documents in {elapsed:.2f}s ({docs / elapsed:,.0f} docs/sec)", file=sys.stderr)
+    if args.sink in ('file', 'dataset'):
+        print(f"📁 Wrote {args.output}", file=sys.stderr)
+    if args.instrument:
+        for stage, summary in stage_timer.summary().items():
+            print(f"⏱️  {stage:14} {summary['count']:>9} calls  {summary['total_seconds']:>8.3f}s  "
+                  f"{summary['mean_us']:>10.2f} µs avg", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
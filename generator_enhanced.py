@@ -6,11 +6,27 @@ Generates proper distributed traces with accurate parent-child relationships
 
 import random
 import time
-from datetime import datetime, timedelta
-from faker import Faker
-import uuid
 
-fake = Faker()
+from fast_ids import IdGenerator, TimestampFormatter, VirtualClock, now_us, parse_time_us
+from sinks import ElasticsearchBulkSink
+from apm_metrics import ApmMetricsAggregator, apm_metrics_options
+from encoding import TraceEncoder
+from entity_pools import create_entity_pools
+from instrumentation import stage_timer
+from stats import StatsCollector, window_rates
+from trace_plan import get_trace_plan
+from vectorized import VectorizedTraceBuilder
+
+
+def correlated_log_share(value):
+    """Share of normal spans and transactions that log, from a correlated_logs option (True or 0-1); raises ValueError"""
+    if value is None or value is False:
+        return None
+    if value is True:
+        return 1.0
+    if not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError('correlated_logs must be true or a share between 0 and 1')
+    return float(value)
 
 class IndustryConfig:
     """Industry-specific service configurations with realistic dependencies"""
@@ -164,21 +180,84 @@ class IndustryConfig:
 class EnhancedObservabilityGenerator:
     """Enhanced generator with high-quality distributed traces"""
     
-    def __init__(self, es_client, industry='ecommerce', scenario=None, use_llm=False, llm_provider='openai', llm_api_key=''):
+    # Share of events per signal, in per-mille so the split stays exact over time
+    SIGNAL_MIX = (('traces', 600), ('logs', 300), ('synthetics', 100))
+    
+    # Static document fragments shared by every event (never mutated after creation)
+    OUTCOME_SUCCESS = {'outcome': 'success'}
+    OUTCOME_FAILURE = {'outcome': 'failure'}
+    TRANSACTION_PROCESSOR = {'event': 'transaction', 'name': 'transaction'}
+    SPAN_PROCESSOR = {'event': 'span', 'name': 'transaction'}
+    OBSERVER = {'version': '8.0.0', 'type': 'apm-server'}
+    SPAN_AGENT = {'name': 'python', 'version': '6.15.0'}
+    SERVICE_LANGUAGE = {'name': 'python', 'version': '3.9.0'}
+    USER_AGENTS = (
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0',
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X)'
+    )
+    CACHE_COMMANDS = ('GET', 'SET', 'HGETALL', 'ZADD')
+    DB_STATEMENTS = {
+        'postgresql': (
+            'SELECT * FROM users WHERE id = $1',
+            'UPDATE products SET stock = stock - 1 WHERE id = $1',
+            'INSERT INTO orders (user_id, total) VALUES ($1, $2)',
+            'SELECT * FROM accounts WHERE user_id = $1 AND active = true'
+        ),
+        'mongodb': (
+            'db.products.find({category: "electronics"})',
+            'db.users.updateOne({_id: ObjectId()}, {$set: {lastLogin: new Date()}})',
+            'db.orders.aggregate([{$match: {status: "pending"}}])'
+        )
+    }
+    # Correlated logs warn above these latencies: 1s for transactions, twice the usual maximum for exit spans
+    SLOW_TRANSACTION_US = 1000000
+    SLOW_SPAN_FACTOR = 2
+    
+    def __init__(self, es_client, industry='ecommerce', scenario=None, use_llm=False, llm_provider='openai', llm_api_key='', sink=None,
+                 max_depth=3, max_fan_out=3, clock=None, seed=None, start_time=None, events_per_second=17,
+                 vectorized=False, entities=None, correlated_logs=None, apm_metrics=None):
         self.es = es_client
+        self.sink = sink if sink is not None else ElasticsearchBulkSink(es_client)
         self.industry = industry
         self.config = IndustryConfig.INDUSTRIES[industry]
         self.services = self.config['services']
         self.dependencies = self.config['dependencies']
         self.scenario = scenario
         
-        # Statistics
-        self.stats = {
-            'traces_generated': 0,
-            'logs_generated': 0,
-            'synthetics_generated': 0,
-            'start_time': time.time()
-        }
+        # Shape of distributed traces: how deep calls go and how many dependencies each service calls
+        self.max_depth = max_depth
+        self.max_fan_out = max_fan_out
+        
+        # Private random stream: a seed makes every attribute, id and timestamp reproducible
+        self.seed = seed
+        self.rng = random.Random(seed)
+        
+        # W3C ids from a bulk-refilled pool and an integer-microsecond time base
+        self.ids = IdGenerator(random.Random(self.rng.getrandbits(64)))
+        if clock is None and start_time is not None:
+            # Simulated time: each event advances the clock by 1/events_per_second from a fixed start
+            clock = VirtualClock(parse_time_us(start_time), events_per_second)
+        self.clock = clock if clock is not None else now_us
+        # Latest instant any document may be stamped with (set by backfills), None for no limit
+        self.end_us = None
+        self.format_timestamp = TimestampFormatter()
+        self._agents = {}
+        
+        # Optional high-cardinality hosts, pods, users and sessions in place of the few fixed names per service
+        self.entities = create_entity_pools(industry, entities)
+        
+        # Optional logs written alongside the spans and transactions of each trace, carrying their ids
+        self.correlated_logs = correlated_log_share(correlated_logs)
+        self._log_index = f'logs-{industry}'
+        self._log_hosts = {}
+        
+        # Statistics: per-thread counters with rolling rates, safe to read from request threads
+        self.stats = StatsCollector()
+        self.start_time = time.time()
+        
+        # Fractional events carried between batches (per-mille units)
+        self._mix_carry = {signal: 0 for signal, _ in self.SIGNAL_MIX}
         
         # Service metadata for realistic spans
         self.service_types = {
@@ -188,23 +267,28 @@ class EnhancedObservabilityGenerator:
             'external': ['payment', 'shipping', 'notification', 'integration'],
             'storage': ['s3', 'gcs', 'blob']
         }
-    
-    def _get_service_type(self, service_name):
-        """Determine service type for proper span configuration"""
-        service_lower = service_name.lower()
-        
-        if any(x in service_lower for x in ['redis', 'cache', 'memcached']):
-            return 'cache', 'redis'
-        elif any(x in service_lower for x in ['postgres', 'mysql', 'db']):
-            return 'db', 'postgresql'
-        elif any(x in service_lower for x in ['mongo']):
-            return 'db', 'mongodb'
-        elif any(x in service_lower for x in ['kafka', 'queue', 'rabbitmq']):
-            return 'messaging', 'kafka'
-        elif any(x in service_lower for x in ['s3', 'storage', 'blob']):
-            return 'storage', 's3'
-        else:
-            return 'external', 'http'
+        
+        # Compile the industry's services and dependencies once, then reuse for every trace
+        self.plan = get_trace_plan(industry, self.config)
+        self._error_rate = self._get_error_rate()
+        self._latency_multipliers = {name: self._get_latency_multiplier(name) for name in self.plan.services}
+        self._span_labels = {
+            'industry': industry,
+            'environment': 'production'
+        }
+        self._transaction_labels = dict(self._span_labels)
+        if scenario:
+            self._transaction_labels['scenario'] = scenario.get('name', 'unknown')
+        
+        # Optional 1-minute transaction and service-destination metrics, with trace sampling on top
+        options = apm_metrics_options(apm_metrics)
+        self.apm_metrics = ApmMetricsAggregator(self, **options) if options else None
+        
+        # Serialize traces from cached per-service templates when the sink accepts encoded lines
+        self._encoder = TraceEncoder(self) if self.sink.accepts_encoded else None
+        
+        # Optional NumPy batch path that draws a whole batch's trace attributes at once
+        self._vectorized = VectorizedTraceBuilder(self) if vectorized else None
     
     def _get_error_rate(self):
         """Get error rate based on scenario"""
@@ -225,100 +309,272 @@ class EnhancedObservabilityGenerator:
     
     def generate_distributed_trace(self):
         """Generate a complete distributed trace with proper parent-child relationships"""
-        trace_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow()
+        trace_id = self.ids.trace_id()
+        timestamp_us = self.clock()
         
         # Select entry point service (frontend/gateway)
-        entry_services = [s for s in self.services if any(x in s.lower() for x in ['frontend', 'app', 'portal', 'gateway', 'client'])]
-        root_service = random.choice(entry_services) if entry_services else self.services[0]
-        
-        # Generate transaction ID
-        transaction_id = str(uuid.uuid4())
-        
-        # Determine transaction details
-        transaction_types = {
-            'web-frontend': [
-                ('GET /products', 'GET', '/products'),
-                ('GET /product/:id', 'GET', '/product/12345'),
-                ('POST /cart/add', 'POST', '/cart/add'),
-                ('GET /checkout', 'GET', '/checkout')
-            ],
-            'mobile-app': [
-                ('POST /api/login', 'POST', '/api/login'),
-                ('GET /api/products', 'GET', '/api/products'),
-                ('POST /api/orders', 'POST', '/api/orders')
-            ],
-            'mobile-banking': [
-                ('POST /api/transfer', 'POST', '/api/transfer'),
-                ('GET /api/accounts', 'GET', '/api/accounts'),
-                ('GET /api/transactions', 'GET', '/api/transactions')
-            ],
-            'game-client': [
-                ('POST /match/join', 'POST', '/match/join'),
-                ('GET /player/stats', 'GET', '/player/stats'),
-                ('POST /game/action', 'POST', '/game/action')
-            ],
-            'patient-portal': [
-                ('GET /appointments', 'GET', '/appointments'),
-                ('POST /appointments/book', 'POST', '/appointments/book'),
-                ('GET /records', 'GET', '/records')
-            ]
+        root = self.rng.choice(self.plan.entry_services)
+        tree = self.plan.call_tree(root.name, self.max_depth)
+        services = tree.services
+        
+        # Choose which calls happen in this trace (preorder, so parents are decided first)
+        nodes = []
+        called = {0: tree.children[0]}
+        for node in range(len(services)):
+            if node != 0 and node not in called:
+                continue
+            nodes.append(node)
+            children = tree.children[node]
+            if self.max_fan_out is not None and len(children) > self.max_fan_out:
+                children = tuple(sorted(self.rng.sample(children, self.max_fan_out)))
+            called[node] = children
+            for child in children:
+                called.setdefault(child, ())
+        
+        # Durations bottom-up: a caller waits for its calls one after another
+        durations = {}
+        gaps = {}
+        for node in reversed(nodes):
+            service = services[node]
+            calls = called[node]
+            if node == 0:
+                latency_mult = self._latency_multipliers[service.name]
+                work = sum(durations[c] + gaps[c] for c in calls)
+                durations[node] = max(self.rng.randint(100, 800) * latency_mult, work + self.rng.randint(10, 50))
+            elif calls or service.instrumented:
+                latency_mult = max(self._latency_multipliers[service.name],
+                                   self._latency_multipliers[tree.callers[node].name])
+                work = sum(durations[c] + gaps[c] for c in calls)
+                # Downstream transaction time plus a little network time on the caller's exit span
+                durations[node] = work + int(self.rng.randint(5, 20) * latency_mult) + self.rng.randint(1, 4)
+            else:
+                latency_mult = max(self._latency_multipliers[service.name],
+                                   self._latency_multipliers[tree.callers[node].name])
+                durations[node] = self._calculate_span_duration(service, latency_mult)
+            gaps[node] = self.rng.randint(1, 5)
+        
+        is_error = self.rng.random() < self._error_rate
+        if self.end_us is not None:
+            timestamp_us = min(timestamp_us, self.end_us - int(durations[0] * 1000))
+        
+        # Documents top-down with offsets (ms from trace start) and parent ids
+        transaction_id = self.ids.span_id()
+        self._emit_transaction(root, trace_id, transaction_id, None, timestamp_us, 0, durations[0],
+                               is_error, len(called[0]), self.rng.choice(root.transactions))
+        
+        # node -> (id of the transaction its calls belong to, offset of the first call)
+        parents = {0: (transaction_id, 5)}  # Start 5ms after transaction
+        for node in nodes[1:]:
+            service = services[node]
+            parent_transaction_id, offset_ms = parents[tree.parents[node]]
+            duration_ms = durations[node]
+            span_error = is_error and self.rng.random() < 0.3  # Propagate some errors
+            span_id = self.ids.span_id()
+            
+            self._generate_enhanced_span(
+                trace_id=trace_id,
+                parent_id=parent_transaction_id,
+                span_id=span_id,
+                caller=tree.callers[node],
+                service=service,
+                timestamp_us=timestamp_us,
+                offset_ms=offset_ms,
+                duration_ms=duration_ms,
+                is_error=span_error
+            )
+            
+            if service.instrumented:
+                # The callee records its own transaction, parented to the caller's exit span
+                network_ms = max(1, (duration_ms - sum(durations[c] + gaps[c] for c in called[node])) // 4)
+                child_transaction_id = self.ids.span_id()
+                self._emit_transaction(service, trace_id, child_transaction_id, span_id, timestamp_us,
+                                       offset_ms + network_ms, duration_ms - 2 * network_ms,
+                                       span_error, len(called[node]), service.downstream_transaction,
+                                       client_ip=self._host_ip())
+                parents[node] = (child_transaction_id, offset_ms + network_ms + 1)
+            
+            parents[tree.parents[node]] = (parent_transaction_id, offset_ms + duration_ms + gaps[node])
+        
+        self.stats.add('traces')
+    
+    def _host_ip(self):
+        """Random internal host address"""
+        if self.entities is not None:
+            return self.entities.sample_host_ip(self.rng)
+        return f'10.0.{self.rng.randint(1,255)}.{self.rng.randint(1,255)}'
+    
+    def _agent(self, node_name):
+        """Agent block for a service node; real agents keep one ephemeral id per process"""
+        agent = self._agents.get(node_name)
+        if agent is None:
+            agent = self._agents[node_name] = {
+                'name': 'python',
+                'version': '6.15.0',
+                'ephemeral_id': self.ids.uuid()
+            }
+        return agent
+    
+    def _emit_transaction(self, service, trace_id, transaction_id, parent_id, timestamp_us, offset_ms, duration_ms,
+                          is_error, span_count, transaction, client_ip=None):
+        """Build and index a transaction document"""
+        if self.entities is not None:
+            self._emit_pooled_transaction(service, trace_id, transaction_id, parent_id, timestamp_us, offset_ms,
+                                          duration_ms, is_error, span_count, transaction, client_ip)
+            return
+        node_name = self.rng.choice(service.node_names)
+        host = {
+            'hostname': self.rng.choice(service.host_names),
+            'name': self.rng.choice(service.host_names),
+            'ip': self._host_ip()
         }
-        
-        # Find matching transaction type
-        transaction_name = 'GET /'
-        http_method = 'GET'
-        http_path = '/'
-        
-        for key, txns in transaction_types.items():
-            if key in root_service.lower():
-                transaction_name, http_method, http_path = random.choice(txns)
-                break
-        
-        # Calculate duration with scenario effects
-        error_rate = self._get_error_rate()
-        latency_mult = self._get_latency_multiplier(root_service)
-        base_duration_ms = random.randint(100, 800)
-        
-        # Build complete trace with all spans
-        all_spans_duration = 0
-        child_spans = []
-        
-        if root_service in self.dependencies:
-            # Generate all child spans first to calculate total duration
-            for child_service in self.dependencies[root_service]:
-                span_duration = self._calculate_span_duration(child_service, latency_mult)
-                all_spans_duration += span_duration
-                child_spans.append((child_service, span_duration))
-        
-        # Transaction duration should be >= sum of child spans
-        transaction_duration_ms = max(base_duration_ms * latency_mult, all_spans_duration + random.randint(10, 50))
-        
-        is_error = random.random() < error_rate
-        
-        # Create root transaction document
+        user_agent = None
+        if parent_id is None:
+            # Entry transactions are called by end users
+            user_agent = self.rng.choice(self.USER_AGENTS)
+            client_ip = f'{self.rng.randint(10,200)}.{self.rng.randint(1,255)}.{self.rng.randint(1,255)}.{self.rng.randint(1,255)}'
+        
+        self._index_transaction(service, trace_id, transaction_id, timestamp_us + int(offset_ms * 1000),
+                                int(duration_ms * 1000), is_error, span_count, transaction, node_name, host,
+                                client_ip, parent_id, user_agent)
+    
+    def _emit_pooled_transaction(self, service, trace_id, transaction_id, parent_id, timestamp_us, offset_ms,
+                                 duration_ms, is_error, span_count, transaction, client_ip):
+        """Build and index a transaction whose instance and visitor come from the entity pools"""
+        entities = self.entities
+        transaction_us = timestamp_us + int(offset_ms * 1000)
+        instance = entities.sample_instance(service.name, self.rng)
+        host = {'hostname': instance.host_name, 'name': instance.host_name, 'ip': instance.host_ip}
+        visitor = user_agent = None
+        if parent_id is None:
+            visitor = entities.sample_visitor(self.rng, transaction_us)
+            client_ip, user_agent = visitor.client_ip, visitor.user_agent
+        
+        self._index_transaction(service, trace_id, transaction_id, transaction_us, int(duration_ms * 1000), is_error,
+                                span_count, transaction, instance.node_name, host, client_ip, parent_id, user_agent,
+                                instance, visitor)
+    
+    def _index_transaction(self, *args):
+        """Send a transaction to the sink, pre-encoded when the sink takes encoded lines"""
+        if self.correlated_logs is not None:
+            self._log_transaction(*args)
+        if self.apm_metrics is not None and not self.apm_metrics.transaction(*args):
+            return  # Trace sampled out: only the metrics count it
+        if self._encoder is not None:
+            if stage_timer.enabled:
+                start = time.perf_counter()
+                line = self._encoder.transaction(*args)
+                stage_timer.observe('encode', time.perf_counter() - start)
+            else:
+                line = self._encoder.transaction(*args)
+            self.sink.add_encoded('traces-apm-default', line)
+        else:
+            self.sink.add('traces-apm-default', self._transaction_document(*args))
+    
+    def _index_span(self, *args):
+        """Send an exit span to the sink, pre-encoded when the sink takes encoded lines"""
+        if self.correlated_logs is not None:
+            self._log_span(*args)
+        if self.apm_metrics is not None and not self.apm_metrics.span(*args):
+            return
+        if self._encoder is not None:
+            if stage_timer.enabled:
+                start = time.perf_counter()
+                line = self._encoder.span(*args)
+                stage_timer.observe('encode', time.perf_counter() - start)
+            else:
+                line = self._encoder.span(*args)
+            self.sink.add_encoded('traces-apm-default', line)
+        else:
+            self.sink.add('traces-apm-default', self._span_document(*args))
+    
+    def _log_level(self, is_error, slow):
+        """Level of the log for a span or transaction, or None when a normal one is not sampled"""
+        if is_error:
+            return 'ERROR'
+        if slow:
+            return 'WARN'
+        if self.correlated_logs >= 1 or self.rng.random() < self.correlated_logs:
+            return 'INFO'
+        return None
+    
+    def _index_log(self, timestamp_us, level, message, service_name, node_name, host_name, trace_id, transaction_id,
+                   span_id=None):
+        """Send a log line that APM can link to its trace, transaction and span"""
+        log_doc = {
+            '@timestamp': self.format_timestamp(timestamp_us),
+            'service.name': service_name,
+            'service.node.name': node_name,
+            'host.name': host_name,
+            'log.level': level,
+            'message': message,
+            'trace.id': trace_id,
+            'transaction.id': transaction_id,
+            'labels': self._transaction_labels
+        }
+        if span_id is not None:
+            log_doc['span.id'] = span_id
+        self.sink.add(self._log_index, log_doc)
+        self.stats.add('logs')
+    
+    def _log_transaction(self, service, trace_id, transaction_id, transaction_us, duration_us, is_error, span_count,
+                         transaction, node_name, host, client_ip, parent_id=None, *_):
+        """Log the outcome of a transaction when it ends; its host is kept for the logs of its exit spans"""
+        if parent_id is None:
+            self._log_hosts.clear()
+        self._log_hosts[transaction_id] = host['name']
+        level = self._log_level(is_error, duration_us > self.SLOW_TRANSACTION_US)
+        if level is None:
+            return
+        name = transaction[0]
+        duration_ms = duration_us // 1000
+        if level == 'ERROR':
+            message = f'{service.name}: {name} failed with HTTP 500 after {duration_ms}ms'
+        elif level == 'WARN':
+            message = f'{service.name}: Slow request {name} took {duration_ms}ms'
+        else:
+            message = f'{service.name}: {name} completed in {duration_ms}ms'
+        self._index_log(transaction_us + duration_us, level, message, service.name, node_name, host['name'],
+                        trace_id, transaction_id)
+    
+    def _log_span(self, trace_id, parent_id, span_id, caller, service, span_us, duration_us, is_error, node_name,
+                  statement):
+        """Log the outcome of an exit span from the calling service when the call returns"""
+        slow = duration_us > service.duration_range[1] * self.SLOW_SPAN_FACTOR * 1000
+        level = self._log_level(is_error, slow)
+        if level is None:
+            return
+        duration_ms = duration_us // 1000
+        if level == 'ERROR':
+            message = f'{caller.name}: Call to {service.name} failed after {duration_ms}ms'
+        elif level == 'WARN':
+            message = f'{caller.name}: Slow call to {service.name} took {duration_ms}ms'
+        else:
+            message = f'{caller.name}: Call to {service.name} returned in {duration_ms}ms'
+        self._index_log(span_us + duration_us, level, message, caller.name, node_name,
+                        self._log_hosts.get(parent_id, node_name), trace_id, parent_id, span_id)
+    
+    def _transaction_document(self, service, trace_id, transaction_id, transaction_us, duration_us, is_error,
+                              span_count, transaction, node_name, host, client_ip, parent_id=None, user_agent=None,
+                              instance=None, visitor=None):
+        """Transaction document from already-drawn values; instance and visitor come from entity pools"""
+        transaction_name, http_method, http_path, url_full = transaction
         transaction_doc = {
-            '@timestamp': timestamp.isoformat(),
-            'timestamp': {'us': int(timestamp.timestamp() * 1000000)},
+            '@timestamp': self.format_timestamp(transaction_us),
+            'timestamp': {'us': transaction_us},
             'trace': {'id': trace_id},
             'transaction': {
                 'id': transaction_id,
                 'name': transaction_name,
                 'type': 'request',
-                'duration': {'us': int(transaction_duration_ms * 1000)},
+                'duration': {'us': duration_us},
                 'result': 'HTTP 5xx' if is_error else 'HTTP 2xx',
                 'sampled': True,
                 'span_count': {
-                    'started': len(child_spans)
+                    'started': span_count
                 }
             },
-            'event': {
-                'outcome': 'failure' if is_error else 'success'
-            },
-            'processor': {
-                'event': 'transaction',
-                'name': 'transaction'
-            },
+            'event': self.OUTCOME_FAILURE if is_error else self.OUTCOME_SUCCESS,
+            'processor': self.TRANSACTION_PROCESSOR,
             'http': {
                 'request': {
                     'method': http_method
@@ -331,213 +587,134 @@ class EnhancedObservabilityGenerator:
             'url': {
                 'path': http_path,
                 'scheme': 'https',
-                'domain': f'{root_service}.{self.industry}.example.com',
-                'full': f'https://{root_service}.{self.industry}.example.com{http_path}'
-            },
-            'user_agent': {
-                'original': random.choice([
-                    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0',
-                    'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X)'
-                ])
-            },
-            'client': {
-                'ip': f'{random.randint(10,200)}.{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}'
+                'domain': service.domain,
+                'full': url_full
             },
             'service': {
-                'name': root_service,
+                'name': service.name,
                 'environment': 'production',
                 'node': {
-                    'name': f'{root_service}-{random.randint(1,3):02d}'
+                    'name': node_name
                 },
-                'language': {
-                    'name': 'python',
-                    'version': '3.9.0'
-                }
+                'language': self.SERVICE_LANGUAGE
             },
-            'agent': {
+            'agent': self._agent(node_name) if instance is None else {
                 'name': 'python',
                 'version': '6.15.0',
-                'ephemeral_id': str(uuid.uuid4())
-            },
-            'host': {
-                'hostname': f'{root_service}-{random.randint(1,5):02d}',
-                'name': f'{root_service}-{random.randint(1,5):02d}',
-                'ip': f'10.0.{random.randint(1,255)}.{random.randint(1,255)}'
+                'ephemeral_id': instance.ephemeral_id
             },
-            'labels': {
-                'industry': self.industry,
-                'environment': 'production'
-            }
+            'host': host,
+            'labels': self._transaction_labels
         }
         
-        if self.scenario:
-            transaction_doc['labels']['scenario'] = self.scenario.get('name', 'unknown')
-        
-        # Index transaction
-        try:
-            self.es.index(index='traces-apm-default', document=transaction_doc)
-        except Exception:
-            self.es.index(index='apm-8.0.0-transaction', document=transaction_doc)
-        
-        # Generate child spans with proper parent reference
-        span_offset = 5  # Start 5ms after transaction
-        for child_service, span_duration in child_spans:
-            self._generate_enhanced_span(
-                trace_id=trace_id,
-                parent_id=transaction_id,
-                service_name=child_service,
-                timestamp=timestamp,
-                offset_ms=span_offset,
-                duration_ms=span_duration,
-                is_error=is_error and random.random() < 0.3  # Propagate some errors
-            )
-            span_offset += span_duration + random.randint(1, 5)
-        
-        self.stats['traces_generated'] += 1
+        if parent_id is None:
+            transaction_doc['user_agent'] = {'original': user_agent}
+        else:
+            transaction_doc['parent'] = {'id': parent_id}
+        transaction_doc['client'] = {'ip': client_ip}
+        if instance is not None:
+            transaction_doc['container'] = {'id': instance.container_id}
+            transaction_doc['kubernetes'] = {'pod': {'name': node_name}, 'node': {'name': instance.host_name}}
+        if visitor is not None:
+            transaction_doc['user'] = {'id': visitor.user_id}
+            transaction_doc['session'] = {'id': visitor.session_id}
+        return transaction_doc
     
-    def _calculate_span_duration(self, service_name, latency_mult):
+    def _calculate_span_duration(self, service, latency_mult):
         """Calculate realistic span duration"""
-        service_type, _ = self._get_service_type(service_name)
-        
         # Different services have different typical latencies
-        if service_type == 'cache':
-            base = random.randint(1, 10)
-        elif service_type == 'db':
-            base = random.randint(5, 50)
-        elif service_type == 'messaging':
-            base = random.randint(10, 100)
+        low, high = service.duration_range
+        return int(self.rng.randint(low, high) * latency_mult)
+    
+    def _generate_enhanced_span(self, trace_id, parent_id, span_id, caller, service, timestamp_us, offset_ms,
+                                duration_ms, is_error):
+        """Generate an exit span from the caller to a downstream service, with full service map details"""
+        if self.entities is not None:
+            node_name = self.entities.sample_instance(caller.name, self.rng).node_name
         else:
-            base = random.randint(20, 200)
+            node_name = self.rng.choice(caller.node_names)
+        if service.type == 'db':
+            statement = self._get_db_statement(service.subtype)
+        elif service.type == 'cache':
+            statement = self.rng.choice(self.CACHE_COMMANDS)
+        else:
+            statement = None
         
-        return int(base * latency_mult)
+        # Index span
+        self._index_span(trace_id, parent_id, span_id, caller, service, timestamp_us + int(offset_ms * 1000),
+                         int(duration_ms * 1000), is_error, node_name, statement)
     
-    def _generate_enhanced_span(self, trace_id, parent_id, service_name, timestamp, offset_ms, duration_ms, is_error):
-        """Generate enhanced span with full service map details"""
-        span_id = str(uuid.uuid4())
-        span_timestamp = timestamp + timedelta(milliseconds=offset_ms)
-        
-        service_type, subtype = self._get_service_type(service_name)
+    def _span_document(self, trace_id, parent_id, span_id, caller, service, span_us, duration_us, is_error,
+                       node_name, statement):
+        """Exit span document from already-drawn values"""
+        service_type = service.type
         
         # Build comprehensive span document
         span_doc = {
-            '@timestamp': span_timestamp.isoformat(),
-            'timestamp': {'us': int(span_timestamp.timestamp() * 1000000)},
+            '@timestamp': self.format_timestamp(span_us),
+            'timestamp': {'us': span_us},
             'trace': {'id': trace_id},
             'parent': {'id': parent_id},
             'span': {
                 'id': span_id,
-                'name': self._get_span_name(service_name, service_type),
+                'name': service.span_name,
                 'type': service_type,
-                'subtype': subtype,
-                'duration': {'us': int(duration_ms * 1000)}
-            },
-            'event': {
-                'outcome': 'failure' if is_error else 'success'
-            },
-            'processor': {
-                'event': 'span',
-                'name': 'transaction'
-            },
-            'observer': {
-                'version': '8.0.0',
-                'type': 'apm-server'
+                'subtype': service.subtype,
+                'duration': {'us': duration_us}
             },
+            'event': self.OUTCOME_FAILURE if is_error else self.OUTCOME_SUCCESS,
+            'processor': self.SPAN_PROCESSOR,
+            'observer': self.OBSERVER,
             'service': {
-                'name': service_name,
+                'name': caller.name,
                 'environment': 'production',
                 'node': {
-                    'name': f'{service_name}-{random.randint(1,3):02d}'
+                    'name': node_name
                 },
-                'target': {
-                    'type': subtype,
-                    'name': service_name
-                }
+                'target': service.target
             },
-            'destination': {
-                'service': {
-                    'name': service_name,
-                    'resource': f'{subtype}/{service_name}',
-                    'type': subtype
-                }
-            },
-            'agent': {
-                'name': 'python',
-                'version': '6.15.0'
-            },
-            'labels': {
-                'industry': self.industry,
-                'environment': 'production'
-            }
+            'destination': service.destination,
+            'agent': self.SPAN_AGENT,
+            'labels': self._span_labels
         }
         
         # Add type-specific metadata
         if service_type == 'db':
             span_doc['db'] = {
-                'instance': service_name,
-                'type': subtype,
-                'statement': self._get_db_statement(subtype)
+                'instance': service.name,
+                'type': service.subtype,
+                'statement': statement
             }
         elif service_type == 'cache':
             span_doc['db'] = {
                 'type': 'redis',
-                'statement': random.choice(['GET', 'SET', 'HGETALL', 'ZADD'])
+                'statement': statement
             }
         elif service_type == 'messaging':
-            span_doc['message'] = {
-                'queue': {'name': f'{service_name}-queue'}
-            }
+            span_doc['message'] = service.queue
         
-        # Index span
-        try:
-            self.es.index(index='traces-apm-default', document=span_doc)
-        except Exception:
-            self.es.index(index='apm-8.0.0-span', document=span_doc)
-    
-    def _get_span_name(self, service_name, service_type):
-        """Generate realistic span names"""
-        if service_type == 'db':
-            return f'SELECT FROM {service_name}'
-        elif service_type == 'cache':
-            return f'GET {service_name}'
-        elif service_type == 'messaging':
-            return f'SEND {service_name}'
-        else:
-            return f'POST {service_name}/process'
+        return span_doc
     
     def _get_db_statement(self, db_type):
         """Generate realistic database statements"""
-        statements = {
-            'postgresql': [
-                'SELECT * FROM users WHERE id = $1',
-                'UPDATE products SET stock = stock - 1 WHERE id = $1',
-                'INSERT INTO orders (user_id, total) VALUES ($1, $2)',
-                'SELECT * FROM accounts WHERE user_id = $1 AND active = true'
-            ],
-            'mongodb': [
-                'db.products.find({category: "electronics"})',
-                'db.users.updateOne({_id: ObjectId()}, {$set: {lastLogin: new Date()}})',
-                'db.orders.aggregate([{$match: {status: "pending"}}])'
-            ]
-        }
-        return random.choice(statements.get(db_type, statements['postgresql']))
+        return self.rng.choice(self.DB_STATEMENTS.get(db_type, self.DB_STATEMENTS['postgresql']))
     
     def generate_log(self):
         """Generate application log"""
-        service = random.choice(self.services)
+        service = self.rng.choice(self.services)
         
-        if self.scenario and random.random() < self._get_error_rate() * 5:
+        if self.scenario and self.rng.random() < self._get_error_rate() * 5:
             log_levels = ['WARN', 'ERROR']
             weights = [0.6, 0.4]
         else:
             log_levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
             weights = [0.70, 0.15, 0.05, 0.10]
         
-        level = random.choices(log_levels, weights=weights)[0]
+        level = self.rng.choices(log_levels, weights=weights)[0]
         message = self._get_log_message(level, service)
         
         log_doc = {
-            '@timestamp': datetime.utcnow().isoformat(),
+            '@timestamp': self.format_timestamp(self.clock()),
             'service.name': service,
             'log.level': level,
             'message': message,
@@ -550,8 +727,8 @@ class EnhancedObservabilityGenerator:
         if self.scenario:
             log_doc['labels']['scenario'] = self.scenario.get('name', 'unknown')
         
-        self.es.index(index=f'logs-{self.industry}', document=log_doc)
-        self.stats['logs_generated'] += 1
+        self.sink.add(f'logs-{self.industry}', log_doc)
+        self.stats.add('logs')
     
     def _get_log_message(self, level, service):
         """Generate contextual log messages"""
@@ -575,60 +752,126 @@ class EnhancedObservabilityGenerator:
                 f'{service}: Uncaught exception: NullPointerException in request handler'
             ],
             'DEBUG': [
-                f'{service}: Processing request ID: {uuid.uuid4()}',
+                f'{service}: Processing request ID: {self.ids.span_id()}',
                 f'{service}: Executing database query',
                 f'{service}: Validating request payload'
             ]
         }
-        return random.choice(messages.get(level, messages['INFO']))
+        return self.rng.choice(messages.get(level, messages['INFO']))
     
     def generate_synthetic_check(self):
         """Generate synthetic monitoring check"""
-        service = random.choice(self.services)
+        service = self.rng.choice(self.services)
         
         if self.scenario:
             uptime_rate = 1.0 - (self._get_error_rate() * 2)
         else:
             uptime_rate = 0.98
         
-        is_up = random.random() < uptime_rate
+        is_up = self.rng.random() < uptime_rate
         
         synthetic_doc = {
-            '@timestamp': datetime.utcnow().isoformat(),
+            '@timestamp': self.format_timestamp(self.clock()),
             'monitor.name': f'{service}-health',
             'monitor.type': 'http',
             'monitor.status': 'up' if is_up else 'down',
-            'monitor.duration.us': random.randint(50000, 300000),
-            'observer.geo.name': random.choice(['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1']),
+            'monitor.duration.us': self.rng.randint(50000, 300000),
+            'observer.geo.name': self.rng.choice(['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1']),
             'url.full': f'https://{service}.{self.industry}.example.com/health',
             'http.response.status_code': 200 if is_up else 503
         }
         
-        self.es.index(index=f'synthetics-{self.industry}', document=synthetic_doc)
-        self.stats['synthetics_generated'] += 1
+        self.sink.add(f'synthetics-{self.industry}', synthetic_doc)
+        self.stats.add('synthetics')
+    
+    def _split_events(self, events):
+        """Split an event count across signals, carrying remainders into the next batch"""
+        counts = {}
+        for signal, share in self.SIGNAL_MIX:
+            carry = self._mix_carry[signal] + events * share
+            counts[signal], self._mix_carry[signal] = divmod(carry, 1000)
+        return counts['traces'], counts['logs'], counts['synthetics']
     
     def generate_batch(self, events_per_second=17):
         """Generate batch of events"""
-        traces = int(events_per_second * 0.6)
-        logs = int(events_per_second * 0.3)
-        synthetics = int(events_per_second * 0.1)
+        timed = stage_timer.enabled
+        if timed:
+            start = time.perf_counter()
+            other_stages = stage_timer.thread_time()
+        
+        traces, logs, synthetics = self._split_events(events_per_second)
         
-        for _ in range(traces):
-            self.generate_distributed_trace()
+        if self._vectorized is not None:
+            self._vectorized.generate(traces)
+        else:
+            for _ in range(traces):
+                self.generate_distributed_trace()
         
-        for _ in range(logs):
-            self.generate_log()
+        if self.correlated_logs is None:
+            for _ in range(logs):
+                self.generate_log()
+        else:
+            # Every log comes from a trace instead; the skipped events still move a simulated clock on
+            for _ in range(logs):
+                self.clock()
         
         for _ in range(synthetics):
             self.generate_synthetic_check()
+        
+        # Ship anything that has been buffered for longer than the sink's max age
+        self.sink.flush_expired()
+        
+        if timed:
+            elapsed = time.perf_counter() - start
+            stage_timer.observe('batch', elapsed)
+            stage_timer.observe('build', elapsed - (stage_timer.thread_time() - other_stages))
+    
+    def flush(self):
+        """Send all buffered documents"""
+        self.sink.flush()
+    
+    def flush_apm_metrics(self):
+        """Write the metric documents of minutes that are still open"""
+        if self.apm_metrics is not None:
+            self.apm_metrics.close()
+    
+    def close(self):
+        """Flush buffered documents and release the sink"""
+        self.flush_apm_metrics()
+        self.sink.close()
     
     def get_stats(self):
-        """Get generation statistics"""
-        elapsed = time.time() - self.stats['start_time']
-        return {
-            'traces': self.stats['traces_generated'],
-            'logs': self.stats['logs_generated'],
-            'synthetics': self.stats['synthetics_generated'],
+        """Get generation statistics; traces_per_second is the rate over the last 10 seconds"""
+        elapsed = time.time() - self.start_time
+        totals, rates = self.stats.snapshot()
+        sink_stats = self.sink.get_stats()
+        traces = totals.get('traces', 0)
+        signal_rates = {signal: window_rates(rates, signal) for signal in ('traces', 'logs', 'synthetics')}
+        stats = {
+            'traces': traces,
+            'logs': totals.get('logs', 0),
+            'synthetics': totals.get('synthetics', 0),
+            'apm_metrics': totals.get('apm_metrics', 0),
             'elapsed_seconds': int(elapsed),
-            'traces_per_second': round(self.stats['traces_generated'] / elapsed, 2) if elapsed > 0 else 0
-        }
\ No newline at end of file
+            'traces_per_second': signal_rates['traces']['10s'],
+            'traces_per_second_average': round(traces / elapsed, 2) if elapsed > 0 else 0,
+            'docs_indexed': sink_stats['docs_indexed'],
+            'docs_failed': sink_stats['docs_failed'],
+            'docs_pending': sink_stats['docs_pending'],
+            'bulk_requests': sink_stats['bulk_requests'],
+            'bulk_errors': sink_stats['bulk_errors'],
+            'bulk_retries': sink_stats['bulk_retries'],
+            'docs_rejected': sink_stats['docs_rejected'],
+            'docs_retried': sink_stats['docs_retried'],
+            'backoff_seconds': round(sink_stats['backoff_seconds'], 3),
+            'bulk_size': sink_stats.get('bulk_size'),
+            'bytes_sent': sink_stats['bytes_sent'],
+            'bulk_seconds': round(sink_stats['bulk_seconds'], 3),
+            'failures_by_status': sink_stats['failures_by_status'],
+            'last_error': sink_stats['last_error'],
+            'rates': dict(signal_rates, **sink_stats['rates']),
+            'indices': sink_stats['indices']
+        }
+        if self.apm_metrics is not None:
+            stats.update(self.apm_metrics.get_stats())
+        return stats
\ No newline at end of file
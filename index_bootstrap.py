@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Index bootstrap for the Observability Data Generator
+Installs explicit mappings and ingest-friendly settings for every index the generator writes, and restores them
+"""
+
+import threading
+
+from apm_metrics import INDICES as APM_METRIC_INDICES
+from generator_enhanced import IndustryConfig
+from self_metrics import SelfMetricsReporter
+
+try:
+    from elasticsearch import NotFoundError
+except ImportError:
+    NotFoundError = None
+
+NAME = 'observability-generator'
+META = {'managed_by': 'observability-data-generator'}
+# Above the built-in logs/metrics/traces templates (100) and integration templates (200)
+PRIORITY = 500
+
+# Load-test defaults: refresh rarely, no replicas; any index.* setting can be added
+DEFAULT_SETTINGS = {'refresh_interval': '30s', 'number_of_replicas': 0}
+# Settings that can also be changed on indices that already exist
+DYNAMIC_SETTINGS = ('refresh_interval', 'number_of_replicas', 'translog.durability')
+
+TRACE_FIELDS = {
+    '@timestamp': 'date',
+    'timestamp.us': 'long',
+    'trace.id': 'keyword',
+    'parent.id': 'keyword',
+    'transaction.id': 'keyword',
+    'transaction.name': 'keyword',
+    'transaction.type': 'keyword',
+    'transaction.result': 'keyword',
+    'transaction.duration.us': 'long',
+    'transaction.sampled': 'boolean',
+    'transaction.span_count.started': 'long',
+    'span.id': 'keyword',
+    'span.name': 'keyword',
+    'span.type': 'keyword',
+    'span.subtype': 'keyword',
+    'span.duration.us': 'long',
+    'event.outcome': 'keyword',
+    'processor.event': 'keyword',
+    'processor.name': 'keyword',
+    'observer.type': 'keyword',
+    'observer.version': 'keyword',
+    'http.request.method': 'keyword',
+    'http.response.status_code': 'long',
+    'http.version': 'keyword',
+    'url.path': 'keyword',
+    'url.scheme': 'keyword',
+    'url.domain': 'keyword',
+    'url.full': 'keyword',
+    'service.name': 'keyword',
+    'service.environment': 'keyword',
+    'service.node.name': 'keyword',
+    'service.language.name': 'keyword',
+    'service.language.version': 'keyword',
+    'service.target.name': 'keyword',
+    'service.target.type': 'keyword',
+    'destination.service.name': 'keyword',
+    'destination.service.resource': 'keyword',
+    'destination.service.type': 'keyword',
+    'db.instance': 'keyword',
+    'db.type': 'keyword',
+    'db.statement': 'keyword',
+    'message.queue.name': 'keyword',
+    'agent.name': 'keyword',
+    'agent.version': 'keyword',
+    'agent.ephemeral_id': 'keyword',
+    'host.hostname': 'keyword',
+    'host.name': 'keyword',
+    'host.ip': 'ip',
+    'client.ip': 'ip',
+    'user_agent.original': 'keyword',
+    'user.id': 'keyword',
+    'session.id': 'keyword',
+    'container.id': 'keyword',
+    'kubernetes.pod.name': 'keyword',
+    'kubernetes.node.name': 'keyword'
+}
+
+# Logs use dotted keys ('service.name'); Elasticsearch maps them onto the same object paths
+LOG_FIELDS = {
+    '@timestamp': 'date',
+    'service.name': 'keyword',
+    'service.node.name': 'keyword',
+    'host.name': 'keyword',
+    'log.level': 'keyword',
+    'message': 'match_only_text',
+    'trace.id': 'keyword',
+    'transaction.id': 'keyword',
+    'span.id': 'keyword'
+}
+
+SYNTHETIC_FIELDS = {
+    '@timestamp': 'date',
+    'monitor.name': 'keyword',
+    'monitor.type': 'keyword',
+    'monitor.status': 'keyword',
+    'monitor.duration.us': 'long',
+    'observer.geo.name': 'keyword',
+    'url.full': 'keyword',
+    'http.response.status_code': 'long'
+}
+
+METRIC_FIELDS = {
+    '@timestamp': 'date',
+    'data_stream.type': 'constant_keyword',
+    'data_stream.dataset': 'constant_keyword',
+    'data_stream.namespace': 'constant_keyword',
+    'event.dataset': 'keyword',
+    'event.module': 'keyword',
+    'event.duration': 'long',
+    'service.name': 'keyword',
+    'service.type': 'keyword',
+    'host.name': 'keyword',
+    'metricset.name': 'keyword',
+    'metricset.period': 'long'
+}
+
+SUMMARY = {'type': 'aggregate_metric_double', 'metrics': ['sum', 'value_count'], 'default_metric': 'sum'}
+
+APM_METRIC_FIELDS = {
+    '@timestamp': 'date',
+    'data_stream.type': 'constant_keyword',
+    'data_stream.dataset': 'constant_keyword',
+    'data_stream.namespace': 'constant_keyword',
+    'processor.event': 'keyword',
+    'processor.name': 'keyword',
+    'metricset.name': 'keyword',
+    'metricset.interval': 'constant_keyword',
+    'agent.name': 'keyword',
+    'observer.type': 'keyword',
+    'observer.version': 'keyword',
+    'service.name': 'keyword',
+    'service.environment': 'keyword',
+    'service.language.name': 'keyword',
+    'service.language.version': 'keyword',
+    'service.target.name': 'keyword',
+    'service.target.type': 'keyword',
+    'transaction.name': 'keyword',
+    'transaction.type': 'keyword',
+    'transaction.result': 'keyword',
+    'transaction.root': 'boolean',
+    'transaction.duration.histogram': 'histogram',
+    'transaction.duration.summary': SUMMARY,
+    'event.outcome': 'keyword',
+    'event.success_count': SUMMARY,
+    'span.name': 'keyword',
+    'span.destination.service.resource': 'keyword',
+    'span.destination.service.response_time.count': 'long',
+    'span.destination.service.response_time.sum.us': 'long'
+}
+
+
+def properties(fields):
+    """Nested mapping properties from {'dotted.path': type or full field mapping}"""
+    root = {}
+    for path, field_type in fields.items():
+        *parents, leaf = path.split('.')
+        node = root
+        for parent in parents:
+            node = node.setdefault(parent, {'properties': {}})['properties']
+        node[leaf] = field_type if isinstance(field_type, dict) else {'type': field_type}
+    return root
+
+
+def mappings(fields, dynamic_objects=()):
+    """Mapping with dynamic updates off, except keyword labels and the given open objects"""
+    props = properties(fields)
+    props['labels'] = {'type': 'object', 'dynamic': True}
+    templates = [{'labels': {'path_match': 'labels.*', 'match_mapping_type': 'string',
+                             'mapping': {'type': 'keyword'}}}]
+    for name in dynamic_objects:
+        props[name] = {'type': 'object', 'dynamic': True}
+        templates.append({f'{name}_numbers': {'path_match': f'{name}.*', 'match_mapping_type': 'long',
+                                              'mapping': {'type': 'double'}}})
+    # Fields outside the mapping stay in _source but never trigger a mapping update
+    return {'dynamic': False, 'dynamic_templates': templates, 'properties': props}
+
+
+def bootstrap_settings(value):
+    """Index settings from a bootstrap option (True or a dict of index settings); raises ValueError"""
+    if not value:
+        return None
+    if value is True:
+        value = {}
+    if not isinstance(value, dict):
+        raise ValueError('bootstrap must be true or an object of index settings')
+    settings = dict(DEFAULT_SETTINGS)
+    for key, setting in value.items():
+        if not isinstance(setting, (str, int, float, bool)):
+            raise ValueError(f'Invalid bootstrap setting {key}: expected a scalar value')
+        settings[key[len('index.'):] if key.startswith('index.') else key] = setting
+    return settings
+
+
+def generator_targets(industries=None):
+    """{kind: [index names]} of everything the generator writes"""
+    industries = sorted(industries or IndustryConfig.INDUSTRIES)
+    return {
+        'traces': ['traces-apm-default'],
+        'logs': [f'logs-{industry}' for industry in industries],
+        'synthetics': [f'synthetics-{industry}' for industry in industries],
+        'metrics': [SelfMetricsReporter.INDEX],
+        'apm_metrics': list(APM_METRIC_INDICES.values())
+    }
+
+
+class IndexBootstrap:
+    """Installs component and index templates for the generator's indices and puts things back afterwards
+
+    install() remembers any templates it replaces and the refresh/replica
+    settings of indices that already exist, applies the load-test settings
+    to those indices and rolls existing data streams over so their next
+    backing index uses the explicit mappings. restore() undoes all of it;
+    indices created in between get the cluster defaults back. Jobs share
+    one bootstrap through acquire()/release(): the first installs, the last
+    restores.
+    """
+
+    def __init__(self, es_client, industries=None, rollover=True):
+        self.es = es_client
+        self.targets = generator_targets(industries)
+        self.rollover = rollover
+        self.settings = None
+        self._previous_templates = None
+        self._previous_settings = {}
+        self._leases = 0
+        self._lock = threading.Lock()
+
+    @property
+    def installed(self):
+        return self.settings is not None
+
+    @property
+    def indices(self):
+        return [index for names in self.targets.values() for index in names]
+
+    def _templates(self, settings):
+        """(component templates, index templates) to install"""
+        components = {f'{NAME}@settings': {'settings': {'index': settings}}}
+        for kind, fields, dynamic_objects in (('traces', TRACE_FIELDS, ()), ('logs', LOG_FIELDS, ()),
+                                              ('synthetics', SYNTHETIC_FIELDS, ()),
+                                              ('metrics', METRIC_FIELDS, ('generator',)),
+                                              ('apm_metrics', APM_METRIC_FIELDS, ())):
+            components[f'{NAME}@{kind}'] = {'mappings': mappings(fields, dynamic_objects)}
+        index_templates = {
+            f'{NAME}-{kind}': {
+                'index_patterns': names,
+                'data_stream': {},
+                'priority': PRIORITY,
+                'composed_of': [f'{NAME}@settings', f'{NAME}@{kind}']
+            }
+            for kind, names in self.targets.items()
+        }
+        return components, index_templates
+
+    def _get(self, getter, key, name):
+        """A template's current body, or None when it does not exist"""
+        try:
+            response = getter(name=name)
+        except NotFoundError:
+            return None
+        items = response.get(key) or []
+        return items[0][key[:-1]] if items else None
+
+    def _put_index_template(self, name, body):
+        body = {('meta' if key == '_meta' else key): value for key, value in body.items()}
+        self.es.indices.put_index_template(name=name, **body)
+
+    def _put_component_template(self, name, body):
+        body = {('meta' if key == '_meta' else key): value for key, value in body.items()}
+        self.es.cluster.put_component_template(name=name, **body)
+
+    def _index_settings(self):
+        """{index: {setting: value}} of the dynamic settings explicitly set on existing target indices"""
+        response = self.es.indices.get_settings(
+            index=','.join(self.indices), name=[f'index.{key}' for key in DYNAMIC_SETTINGS],
+            flat_settings=True, ignore_unavailable=True, allow_no_indices=True, expand_wildcards='all'
+        )
+        return {
+            index: {key[len('index.'):]: value for key, value in body.get('settings', {}).items()}
+            for index, body in response.items()
+        }
+
+    def _existing_data_streams(self):
+        streams = []
+        for name in self.indices:
+            try:
+                self.es.indices.get_data_stream(name=name)
+            except NotFoundError:
+                continue
+            streams.append(name)
+        return streams
+
+    def _roll_over(self):
+        """Start a new backing index on every existing target data stream, so it picks up the current templates"""
+        for name in self._existing_data_streams():
+            try:
+                self.es.indices.rollover(alias=name)
+            except Exception as e:
+                print(f"⚠️ Rollover of {name} failed: {e}")
+
+    def install(self, settings=None):
+        """Put the templates in place and tune existing indices; raises RuntimeError when the cluster refuses"""
+        settings = dict(settings or DEFAULT_SETTINGS)
+        components, index_templates = self._templates(settings)
+        try:
+            self._previous_templates = {
+                'component': {name: self._get(self.es.cluster.get_component_template, 'component_templates', name)
+                              for name in components},
+                'index': {name: self._get(self.es.indices.get_index_template, 'index_templates', name)
+                          for name in index_templates}
+            }
+            for name, body in components.items():
+                self._put_component_template(name, {'template': body, 'meta': META})
+            for name, body in index_templates.items():
+                self._put_index_template(name, dict(body, meta=META))
+
+            self._previous_settings = self._index_settings()
+            dynamic = {key: value for key, value in settings.items() if key in DYNAMIC_SETTINGS}
+            if self._previous_settings and dynamic:
+                self.es.indices.put_settings(index=','.join(self._previous_settings), settings={'index': dynamic})
+            self.settings = settings
+            if self.rollover:
+                self._roll_over()
+        except Exception as e:
+            self.settings = settings
+            self.restore()
+            raise RuntimeError(f'Index bootstrap failed: {e}')
+        print(f"🧱 Installed index templates for {len(self.indices)} targets "
+              f"(refresh {settings.get('refresh_interval')}, replicas {settings.get('number_of_replicas')})")
+
+    def restore(self):
+        """Put back the templates and index settings from before install()"""
+        if not self.installed:
+            return
+        previous = self._previous_templates or {'component': {}, 'index': {}}
+        errors = []
+
+        # Index templates first: they reference the component templates
+        for name, body in previous['index'].items():
+            try:
+                if body is None:
+                    self.es.indices.delete_index_template(name=name)
+                else:
+                    self._put_index_template(name, body)
+            except Exception as e:
+                errors.append(f'{name}: {e}')
+        for name, body in previous['component'].items():
+            try:
+                if body is None:
+                    self.es.cluster.delete_component_template(name=name)
+                else:
+                    self._put_component_template(name, body)
+            except Exception as e:
+                errors.append(f'{name}: {e}')
+
+        # Existing indices get their old values back, indices created since then the defaults (None resets)
+        try:
+            keys = [key for key in self.settings if key in DYNAMIC_SETTINGS]
+            for index in self._index_settings():
+                values = self._previous_settings.get(index, {})
+                self.es.indices.put_settings(index=index,
+                                             settings={'index': {key: values.get(key) for key in keys}})
+        except Exception as e:
+            errors.append(f'settings: {e}')
+        if self.rollover:
+            self._roll_over()
+
+        self.settings = None
+        self._previous_templates = None
+        self._previous_settings = {}
+        if errors:
+            print(f"⚠️ Index bootstrap restore incomplete: {'; '.join(errors)}")
+        else:
+            print("🧱 Restored index templates and settings")
+
+    def acquire(self, settings=None):
+        """Install for a job unless another job already did; the settings of the first job apply"""
+        with self._lock:
+            if self._leases == 0 and not self.installed:
+                self.install(settings)
+            self._leases += 1
+
+    def release(self):
+        """Restore once the last job holding the bootstrap is done"""
+        with self._lock:
+            self._leases = max(0, self._leases - 1)
+            if self._leases == 0:
+                self.restore()
+
+    def describe(self):
+        """Whether templates are installed, with which settings and for how many jobs"""
+        return {
+            'installed': self.installed,
+            'settings': self.settings,
+            'leases': self._leases,
+            'targets': self.targets
+        }
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Hot-path instrumentation for the Observability Data Generator
+Per-stage timing histograms, an on-demand sampling profiler and Prometheus text exposition
+"""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Histogram upper bounds in seconds, from 1µs to 10s
+BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Stats that only ever grow; exported as Prometheus counters, everything else numeric as gauges
+COUNTER_STATS = (
+    'traces', 'logs', 'synthetics', 'docs_indexed', 'docs_failed', 'bulk_requests', 'bulk_errors',
+    'bytes_sent', 'events_scheduled', 'events_dropped', 'backfill_events', 'backpressure_waits',
+    'pipeline_bulk_submitted', 'pipeline_backpressure_waits', 'docs_rejected', 'docs_retried', 'bulk_retries',
+    'apm_metrics', 'traces_sampled_out'
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class StageTimer:
+    """Time spent per generation stage
+
+    Stages: batch (one generate_batch call), build (batch time not spent in
+    the other stages), encode (serializing a document), enqueue (appending
+    to a bulk buffer), flush (sending one bulk buffer), bulk_request (the
+    Elasticsearch round trip) and bulk_response (processing the response).
+    Timing is off by default; call sites check `enabled` before reading the
+    clock, so the disabled cost is one attribute lookup.
+    """
+
+    STAGES = ('batch', 'build', 'encode', 'enqueue', 'flush', 'bulk_request', 'bulk_response')
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.histograms = {stage: Histogram() for stage in self.STAGES}
+
+    def enable(self, enabled=True):
+        """Turn stage timing on or off"""
+        self.enabled = enabled
+
+    def observe(self, stage, seconds):
+        """Record one duration for a stage"""
+        with self._lock:
+            self.histograms[stage].observe(seconds)
+        totals = self._thread_totals()
+        totals[stage] = totals.get(stage, 0.0) + seconds
+
+    def _thread_totals(self):
+        """Running per-stage totals of the calling thread, used to derive build time per batch"""
+        totals = getattr(self._local, 'totals', None)
+        if totals is None:
+            totals = self._local.totals = {}
+        return totals
+
+    def thread_time(self, stages=('encode', 'enqueue', 'flush')):
+        """Seconds the calling thread has spent in the given stages so far"""
+        totals = self._thread_totals()
+        return sum(totals.get(stage, 0.0) for stage in stages)
+
+    def reset(self):
+        """Clear all histograms"""
+        with self._lock:
+            self.histograms = {stage: Histogram() for stage in self.STAGES}
+
+    def summary(self):
+        """Count, total and mean time per stage that has observations"""
+        with self._lock:
+            return {
+                stage: {
+                    'count': histogram.count,
+                    'total_seconds': round(histogram.sum, 6),
+                    'mean_us': round(histogram.sum / histogram.count * 1000000, 2)
+                }
+                for stage, histogram in self.histograms.items() if histogram.count
+            }
+
+    def render(self):
+        """Prometheus text lines for the stage histograms"""
+        lines = [
+            '# HELP generator_stage_seconds Time spent per generation stage',
+            '# TYPE generator_stage_seconds histogram'
+        ]
+        with self._lock:
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'generator_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'generator_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'generator_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return lines
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of running threads at a fixed interval
+
+    Far cheaper than cProfile on a live generator: the target threads run
+    untouched and a background thread reads their frames every interval.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.interval = 0.005
+        self.max_depth = 40
+        self.thread_ids = None
+        self.samples = 0
+        self.functions = Counter()
+        self.stacks = Counter()
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005, thread_ids=None, max_depth=40):
+        """Start sampling every interval seconds; thread_ids limits sampling to those threads; raises ValueError"""
+        if not isinstance(interval, (int, float)) or isinstance(interval, bool) or not 0 < interval < float('inf'):
+            raise ValueError('Sampling interval must be a positive number of seconds')
+        if self.running:
+            return
+        with self._lock:
+            self.interval = interval
+            self.max_depth = max_depth
+            self.thread_ids = set(thread_ids) if thread_ids else None
+            self.samples = 0
+            self.functions = Counter()
+            self.stacks = Counter()
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling; collected samples are kept until the next start"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples += 1
+                    self.functions[stack[0]] += 1
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def report(self, top=25):
+        """Hottest functions (by samples where they were executing) and folded stacks for flame graphs"""
+        with self._lock:
+            samples = self.samples
+            functions = self.functions.most_common(top)
+            stacks = self.stacks.most_common(top)
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'samples': samples,
+            'top_functions': [
+                {'function': name, 'samples': count, 'percent': round(100 * count / samples, 2)}
+                for name, count in functions
+            ],
+            'folded_stacks': [f'{stack} {count}' for stack, count in stacks]
+        }
+
+
+# Process-wide instances shared by generators, sinks and the web app
+stage_timer = StageTimer()
+profiler = SamplingProfiler()
+
+
+def _metric_name(key):
+    return 'generator_' + ''.join(c if c.isalnum() else '_' for c in key)
+
+
+def _labels(labels):
+    """Prometheus label set such as {job="1",industry="banking"}, or an empty string"""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def render_prometheus(series):
+    """Prometheus text exposition of stats plus stage histograms and profiler state
+
+    series is a single stats dict or a list of (labels, stats) pairs, one per
+    job; each metric gets its TYPE line once, followed by one sample per series.
+    """
+    if isinstance(series, dict):
+        series = [({}, series)]
+
+    metrics = {}
+    for labels, stats in series:
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if key == 'rates' and isinstance(value, dict):
+                # {'traces': {'1s': 12.0, '10s': 11.5, '60s': 11.9}, ...}
+                samples = metrics.setdefault(('generator_rate_per_second', 'gauge'), [])
+                samples.extend(f'generator_rate_per_second{_labels(dict(labels, counter=counter, window=window))} {rate}'
+                               for counter, windows in value.items() for window, rate in windows.items())
+            elif key == 'indices' and isinstance(value, dict):
+                totals = metrics.setdefault(('generator_index_docs_total', 'counter'), [])
+                index_rates = metrics.setdefault(('generator_index_docs_per_second', 'gauge'), [])
+                for index, values in value.items():
+                    totals.append(f'generator_index_docs_total{_labels(dict(labels, index=index))} {values["total"]}')
+                    index_rates.extend(
+                        f'generator_index_docs_per_second{_labels(dict(labels, index=index, window=window))} {rate}'
+                        for window, rate in values.items() if window != 'total'
+                    )
+            elif key == 'failures_by_status' and isinstance(value, dict):
+                samples = metrics.setdefault(('generator_docs_failed_by_status_total', 'counter'), [])
+                samples.extend(f'generator_docs_failed_by_status_total{_labels(dict(labels, status=status))} {count}'
+                               for status, count in value.items())
+            elif isinstance(value, (int, float)):
+                if key in COUNTER_STATS:
+                    name, kind = _metric_name(key) + '_total', 'counter'
+                else:
+                    name, kind = _metric_name(key), 'gauge'
+                metrics.setdefault((name, kind), []).append(f'{name}{_labels(labels)} {value}')
+
+    lines = []
+    for (name, kind), samples in metrics.items():
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+
+    lines.extend(stage_timer.render())
+    lines.append('# TYPE generator_stage_timing_enabled gauge')
+    lines.append(f'generator_stage_timing_enabled {int(stage_timer.enabled)}')
+    lines.append('# TYPE generator_profiler_samples_total counter')
+    lines.append(f'generator_profiler_samples_total {profiler.samples}')
+    return '\n'.join(lines) + '\n'
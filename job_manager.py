@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""
+Generation jobs for the Observability Data Generator
+Runs many independent generations side by side, each with its own industry, scenario, rate, duration and sink
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+
+from async_engine import AsyncBulkSink, AsyncGenerationEngine
+from backfill import BackfillRunner, backfill_settings
+from bulk_pipeline import BulkPipeline, PipelinedBulkSink
+from demo_scenarios import DemoScenarios
+from apm_metrics import apm_metrics_options
+from entity_pools import resolve_sizes
+from fast_ids import VirtualClock
+from generator_enhanced import EnhancedObservabilityGenerator, IndustryConfig, correlated_log_share
+from index_bootstrap import IndexBootstrap, bootstrap_settings
+from rate_profiles import create_profile
+from rate_scheduler import RateScheduler
+from self_metrics import SelfMetricsReporter, reporter_interval
+from sinks import bulk_options, confine_path, create_sink
+from worker_pool import GenerationWorkerPool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Where the API writes file output when the caller does not choose a directory
+DEFAULT_OUTPUT_DIR = 'output'
+# Sink types that write to a client-supplied path
+PATH_SINKS = ('file', 'dataset')
+
+EMPTY_STATS = {
+    'traces': 0,
+    'logs': 0,
+    'synthetics': 0,
+    'elapsed_seconds': 0,
+    'traces_per_second': 0,
+    'docs_indexed': 0,
+    'docs_failed': 0,
+    'docs_pending': 0,
+    'bulk_requests': 0,
+    'bulk_errors': 0,
+    'failures_by_status': {},
+    'last_error': None
+}
+
+
+def parse_job_config(data, output_dir=None):
+    """Validate a job request (the /api/generate payload) and fill in defaults; raises ValueError
+
+    With output_dir, file and dataset sink paths are taken relative to it and
+    may not leave it, so API clients cannot write elsewhere on the server.
+    """
+    industry = data.get('industry')
+    if industry not in IndustryConfig.INDUSTRIES:
+        raise ValueError('Invalid industry')
+
+    sink_config = data.get('sink') or {'type': 'elasticsearch'}
+    engine = data.get('engine', 'sync')
+    if engine not in ('sync', 'async'):
+        raise ValueError('Invalid engine, expected sync or async')
+    if engine == 'async' and sink_config.get('type', 'elasticsearch') != 'elasticsearch':
+        raise ValueError('The async engine only supports the elasticsearch sink')
+    if output_dir is not None and sink_config.get('type') in PATH_SINKS:
+        sink_config = dict(sink_config, path=confine_path(sink_config.get('path'), output_dir))
+
+    scenario_key = data.get('scenario')
+    scenario = None
+    if scenario_key:
+        scenario = DemoScenarios.get_scenarios_for_industry(industry).get(scenario_key)
+        if scenario is None:
+            raise ValueError(f'Invalid scenario for {industry}: {scenario_key}')
+
+    events_per_second = data.get('rate', 17)
+    duration_minutes = data.get('duration', 10)
+    if not isinstance(events_per_second, (int, float)) or events_per_second <= 0:
+        raise ValueError('rate must be a positive number')
+    if not isinstance(duration_minutes, (int, float)) or duration_minutes <= 0:
+        raise ValueError('duration must be a positive number of minutes')
+    workers = data.get('workers', 1)
+    concurrency = data.get('concurrency', 4)
+    seed = data.get('seed')
+    max_catchup_seconds = data.get('max_catchup_seconds', 2.0)
+    if not isinstance(workers, int) or isinstance(workers, bool) or workers <= 0:
+        raise ValueError('workers must be a positive integer')
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency <= 0:
+        raise ValueError('concurrency must be a positive integer')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise ValueError('seed must be an integer')
+    if (not isinstance(max_catchup_seconds, (int, float)) or isinstance(max_catchup_seconds, bool)
+            or not 0 <= max_catchup_seconds < float('inf')):
+        raise ValueError('max_catchup_seconds must be a non-negative number')
+    backfill = backfill_settings(data.get('backfill'))
+    trace_depth = data.get('trace_depth', 3)
+    fan_out = data.get('fan_out', 3)
+    vectorized = data.get('vectorized', False)
+    if not isinstance(trace_depth, int) or isinstance(trace_depth, bool) or trace_depth < 0:
+        raise ValueError('trace_depth must be a non-negative integer')
+    if fan_out is not None and (not isinstance(fan_out, int) or isinstance(fan_out, bool) or fan_out < 0):
+        raise ValueError('fan_out must be a non-negative integer, or null for all dependencies')
+    if not isinstance(vectorized, bool):
+        raise ValueError('vectorized must be true or false')
+    if vectorized and numpy is None:
+        raise ValueError('vectorized generation requires the numpy package')
+
+    # Scenarios may bring their own traffic shape, e.g. Black Friday's 10x spike
+    rate_profile = data.get('rate_profile') or (scenario or {}).get('rate_profile')
+    create_profile(rate_profile, events_per_second)
+    resolve_sizes(industry, data.get('entities'))
+    correlated_log_share(data.get('correlated_logs'))
+    apm_metrics_options(data.get('apm_metrics'))
+    bootstrap = bootstrap_settings(data.get('bootstrap'))
+    if bootstrap and engine != 'async' and sink_config.get('type', 'elasticsearch') != 'elasticsearch':
+        raise ValueError('bootstrap only applies to the elasticsearch sink')
+
+    return {
+        'name': data.get('name') or f"{industry}/{scenario_key or 'normal'}",
+        'industry': industry,
+        'scenario_key': scenario_key,
+        'scenario': scenario,
+        'sink': sink_config,
+        'engine': engine,
+        'duration_minutes': duration_minutes,
+        'events_per_second': events_per_second,
+        'rate_profile': rate_profile,
+        'use_llm': data.get('use_llm', False),
+        'llm_provider': data.get('llm_provider', 'openai'),
+        'llm_api_key': data.get('llm_api_key', ''),
+        'concurrency': concurrency,
+        'workers': workers,
+        'max_catchup_seconds': max_catchup_seconds,
+        'seed': seed,
+        'backfill': backfill,
+        'bootstrap': bootstrap,
+        'self_metrics_interval': reporter_interval(data.get('self_metrics')),
+        'generator_options': {
+            'max_depth': trace_depth,
+            'max_fan_out': fan_out,
+            'start_time': data.get('start_time'),
+            'events_per_second': events_per_second,
+            'vectorized': vectorized,
+            'entities': data.get('entities'),
+            'correlated_logs': data.get('correlated_logs'),
+            'apm_metrics': data.get('apm_metrics')
+        }
+    }
+
+
+class GenerationJob:
+    """One generation run in its own thread (or worker processes), in any of the sync, async or backfill modes"""
+
+    STATES = ('starting', 'running', 'stopping', 'completed', 'stopped', 'failed')
+
+    def __init__(self, job_id, config, es_client=None, es_config=None, pipeline=None, bootstrap=None):
+        self.id = job_id
+        self.name = config['name']
+        self.config = config
+        self.es = es_client
+        self.es_config = es_config
+        self.pipeline = pipeline
+        # Shared IndexBootstrap this job holds a lease on, released when the job ends
+        self.bootstrap = bootstrap
+
+        self.state = 'starting'
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.generator = None
+        self.scheduler = None
+        self.engine = None
+        self.backfill_runner = None
+        self.worker_pool = None
+        self.reporter = None
+        self.thread = None
+
+        self._stop = threading.Event()
+        self._deadline = None
+
+    @property
+    def uses_elasticsearch(self):
+        return self.config['engine'] == 'async' or self.config['sink'].get('type', 'elasticsearch') == 'elasticsearch'
+
+    def _create_sink(self):
+        """Sink for this job; Elasticsearch output goes through the shared client and bulk pipeline"""
+        sink_config = self.config['sink']
+        options = bulk_options(sink_config)
+        if self.config['engine'] == 'async':
+            return AsyncBulkSink(**options)
+        if sink_config.get('type', 'elasticsearch') == 'elasticsearch' and self.pipeline is not None:
+            return PipelinedBulkSink(self.es, self.pipeline, **options)
+        return create_sink(sink_config, self.es)
+
+    def start(self):
+        """Build the generator (or worker pool) and start generating in the background"""
+        config = self.config
+        if self.uses_elasticsearch and self.es is None:
+            raise ValueError('Not connected to Elasticsearch')
+
+        if config['workers'] > 1:
+            # Shard the rate across worker processes; each process has its own client and sink
+            self.worker_pool = GenerationWorkerPool(
+                config['industry'],
+                config['events_per_second'],
+                workers=config['workers'],
+                scenario=config['scenario'],
+                es_config=self.es_config,
+                sink_config=config['sink'],
+                engine=config['engine'],
+                concurrency=config['concurrency'],
+                max_catchup_seconds=config['max_catchup_seconds'],
+                seed=config['seed'],
+                generator_options=config['generator_options'],
+                backfill=config['backfill'],
+                self_metrics_interval=config['self_metrics_interval'],
+                rate_profile=config['rate_profile']
+            )
+            self.worker_pool.start(config['duration_minutes'] * 60)
+            target = self._run_pool
+            print(f"🚀 Job {self.id}: started {self.worker_pool.workers} worker processes for {config['industry']} "
+                  f"at {config['events_per_second']} events/second")
+        else:
+            self.generator = EnhancedObservabilityGenerator(
+                self.es,
+                config['industry'],
+                scenario=config['scenario'],
+                use_llm=config['use_llm'],
+                llm_provider=config['llm_provider'],
+                llm_api_key=config['llm_api_key'],
+                sink=self._create_sink(),
+                seed=config['seed'],
+                **config['generator_options']
+            )
+            print(f"✅ Job {self.id}: generator created for {config['industry']} "
+                  f"(sink: {config['sink'].get('type', 'elasticsearch')}, engine: {config['engine']})")
+            scenario = config['scenario']
+            if scenario:
+                print(f"📋 Scenario: {scenario.get('name')}")
+                print(f"   Error rate: {scenario.get('error_rate', 0.02)*100}%")
+                print(f"   Latency multiplier: {scenario.get('latency_multiplier', 1.0)}x")
+
+            backfill = config['backfill']
+            if backfill:
+                self.backfill_runner = BackfillRunner(self.generator, backfill.get('start_time'),
+                                                      backfill.get('end_time'),
+                                                      events_per_second=config['events_per_second'])
+                if config['rate_profile']:
+                    self.backfill_runner.set_profile(self._profile(self.backfill_runner.start_us))
+                print(f"⏪ Backfill from {backfill.get('start_time')} to {backfill.get('end_time') or 'now'}")
+                target = self._run_backfill
+            elif config['engine'] == 'async':
+                target = self._run_async
+            else:
+                target = self._run_sync
+
+            if config['self_metrics_interval']:
+                # The job's own counters go through its sink into metrics-generator-default
+                labels = {'industry': config['industry'], 'scenario': config['scenario_key'] or 'normal',
+                          'job': self.id}
+                self.reporter = SelfMetricsReporter(self.generator.sink, self.get_stats,
+                                                    config['self_metrics_interval'], labels)
+                self.reporter.start()
+                print(f"📡 Self-metrics every {config['self_metrics_interval']}s to {SelfMetricsReporter.INDEX}")
+
+        self.started_at = time.time()
+        self._deadline = time.monotonic() + config['duration_minutes'] * 60
+        self.state = 'running'
+        self.thread = threading.Thread(target=self._run, args=(target,), name=f'job-{self.id}', daemon=True)
+        self.thread.start()
+
+    def _profile(self, start_us=None):
+        """The configured rate profile, or None for a constant rate"""
+        if start_us is None and isinstance(self.generator.clock, VirtualClock):
+            start_us = self.generator.clock.now_us
+        return create_profile(self.config['rate_profile'], self.config['events_per_second'], start_us)
+
+    def _run(self, target):
+        """Run one mode to the end and record how it finished"""
+        try:
+            target()
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Job {self.id} failed: {e}")
+        if self.reporter:
+            self.reporter.stop(final_report=self.config['engine'] == 'sync' and not self.backfill_runner)
+        if self.generator and self.config['engine'] == 'sync' and not self.backfill_runner:
+            # Ship whatever is still buffered in the bulk sink
+            self.generator.close()
+        if self.bootstrap:
+            self.bootstrap.release()
+
+        self.finished_at = time.time()
+        if self.error:
+            self.state = 'failed'
+        elif self._stop.is_set():
+            self.state = 'stopped'
+        else:
+            self.state = 'completed'
+
+        stats = self.get_stats()
+        print(f"✅ Job {self.id} {self.state}")
+        print(f"📈 Final stats: {stats['traces']} traces, {stats['logs']} logs, {stats['synthetics']} synthetics")
+        print(f"   Indexed: {stats['docs_indexed']} docs in {stats['bulk_requests']} bulk requests, "
+              f"{stats['docs_failed']} failed")
+
+    def _run_sync(self):
+        config = self.config
+        self.scheduler = RateScheduler(config['events_per_second'], max_catchup_seconds=config['max_catchup_seconds'],
+                                       profile=self._profile())
+        next_progress = time.monotonic() + 30
+
+        print(f"🚀 Job {self.id}: starting data generation...")
+        print(f"   Duration: {config['duration_minutes']} minutes")
+        print(f"   Rate: {config['events_per_second']} events/second")
+
+        batch_count = 0
+        error_count = 0
+
+        while time.monotonic() < self._deadline and not self._stop.is_set():
+            try:
+                count = self.scheduler.wait()
+                if count:
+                    self.generator.generate_batch(count)
+                    batch_count += 1
+                    error_count = 0
+
+                # Log progress every 30 seconds
+                if time.monotonic() >= next_progress:
+                    next_progress += 30
+                    stats = self.generator.get_stats()
+                    print(f"📊 Job {self.id}: {stats['traces']} traces, {stats['logs']} logs, "
+                          f"{stats['synthetics']} synthetics")
+                    print(f"   Rate: {self.scheduler.achieved_rate():.1f}/{self.scheduler.events_per_second:g} "
+                          f"events/second")
+            except Exception as e:
+                error_count += 1
+                print(f"❌ Job {self.id}: error generating batch {batch_count}: {e}")
+
+                # Stop if too many consecutive errors
+                if error_count > 10:
+                    raise RuntimeError('Too many errors, stopping generation')
+
+                time.sleep(1)
+
+    def _run_async(self):
+        config = self.config
+        print(f"🚀 Job {self.id}: starting async data generation...")
+        print(f"   Duration: {config['duration_minutes']} minutes")
+        print(f"   Rate: {config['events_per_second']} events/second, {config['concurrency']} bulk requests in flight")
+
+        async def run():
+            # The async client is bound to this job's event loop, so it cannot be shared with other jobs
+            from elasticsearch import AsyncElasticsearch
+            client = AsyncElasticsearch(**self.es_config)
+            self.engine = AsyncGenerationEngine(self.generator, client, concurrency=config['concurrency'],
+                                                max_catchup_seconds=config['max_catchup_seconds'],
+                                                rate_profile=self._profile())
+            if self._stop.is_set():
+                self.engine.stop()
+            try:
+                await self.engine.run(config['events_per_second'], self._deadline - time.monotonic())
+            finally:
+                await client.close()
+
+        asyncio.run(run())
+
+    def _run_backfill(self):
+        print(f"⏪ Job {self.id}: starting backfill at {self.config['events_per_second']} simulated events/second...")
+
+        async def run():
+            from elasticsearch import AsyncElasticsearch
+            client = AsyncElasticsearch(**self.es_config)
+            self.engine = AsyncGenerationEngine(self.generator, client, concurrency=self.config['concurrency'])
+            try:
+                await self.backfill_runner.run_async(self.engine)
+            finally:
+                await client.close()
+
+        if self.config['engine'] == 'async':
+            asyncio.run(run())
+        else:
+            self.backfill_runner.run()
+
+    def _run_pool(self):
+        while self.worker_pool.is_alive():
+            self.worker_pool.join(0.5)
+
+    def stop(self):
+        """Ask the job to finish; buffered documents are still flushed"""
+        self._stop.set()
+        if self.state in ('starting', 'running'):
+            self.state = 'stopping'
+        if self.engine:
+            self.engine.stop()
+        if self.worker_pool:
+            self.worker_pool.stop()
+        if self.backfill_runner:
+            self.backfill_runner.stop()
+
+    def resize(self, events_per_second=None, duration_minutes=None, rate_profile=None):
+        """Change the rate, rate profile and/or total duration of a running job; raises ValueError when it cannot
+
+        A new rate replaces the current profile unless a profile is given too,
+        in which case it becomes that profile's base rate. Changes reach the
+        scheduler within its longest sleep (half a second); buffered documents
+        are unaffected.
+        """
+        if not self.is_alive():
+            raise ValueError(f'Job {self.id} is not running')
+        if self.worker_pool:
+            raise ValueError('Worker-pool jobs cannot be resized; stop the job and start a new one')
+        if events_per_second is not None and (not isinstance(events_per_second, (int, float))
+                                              or events_per_second <= 0):
+            raise ValueError('rate must be a positive number')
+        if duration_minutes is not None:
+            if not isinstance(duration_minutes, (int, float)) or duration_minutes <= 0:
+                raise ValueError('duration must be a positive number of minutes')
+            if self.backfill_runner:
+                raise ValueError('Backfill jobs run until their end_time; only the rate can change')
+        if rate_profile is not None:
+            create_profile(rate_profile, events_per_second or self.config['events_per_second'])
+
+        scheduler = self.engine.scheduler if self.engine else self.scheduler
+        if events_per_second is not None:
+            self.config['events_per_second'] = events_per_second
+            self.config['rate_profile'] = None
+            if self.backfill_runner:
+                self.backfill_runner.set_rate(events_per_second)
+            else:
+                if scheduler:
+                    scheduler.set_rate(events_per_second)
+                # Simulated timestamps keep their spacing in step with the rate
+                if isinstance(self.generator.clock, VirtualClock):
+                    self.generator.clock.set_rate(events_per_second)
+
+        if rate_profile is not None:
+            self.config['rate_profile'] = rate_profile
+            if self.backfill_runner:
+                self.backfill_runner.set_profile(self._profile(self.backfill_runner.clock.now_us))
+            elif scheduler:
+                scheduler.set_profile(self._profile())
+
+        if duration_minutes is not None:
+            deadline = time.monotonic() + duration_minutes * 60 - (time.time() - self.started_at)
+            if self.engine and self.engine.deadline is not None:
+                # The engine's loop clock is monotonic too, so shift its deadline by the same amount
+                self.engine.deadline += deadline - self._deadline
+            self._deadline = deadline
+            self.config['duration_minutes'] = duration_minutes
+
+        profile = self.config['rate_profile']
+        print(f"🎚️ Job {self.id} resized: {self.config['events_per_second']} events/second"
+              f"{' (' + profile.get('type', 'constant') + ' profile)' if profile else ''} "
+              f"for {self.config['duration_minutes']} minutes")
+
+    def is_alive(self):
+        """True while the job is still generating or flushing"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def get_stats(self):
+        """Statistics of this job, whichever mode it uses"""
+        if self.worker_pool:
+            return self.worker_pool.get_stats()
+        if not self.generator:
+            return dict(EMPTY_STATS)
+
+        stats = self.generator.get_stats()
+        if self.backfill_runner:
+            stats.update(self.backfill_runner.get_stats())
+        if self.engine:
+            stats.update(self.engine.get_stats())
+        elif self.scheduler:
+            stats.update(self.scheduler.get_stats())
+        return stats
+
+    def describe(self):
+        """Job settings and state, without statistics"""
+        config = self.config
+        remaining = max(0, self._deadline - time.monotonic()) if self._deadline and self.is_alive() else 0
+        return {
+            'id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'industry': config['industry'],
+            'scenario': config['scenario_key'],
+            'engine': config['engine'],
+            'workers': self.worker_pool.workers if self.worker_pool else config['workers'],
+            'sink': config['sink'].get('type', 'elasticsearch'),
+            'rate': config['events_per_second'],
+            'rate_profile': config['rate_profile'],
+            'duration': config['duration_minutes'],
+            'backfill': bool(config['backfill']),
+            'bootstrap': config['bootstrap'],
+            'remaining_seconds': int(remaining),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """Creates and tracks generation jobs that share one Elasticsearch client and one bulk pipeline"""
+
+    def __init__(self, es_client=None, es_config=None, senders=4, output_dir=DEFAULT_OUTPUT_DIR):
+        self.es_client = es_client
+        self.es_config = es_config
+        # File and dataset sinks of jobs write below this directory only
+        self.output_dir = output_dir
+        self.pipeline = BulkPipeline(senders=senders)
+        self.bootstrap = IndexBootstrap(es_client) if es_client is not None else None
+        self._bootstrap_held = False
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def connect(self, es_client, es_config):
+        """Use a new Elasticsearch client for jobs created from now on"""
+        self.es_client = es_client
+        self.es_config = es_config
+        # Jobs already running keep releasing the bootstrap they acquired
+        self.bootstrap = IndexBootstrap(es_client) if es_client is not None else None
+        self._bootstrap_held = False
+
+    def _acquire_bootstrap(self, settings):
+        if self.bootstrap is None:
+            raise ValueError('Not connected to Elasticsearch')
+        self.bootstrap.acquire(settings)
+        return self.bootstrap
+
+    def create(self, data):
+        """Validate a job request, start the job and return it"""
+        config = parse_job_config(data, self.output_dir)
+        if config['sink'].get('type') in PATH_SINKS:
+            os.makedirs(os.path.dirname(config['sink']['path']), exist_ok=True)
+        with self._lock:
+            job_id = str(next(self._ids))
+        bootstrap = self._acquire_bootstrap(config['bootstrap']) if config['bootstrap'] else None
+        job = GenerationJob(job_id, config, self.es_client, self.es_config, self.pipeline, bootstrap)
+        try:
+            job.start()
+        except Exception:
+            if bootstrap:
+                bootstrap.release()
+            raise
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def list(self):
+        """All jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id):
+        """Job by id, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def running(self):
+        """Jobs that are still generating or flushing"""
+        return [job for job in self.list() if job.is_alive()]
+
+    def latest(self):
+        """Most recently created job, or None"""
+        jobs = self.list()
+        return jobs[-1] if jobs else None
+
+    def stop_all(self):
+        """Stop every running job"""
+        for job in self.running():
+            job.stop()
+
+    def remove(self, job_id):
+        """Forget a finished job; raises ValueError while it is still running"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.is_alive():
+                raise ValueError(f'Job {job_id} is still running; stop it first')
+            return self._jobs.pop(job_id)
+
+    def hold_bootstrap(self, value=True):
+        """Install index templates outside of any job, until drop_bootstrap(); raises ValueError/RuntimeError"""
+        settings = bootstrap_settings(value)
+        if not settings:
+            raise ValueError('bootstrap must be true or an object of index settings')
+        with self._lock:
+            if self._bootstrap_held:
+                return
+            self._acquire_bootstrap(settings)
+            self._bootstrap_held = True
+
+    def drop_bootstrap(self):
+        """Give up the hold from hold_bootstrap(); templates are restored once no job uses them either"""
+        with self._lock:
+            if self._bootstrap_held:
+                self._bootstrap_held = False
+                self.bootstrap.release()
+
+    def get_stats(self):
+        """Job counts and shared pipeline statistics"""
+        jobs = self.list()
+        return {
+            'jobs_total': len(jobs),
+            'jobs_running': sum(1 for job in jobs if job.is_alive()),
+            'pipeline': self.pipeline.get_stats()
+        }
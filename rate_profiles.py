@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Rate profiles for the Observability Data Generator
+Target events/sec that changes over a run: constant, linear ramp, steps, sine/diurnal and spikes
+"""
+
+import math
+
+from fast_ids import now_us
+
+
+class RateProfile:
+    """Target events/sec as a function of seconds since the run started"""
+
+    name = 'constant'
+
+    def __init__(self, rate):
+        self.base_rate = float(rate)
+        self.scale = 1.0
+
+    def rate_at(self, elapsed):
+        """Target rate elapsed seconds into the run"""
+        return max(0.0, self._rate(elapsed) * self.scale)
+
+    def _rate(self, elapsed):
+        return self.base_rate
+
+    def peak_rate(self):
+        """Highest target rate over the whole run"""
+        return max(0.0, self._peak() * self.scale)
+
+    def _peak(self):
+        return self.base_rate
+
+
+class RampProfile(RateProfile):
+    """Linear change from one rate to another over a number of seconds, then holds the final rate"""
+
+    name = 'ramp'
+
+    def __init__(self, rate, to_rate, seconds, from_rate=None):
+        super().__init__(rate)
+        self.from_rate = float(from_rate if from_rate is not None else rate)
+        self.to_rate = float(to_rate)
+        self.seconds = seconds
+
+    def _rate(self, elapsed):
+        if elapsed >= self.seconds:
+            return self.to_rate
+        return self.from_rate + (self.to_rate - self.from_rate) * elapsed / self.seconds
+
+    def _peak(self):
+        return max(self.from_rate, self.to_rate)
+
+
+class StepProfile(RateProfile):
+    """Switches to a new rate at given offsets; [[60, 100], [300, 50]] means 100/s after 1m, 50/s after 5m"""
+
+    name = 'step'
+
+    def __init__(self, rate, steps):
+        super().__init__(rate)
+        self.steps = sorted((float(at), float(step_rate)) for at, step_rate in steps)
+
+    def _rate(self, elapsed):
+        current = self.base_rate
+        for at, step_rate in self.steps:
+            if elapsed < at:
+                break
+            current = step_rate
+        return current
+
+    def _peak(self):
+        return max([self.base_rate] + [step_rate for _, step_rate in self.steps])
+
+
+class SineProfile(RateProfile):
+    """Oscillates around the base rate by amplitude (a fraction of it) with the given period"""
+
+    name = 'sine'
+
+    def __init__(self, rate, amplitude=0.5, period_seconds=3600, phase_seconds=0):
+        super().__init__(rate)
+        self.amplitude = amplitude
+        self.period_seconds = period_seconds
+        self.phase_seconds = phase_seconds
+
+    def _rate(self, elapsed):
+        angle = 2 * math.pi * (elapsed + self.phase_seconds) / self.period_seconds
+        return self.base_rate * (1 + self.amplitude * math.sin(angle))
+
+    def _peak(self):
+        return self.base_rate * (1 + abs(self.amplitude))
+
+
+class SpikeProfile(RateProfile):
+    """Base rate with one burst to multiplier x base: ramp up, hold, ramp back down"""
+
+    name = 'spike'
+
+    def __init__(self, rate, multiplier=10, start_seconds=60, ramp_seconds=30, hold_seconds=300):
+        super().__init__(rate)
+        self.multiplier = multiplier
+        self.start_seconds = start_seconds
+        self.ramp_seconds = ramp_seconds
+        self.hold_seconds = hold_seconds
+
+    def _rate(self, elapsed):
+        into = elapsed - self.start_seconds
+        peak = self.ramp_seconds + self.hold_seconds
+        if into <= 0 or into >= peak + self.ramp_seconds:
+            level = 0.0
+        elif into < self.ramp_seconds:
+            level = into / self.ramp_seconds
+        elif into <= peak:
+            level = 1.0
+        else:
+            level = 1 - (into - peak) / self.ramp_seconds
+        return self.base_rate * (1 + (self.multiplier - 1) * level)
+
+    def _peak(self):
+        return self.base_rate * max(1, self.multiplier)
+
+
+PROFILE_TYPES = ('constant', 'ramp', 'step', 'sine', 'diurnal', 'spike')
+
+
+def create_profile(config, rate, start_us=None, scale=1.0):
+    """Build a profile from a config dict such as {'type': 'spike', 'multiplier': 10}; raises ValueError
+
+    rate is the run's base rate, used where the config does not give one.
+    start_us anchors the diurnal profile to the time of day the run starts
+    at (simulated time for backfills). scale multiplies every rate, for
+    workers that produce a share of the total.
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict):
+        raise ValueError('rate_profile must be an object with a type')
+    profile_type = config.get('type', 'constant')
+    rate = config.get('rate', rate)
+
+    try:
+        if profile_type == 'constant':
+            profile = RateProfile(rate)
+        elif profile_type == 'ramp':
+            profile = RampProfile(rate, config['to_rate'], config.get('seconds', 300), config.get('from_rate'))
+        elif profile_type == 'step':
+            profile = StepProfile(rate, config['steps'])
+        elif profile_type == 'sine':
+            profile = SineProfile(rate, config.get('amplitude', 0.5), config.get('period_seconds', 3600),
+                                  config.get('phase_seconds', 0))
+        elif profile_type == 'diurnal':
+            # Daily sine peaking at peak_hour (UTC) and bottoming out 12 hours later
+            seconds_of_day = ((start_us if start_us is not None else now_us()) // 1000000) % 86400
+            peak = config.get('peak_hour', 14) * 3600
+            profile = SineProfile(rate, config.get('amplitude', 0.6), 86400,
+                                  seconds_of_day - peak + 21600)
+            profile.name = 'diurnal'
+        elif profile_type == 'spike':
+            profile = SpikeProfile(rate, config.get('multiplier', 10), config.get('start_seconds', 60),
+                                   config.get('ramp_seconds', 30), config.get('hold_seconds', 300))
+        else:
+            raise ValueError(f'Unknown rate profile: {profile_type}, expected one of {", ".join(PROFILE_TYPES)}')
+    except (KeyError, TypeError) as e:
+        raise ValueError(f'Invalid {profile_type} rate profile: {e}')
+
+    if (getattr(profile, 'period_seconds', 1) <= 0 or getattr(profile, 'seconds', 1) <= 0
+            or getattr(profile, 'ramp_seconds', 1) <= 0):
+        raise ValueError(f'Invalid {profile_type} rate profile: durations must be positive')
+    profile.scale = scale
+    return profile
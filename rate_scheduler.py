@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Rate scheduling for the Observability Data Generator
+Token bucket that holds a target events/sec and spreads emission evenly over time
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class RateScheduler:
+    """Token bucket releasing events in small, evenly spaced ticks"""
+
+    # Longest single sleep, so rate changes from other threads take effect within this time
+    MAX_DELAY_SECONDS = 0.5
+
+    def __init__(self, events_per_second, tick_seconds=0.02, max_catchup_seconds=2.0, window_seconds=5.0,
+                 clock=time.monotonic, profile=None):
+        self.events_per_second = float(events_per_second)
+        self.profile = profile
+        self._profile_start = None
+        self.tick_seconds = tick_seconds
+        self.max_catchup_seconds = max_catchup_seconds
+        self.window_seconds = window_seconds
+        self.clock = clock
+
+        self._tokens = 0.0
+        self._last = None
+        self._start = None
+        self._window = deque()
+
+        self.events_emitted = 0
+        self.events_dropped = 0
+
+    def _refill(self, now):
+        """Accrue tokens since the last refill, dropping anything past the catch-up bound"""
+        if self._last is None:
+            self._start = self._last = now
+            self._window.append((now, 0))
+            return
+
+        self._tokens += (now - self._last) * self.events_per_second
+        self._last = now
+
+        # A stall may be made up for at most max_catchup_seconds worth of events
+        capacity = max(1.0, self.events_per_second * self.max_catchup_seconds)
+        if self._tokens > capacity:
+            self.events_dropped += int(self._tokens - capacity)
+            self._tokens = capacity
+
+    def take(self):
+        """Return the whole number of events that are due right now"""
+        now = self.clock()
+        self._refill(now)
+
+        if self.profile is not None:
+            if self._profile_start is None:
+                self._profile_start = now
+            self.events_per_second = self.profile.rate_at(now - self._profile_start)
+
+        count = int(self._tokens)
+        self._tokens -= count
+        self.events_emitted += count
+
+        self._window.append((now, self.events_emitted))
+        while len(self._window) > 2 and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+        return count
+
+    def delay(self):
+        """Seconds to wait before the next tick has at least one event due"""
+        if self._last is None or self.events_per_second <= 0:
+            return self.tick_seconds
+        missing = 1.0 - self._tokens
+        if missing <= 0:
+            return 0.0
+        elapsed = self.clock() - self._last
+        return min(self.MAX_DELAY_SECONDS, max(self.tick_seconds, missing / self.events_per_second - elapsed))
+
+    def wait(self):
+        """Block until the next tick and return the number of events to emit"""
+        time.sleep(self.delay())
+        return self.take()
+
+    async def wait_async(self):
+        """Asyncio variant of wait()"""
+        await asyncio.sleep(self.delay())
+        return self.take()
+
+    def set_rate(self, events_per_second):
+        """Change the target rate without losing accrued tokens; replaces any rate profile"""
+        if self._last is not None:
+            self._refill(self.clock())
+        self.profile = None
+        self.events_per_second = float(events_per_second)
+
+    def set_profile(self, profile):
+        """Follow a rate profile from now on; its offsets count from this call"""
+        if self._last is not None:
+            self._refill(self.clock())
+        self.profile = profile
+        self._profile_start = None
+
+    def achieved_rate(self):
+        """Events per second emitted over the recent window"""
+        if len(self._window) < 2:
+            return 0.0
+        (start, first), (end, last) = self._window[0], self._window[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+
+    def get_stats(self):
+        """Get target vs achieved rate"""
+        elapsed = (self._last - self._start) if self._start is not None else 0
+        return {
+            'target_rate': self.events_per_second,
+            'achieved_rate': round(self.achieved_rate(), 2),
+            'average_rate': round(self.events_emitted / elapsed, 2) if elapsed > 0 else 0,
+            'events_scheduled': self.events_emitted,
+            'events_dropped': self.events_dropped,
+            'backlog_events': int(self._tokens),
+            'rate_profile': self.profile.name if self.profile is not None else 'constant'
+        }
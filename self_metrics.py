@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Self-observability for the Observability Data Generator
+Periodically writes the generator's own throughput and bulk counters as metric documents
+"""
+
+import socket
+import threading
+import time
+
+from fast_ids import TimestampFormatter, now_us
+
+
+def reporter_interval(value, default_interval=10):
+    """Report interval from a self_metrics setting (true, seconds, or {"interval_seconds": N}), or None when off
+
+    Raises ValueError unless the interval is a positive number of seconds.
+    """
+    if not value:
+        return None
+    if isinstance(value, dict):
+        unknown = set(value) - {'interval_seconds'}
+        if unknown:
+            raise ValueError(f'Unknown self_metrics options: {", ".join(sorted(unknown))}')
+        interval = value.get('interval_seconds', default_interval)
+    elif value is True:
+        interval = default_interval
+    else:
+        interval = value
+    if not isinstance(interval, (int, float)) or isinstance(interval, bool) or not 0 < interval < float('inf'):
+        raise ValueError('self_metrics interval must be a positive number of seconds')
+    return interval
+
+
+class SelfMetricsReporter:
+    """Writes one aggregated metrics document per interval into metrics-generator-default
+
+    Reads counters the generator and sink already keep, so the hot path is
+    untouched; rates and bulk latency are derived from the change in those
+    counters between two reports. Documents go through the given sink, i.e.
+    the same bulk pipeline as the generated data.
+    """
+
+    INDEX = 'metrics-generator-default'
+
+    def __init__(self, sink, stats_source, interval_seconds=10, labels=None):
+        self.sink = sink
+        self.stats_source = stats_source
+        self.interval_seconds = interval_seconds
+        self.labels = dict(labels or {})
+        self.host_name = socket.gethostname()
+        self.format_timestamp = TimestampFormatter()
+        self.reports = 0
+
+        self._previous = None
+        self._previous_time = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Report every interval_seconds on a background thread"""
+        self._previous = self.stats_source()
+        self._previous_time = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='self-metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self, final_report=True):
+        """Stop reporting, writing one last document for the partial interval"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if final_report:
+                self.report()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.report()
+            except Exception as e:
+                print(f"⚠️ Self-metrics report failed: {e}")
+
+    def report(self):
+        """Build and send one metrics document covering the time since the previous report"""
+        stats = self.stats_source()
+        current_time = time.monotonic()
+        self.sink.add(self.INDEX, self.build_document(stats, current_time))
+        self._previous = stats
+        self._previous_time = current_time
+        self.reports += 1
+
+    def build_document(self, stats, current_time):
+        """Metrics document from a stats snapshot and the previous one"""
+        previous = self._previous or {}
+        interval = current_time - self._previous_time if self._previous_time else 0
+
+        def delta(key):
+            return stats.get(key, 0) - previous.get(key, 0)
+
+        def per_second(key):
+            return round(delta(key) / interval, 2) if interval > 0 else 0
+
+        bulk_requests = delta('bulk_requests')
+        failures = stats.get('failures_by_status') or {}
+        previous_failures = previous.get('failures_by_status') or {}
+
+        document = {
+            '@timestamp': self.format_timestamp(now_us()),
+            'data_stream': {'type': 'metrics', 'dataset': 'generator', 'namespace': 'default'},
+            'event': {'dataset': 'generator', 'module': 'generator', 'duration': int(interval * 1e9)},
+            'service': {'name': 'observability-data-generator', 'type': 'generator'},
+            'host': {'name': self.host_name},
+            'metricset': {'name': 'self', 'period': int(self.interval_seconds * 1000)},
+            'labels': self.labels,
+            'generator': {
+                'traces': {'total': stats.get('traces', 0), 'per_second': per_second('traces')},
+                'logs': {'total': stats.get('logs', 0), 'per_second': per_second('logs')},
+                'synthetics': {'total': stats.get('synthetics', 0), 'per_second': per_second('synthetics')},
+                'docs': {
+                    'indexed': stats.get('docs_indexed', 0),
+                    'failed': stats.get('docs_failed', 0),
+                    'per_second': per_second('docs_indexed'),
+                    # Queue depth: documents accepted but not yet acknowledged by Elasticsearch
+                    'pending': stats.get('docs_pending', 0)
+                },
+                'bulk': {
+                    'requests': stats.get('bulk_requests', 0),
+                    'errors': stats.get('bulk_errors', 0),
+                    'bytes': stats.get('bytes_sent', 0),
+                    'latency': {
+                        'avg_ms': round(delta('bulk_seconds') / bulk_requests * 1000, 2) if bulk_requests else 0
+                    },
+                    # Items rejected for overload are resent; only those that ran out of retries also fail as 429
+                    'rejected': stats.get('docs_rejected', 0) + failures.get('429', 0),
+                    'rejected_in_interval': (delta('docs_rejected') + failures.get('429', 0)
+                                             - previous_failures.get('429', 0)),
+                    'retries': stats.get('bulk_retries', 0),
+                    'size': stats.get('bulk_size')
+                }
+            }
+        }
+        rate = {key: stats[key] for key in ('target_rate', 'achieved_rate', 'events_dropped') if key in stats}
+        if rate:
+            document['generator']['rate'] = rate
+        return document
@@ -59,7 +59,6 @@ if [ ! -f "requirements.txt" ]; then
     cat > requirements.txt << 'EOF'
 flask==3.0.0
 elasticsearch==8.11.0
-faker==20.1.0
 requests==2.31.0
 python-dateutil==2.8.2
 EOF
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Output sinks for the Observability Data Generator
+Elasticsearch _bulk, NDJSON file, stdout and in-memory destinations for generated documents
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+from encoding import dumps
+from backpressure import AdaptiveLimit, Backoff, is_rejected_item, is_retriable_error
+from instrumentation import stage_timer
+from stats import StatsCollector, group, window_rates
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def encode_document(document):
+    """Serialize a document to a compact JSON line"""
+    if stage_timer.enabled:
+        start = time.perf_counter()
+        line = dumps(document) + b'\n'
+        stage_timer.observe('encode', time.perf_counter() - start)
+        return line
+    return dumps(document) + b'\n'
+
+
+def encode_action(index):
+    """Build the bulk action line that targets an index"""
+    return b'{"create":{"_index":' + json.dumps(index).encode('utf-8') + b'}}\n'
+
+
+class Sink:
+    """Base class for output sinks"""
+
+    # Whether add_encoded takes pre-serialized lines without decoding them again
+    accepts_encoded = False
+
+    # Counters every sink reports, also when they are still zero
+    COUNTERS = ('docs_indexed', 'docs_failed', 'bulk_requests', 'bulk_errors', 'bytes_sent', 'bulk_seconds',
+                'docs_rejected', 'docs_retried', 'bulk_retries', 'backoff_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Counted per thread without locking; ('index', name) and ('failures_by_status', status) are grouped
+        self.stats = StatsCollector()
+        self.last_error = None
+
+    def add(self, index, document):
+        """Accept one document for the given index"""
+        raise NotImplementedError
+
+    def add_encoded(self, index, line):
+        """Accept one document already serialized as a JSON line"""
+        self.add(index, json.loads(line))
+
+    def _count(self, index, size):
+        """Count one written document of the given size"""
+        add = self.stats.add
+        add('docs_indexed')
+        add(('index', index))
+        add('bytes_sent', size)
+
+    def flush_expired(self):
+        """Flush data that has been buffered for too long"""
+
+    def flush(self):
+        """Flush all buffered data"""
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+    def pending(self):
+        """Number of documents accepted but not yet written"""
+        return 0
+
+    def get_stats(self):
+        """Get a snapshot of sink statistics with rolling rates per counter and per index"""
+        totals, rates = self.stats.snapshot()
+        stats = {key: totals.get(key, 0) for key in self.COUNTERS}
+        stats['failures_by_status'] = {status: count for status, count in
+                                       ((key[1], value) for key, value in totals.items()
+                                        if isinstance(key, tuple) and key[0] == 'failures_by_status')}
+        stats['last_error'] = self.last_error
+        stats['docs_pending'] = self.pending()
+        stats['rates'] = {key: window_rates(rates, key) for key in self.COUNTERS if not key.endswith('_seconds')}
+        stats['indices'] = group(totals, rates, 'index')
+        return stats
+
+
+class _IndexBuffer:
+    """Pending bulk lines for a single target index"""
+
+    __slots__ = ('lines', 'docs', 'size', 'created')
+
+    def __init__(self):
+        self.lines = []
+        self.docs = 0
+        self.size = 0
+        self.created = time.monotonic()
+
+
+class ElasticsearchBulkSink(Sink):
+    """Buffered sink that accumulates documents per index and flushes them via _bulk"""
+
+    # Data streams (traces-*, logs-*, ...) only accept the create op type
+    CREATE_ACTION = b'{"create":{}}\n'
+
+    accepts_encoded = True
+
+    def __init__(self, es_client, max_docs=1000, max_bytes=5 * 1024 * 1024, max_age_seconds=1.0,
+                 max_retries=10, backoff=None, adaptive=True, target_latency_seconds=1.0, min_docs=100,
+                 max_docs_limit=None):
+        super().__init__()
+        self.es = es_client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+        # Overload handling: rejected items are resent after a backoff, up to max_retries times (None = forever)
+        self.max_retries = max_retries
+        self.backoff = backoff if backoff is not None else Backoff()
+        # Bulk size follows latency: smaller when the cluster is slow or rejecting, larger when it is idle
+        self.batch_size = None
+        if adaptive:
+            self.batch_size = AdaptiveLimit(max_docs, minimum=min(min_docs, max_docs),
+                                            maximum=max_docs_limit or max_docs * 4,
+                                            target_latency_seconds=target_latency_seconds)
+
+        self._buffers = {}
+        self._retrying = 0
+
+    def add(self, index, document):
+        """Queue a document for the given index, flushing when a threshold is hit"""
+        self.add_encoded(index, encode_document(document))
+
+    def add_encoded(self, index, line):
+        """Append a serialized document to the index buffer, flushing when a threshold is hit"""
+        ready = None
+        timed = stage_timer.enabled
+        if timed:
+            start = time.perf_counter()
+
+        with self._lock:
+            buffer = self._buffers.get(index)
+            if buffer is None:
+                buffer = self._buffers[index] = _IndexBuffer()
+            buffer.lines.append(self.CREATE_ACTION)
+            buffer.lines.append(line)
+            buffer.docs += 1
+            buffer.size += len(self.CREATE_ACTION) + len(line)
+
+            if buffer.docs >= self.max_docs or buffer.size >= self.max_bytes:
+                ready = self._buffers.pop(index)
+
+        if timed:
+            stage_timer.observe('enqueue', time.perf_counter() - start)
+        if ready is not None:
+            self._send(index, ready)
+
+    def flush_expired(self):
+        """Flush every buffer that has been waiting longer than max_age_seconds"""
+        cutoff = time.monotonic() - self.max_age_seconds
+        with self._lock:
+            expired = [index for index, buffer in self._buffers.items() if buffer.created <= cutoff]
+            ready = [(index, self._buffers.pop(index)) for index in expired]
+
+        for index, buffer in ready:
+            self._send(index, buffer)
+
+    def flush(self):
+        """Flush all pending documents"""
+        with self._lock:
+            ready = list(self._buffers.items())
+            self._buffers = {}
+
+        for index, buffer in ready:
+            self._send(index, buffer)
+
+    def add_bulk(self, index, lines):
+        """Send already serialized action/source line pairs as one request, bypassing the index buffers"""
+        buffer = _IndexBuffer()
+        buffer.lines = lines
+        buffer.docs = len(lines) // 2
+        buffer.size = sum(map(len, lines))
+        self._send(index, buffer)
+
+    def _send(self, index, buffer):
+        """Send one buffer via _bulk, resending rejected items with backoff; True if anything had to be retried"""
+        lines, docs, attempt = buffer.lines, buffer.docs, 0
+        while True:
+            retry = self._send_once(index, lines, docs, attempt)
+            if retry is None:
+                return attempt > 0
+            lines, docs = retry
+            delay = self._start_retry(docs, attempt)
+            try:
+                time.sleep(delay)
+            finally:
+                self._end_retry(docs)
+            attempt += 1
+
+    def _send_once(self, index, lines, docs, attempt):
+        """One _bulk request; returns (lines, docs) still to resend, or None when done"""
+        start = time.perf_counter()
+        body = b''.join(lines)
+        try:
+            response = self.es.bulk(index=index, operations=body)
+        except Exception as e:
+            response = e
+        return self._handle_result(index, lines, docs, len(body), response, start, attempt)
+
+    def _start_retry(self, docs, attempt):
+        """Count docs as pending while they wait to be resent and return the backoff delay"""
+        delay = self.backoff.delay(attempt)
+        self.stats.add('backoff_seconds', delay)
+        with self._lock:
+            self._retrying += docs
+        return delay
+
+    def _end_retry(self, docs):
+        with self._lock:
+            self._retrying -= docs
+
+    def _handle_result(self, index, lines, doc_count, size, response, start, attempt):
+        """Record one bulk attempt; returns (lines, docs) still to resend, or None when done"""
+        sent = time.perf_counter()
+        can_retry = self.max_retries is None or attempt < self.max_retries
+
+        if isinstance(response, Exception):
+            if can_retry and is_retriable_error(response):
+                self._record_retry(index, doc_count, response, sent - start)
+                self._observe_send(start, None)
+                self._adapt(sent - start, True)
+                return lines, doc_count
+            self._record_failure(index, doc_count, response, sent - start)
+            self._observe_send(start, None)
+            return None
+
+        retry = self._record_response(index, response, doc_count, size, sent - start,
+                                      lines if can_retry else None)
+        self._observe_send(start, sent)
+        self._adapt(sent - start, bool(retry))
+        return (retry, len(retry) // 2) if retry else None
+
+    def _adapt(self, seconds, rejected):
+        """Resize future bulk requests from the outcome of the last one"""
+        if self.batch_size is not None:
+            self.max_docs = self.batch_size.observe(seconds, rejected)
+
+    def _observe_send(self, start, sent):
+        """Feed one bulk request's timings to the stage timer; sent is None when the request failed"""
+        if stage_timer.enabled:
+            done = time.perf_counter()
+            stage_timer.observe('bulk_request', (sent or done) - start)
+            if sent is not None:
+                stage_timer.observe('bulk_response', done - sent)
+            stage_timer.observe('flush', done - start)
+
+    def _record_failure(self, index, doc_count, error, seconds=0.0):
+        """Count a whole bulk request as failed"""
+        add = self.stats.add
+        add('bulk_requests')
+        add('bulk_seconds', seconds)
+        add('bulk_errors')
+        add('docs_failed', doc_count)
+        self.last_error = f'{index}: {error}'
+
+    def _record_retry(self, index, doc_count, error, seconds=0.0):
+        """Count a whole bulk request that failed transiently and will be resent"""
+        add = self.stats.add
+        add('bulk_requests')
+        add('bulk_seconds', seconds)
+        add('bulk_retries')
+        add('docs_retried', doc_count)
+        self.last_error = f'{index}: {error} (retrying)'
+
+    def _record_response(self, index, response, doc_count, size, seconds=0.0, lines=None):
+        """Count per-item successes and failures from a _bulk response
+
+        When lines (the request's action/source pairs) are given, items the
+        cluster rejected for overload are not failed but returned as the lines
+        to resend.
+        """
+        failed = 0
+        failures_by_status = {}
+        last_error = None
+        retry = []
+
+        if response.get('errors'):
+            for position, item in enumerate(response.get('items', [])):
+                result = next(iter(item.values()))
+                if result.get('status', 200) < 300:
+                    continue
+                if lines is not None and is_rejected_item(result):
+                    retry.append(lines[2 * position])
+                    retry.append(lines[2 * position + 1])
+                    continue
+                failed += 1
+                status = str(result.get('status'))
+                failures_by_status[status] = failures_by_status.get(status, 0) + 1
+                if last_error is None:
+                    error = result.get('error', {})
+                    last_error = f"{index}: {error.get('type', 'error')} - {error.get('reason', '')}"
+
+        rejected = len(retry) // 2
+        add = self.stats.add
+        add('bulk_requests')
+        add('bulk_seconds', seconds)
+        add('bytes_sent', size)
+        add('docs_indexed', doc_count - failed - rejected)
+        add(('index', index), doc_count - failed - rejected)
+        if failed:
+            add('docs_failed', failed)
+            for status, count in failures_by_status.items():
+                add(('failures_by_status', status), count)
+        if rejected:
+            add('docs_rejected', rejected)
+            add('docs_retried', rejected)
+            add('bulk_retries')
+        if last_error:
+            self.last_error = last_error
+        return retry
+
+    def pending(self):
+        """Number of documents waiting in index buffers or for a retry"""
+        with self._lock:
+            return sum(buffer.docs for buffer in self._buffers.values()) + self._retrying
+
+    def get_stats(self):
+        """Get sink statistics including the current bulk size"""
+        stats = super().get_stats()
+        stats['bulk_size'] = self.max_docs
+        return stats
+
+
+def open_output(path, compression=None, compression_level=3):
+    """(writable file, underlying raw file or None) for plain, gzip or zstd output"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=compression_level), None
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstd compression requires the zstandard package')
+        raw = open(path, 'wb')
+        return zstandard.ZstdCompressor(level=compression_level).stream_writer(raw), raw
+    return open(path, 'wb', buffering=1024 * 1024), None
+
+
+class NDJSONFileSink(Sink):
+    """Streams documents to a bulk-format NDJSON file that can be replayed with _bulk"""
+
+    COMPRESSIONS = (None, 'gzip', 'zstd')
+
+    accepts_encoded = True
+
+    def __init__(self, path, compression=None, compression_level=3):
+        super().__init__()
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f'Unsupported compression: {compression}')
+
+        self.path = path
+        self.compression = compression
+        self._file, self._raw = open_output(path, compression, compression_level)
+        self._actions = {}
+
+    def add(self, index, document):
+        """Append the action and source lines for one document"""
+        self.add_encoded(index, encode_document(document))
+
+    def add_encoded(self, index, line):
+        """Append the action line and an already serialized source line"""
+        with self._lock:
+            action = self._actions.get(index)
+            if action is None:
+                action = self._actions[index] = encode_action(index)
+            self._file.write(action)
+            self._file.write(line)
+        self._count(index, len(action) + len(line))
+
+    def flush(self):
+        """Push buffered bytes to the underlying file"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+        self.stats.add('bulk_requests')
+
+    def close(self):
+        """Finish the compressed stream and close the file"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            if self._raw is not None:
+                self._raw.close()
+
+
+class StdoutSink(Sink):
+    """Writes bulk-format NDJSON to standard output"""
+
+    accepts_encoded = True
+
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self._actions = {}
+
+    def add(self, index, document):
+        """Write the action and source lines for one document"""
+        self.add_encoded(index, encode_document(document))
+
+    def add_encoded(self, index, line):
+        """Write the action line and an already serialized source line"""
+        with self._lock:
+            action = self._actions.get(index)
+            if action is None:
+                action = self._actions[index] = encode_action(index)
+            self.stream.write(action + line)
+        self._count(index, len(action) + len(line))
+
+    def flush(self):
+        """Flush the output stream"""
+        with self._lock:
+            self.stream.flush()
+
+
+class MemorySink(Sink):
+    """Counts documents in memory, for measuring raw generation speed"""
+
+    def __init__(self, encode=False, keep_documents=False):
+        super().__init__()
+        self.encode = encode
+        # Only encoding sinks want pre-serialized lines; otherwise serialization is skipped entirely
+        self.accepts_encoded = encode
+        self.keep_documents = keep_documents
+        self.documents = []
+
+    def add(self, index, document):
+        """Count the document, optionally serializing and retaining it"""
+        self._count(index, len(encode_document(document)) if self.encode else 0)
+        if self.keep_documents:
+            self.documents.append((index, document))
+
+    def add_encoded(self, index, line):
+        """Count an already serialized document, decoding it only when documents are retained"""
+        self._count(index, len(line))
+        if self.keep_documents:
+            self.documents.append((index, json.loads(line)))
+
+    @property
+    def counts(self):
+        """Documents per index"""
+        return {key[1]: value for key, value in self.stats.totals().items()
+                if isinstance(key, tuple) and key[0] == 'index'}
+
+    def get_stats(self):
+        """Get sink statistics including per-index counts"""
+        stats = super().get_stats()
+        stats['counts'] = {index: values['total'] for index, values in stats['indices'].items()}
+        return stats
+
+
+SINK_TYPES = ('elasticsearch', 'file', 'dataset', 'stdout', 'memory')
+
+
+def bulk_options(config=None):
+    """Keyword arguments for a bulk sink from a sink config dict"""
+    config = config or {}
+    return {
+        'max_docs': config.get('max_docs', 1000),
+        'max_bytes': config.get('max_bytes', 5 * 1024 * 1024),
+        'max_age_seconds': config.get('max_age_seconds', 1.0),
+        'max_retries': config.get('max_retries', 10),
+        'adaptive': config.get('adaptive', True),
+        'target_latency_seconds': config.get('target_latency_seconds', 1.0)
+    }
+
+
+def confine_path(path, root):
+    """Absolute path of a client-supplied relative path under root; raises ValueError when it would leave root"""
+    if not isinstance(path, str) or not path:
+        raise ValueError('Sink path must be a non-empty string')
+    if os.path.isabs(path) or '..' in path.replace('\\', '/').split('/'):
+        raise ValueError(f'Sink path must be relative to the output directory, without "..": {path}')
+    root = os.path.realpath(root)
+    # realpath follows symlinks, so a link inside root cannot point the sink elsewhere
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f'Sink path is outside the output directory: {path}')
+    return resolved
+
+
+def create_sink(config=None, es_client=None):
+    """Build a sink from a config dict such as {'type': 'file', 'path': 'out.ndjson.gz', 'compression': 'gzip'}"""
+    config = config or {}
+    sink_type = config.get('type', 'elasticsearch')
+
+    if sink_type == 'elasticsearch':
+        if es_client is None:
+            raise ValueError('The elasticsearch sink requires a connected client')
+        return ElasticsearchBulkSink(es_client, **bulk_options(config))
+    if sink_type == 'file':
+        if not config.get('path'):
+            raise ValueError('The file sink requires a path')
+        return NDJSONFileSink(config['path'], compression=config.get('compression'))
+    if sink_type == 'dataset':
+        if not config.get('path'):
+            raise ValueError('The dataset sink requires a path')
+        from dataset import DEFAULT_COMPRESSION, DatasetSink
+        return DatasetSink(config['path'], compression=config.get('compression', DEFAULT_COMPRESSION),
+                           segment_docs=config.get('segment_docs', 250000),
+                           segment_bytes=config.get('segment_bytes', 256 * 1024 * 1024),
+                           metadata=config.get('metadata'))
+    if sink_type == 'stdout':
+        return StdoutSink()
+    if sink_type == 'memory':
+        return MemorySink(encode=config.get('encode', False))
+
+    raise ValueError(f'Unknown sink type: {sink_type}')
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Statistics for the Observability Data Generator
+Per-thread counters merged on read and rolling 1s/10s/60s rates per signal and index
+"""
+
+import threading
+import time
+import weakref
+from collections import deque
+
+WINDOWS = (1, 10, 60)
+
+
+class CounterSet:
+    """Counters sharded per thread: each thread only ever writes its own dict, reads merge all shards
+
+    Incrementing is a thread-local lookup and a dict update, with no lock;
+    the lock is only taken the first time a thread counts something (to
+    register its shard) and when reading. Shards of finished threads are
+    kept, so totals never go backwards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def add(self, key, amount=1):
+        """Add amount to a counter from the calling thread"""
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def totals(self):
+        """Sum of every counter over all threads"""
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # dict.copy() runs without releasing the GIL, so the owning thread cannot change it mid-copy
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class RateWindows:
+    """Rolling per-second rates of a set of counters, derived from timestamped samples of their totals"""
+
+    def __init__(self, windows=WINDOWS, min_interval=0.2, clock=time.monotonic):
+        self.windows = windows
+        self.min_interval = min_interval
+        self.clock = clock
+        self._samples = deque([(clock(), {})])
+        self._lock = threading.Lock()
+
+    def sample(self, totals, now=None):
+        """Record the totals at this moment; samples closer together than min_interval are skipped"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if now - self._samples[-1][0] < self.min_interval:
+                return
+            self._samples.append((now, totals))
+            # Keep one sample at least as old as the longest window to measure it from
+            horizon = now - max(self.windows)
+            while len(self._samples) > 1 and self._samples[1][0] <= horizon:
+                self._samples.popleft()
+
+    def rates(self, totals, now=None):
+        """{window_seconds: {key: per-second rate}} of the given current totals"""
+        now = self.clock() if now is None else now
+        self.sample(totals, now)
+        with self._lock:
+            samples = list(self._samples)
+
+        rates = {}
+        for window in self.windows:
+            # Newest sample at least window seconds old, or the oldest one while the run is younger than that
+            base_time, base = samples[0]
+            for sample_time, sample in reversed(samples):
+                if sample_time <= now - window:
+                    base_time, base = sample_time, sample
+                    break
+            elapsed = now - base_time
+            rates[window] = {
+                key: round((value - base.get(key, 0)) / elapsed, 2) if elapsed > 0 else 0.0
+                for key, value in totals.items()
+            }
+        return rates
+
+
+class _Sampler:
+    """One background thread that samples every registered source twice a second
+
+    Without it, rates would be measured between reads, so a 1s window read
+    every 30s would really cover 30s. Sources register themselves on their
+    first read and are held weakly.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._sources = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, source):
+        with self._lock:
+            self._sources.add(source)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stats-sampler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                sources = list(self._sources)
+            for source in sources:
+                try:
+                    source.sample()
+                except Exception as e:
+                    print(f"⚠️ Stats sampling failed: {e}")
+
+
+sampler = _Sampler()
+
+
+class StatsCollector:
+    """Thread-safe counters with rolling rates; keys are strings or (group, name) pairs such as ('index', name)"""
+
+    def __init__(self, windows=WINDOWS):
+        self.counters = CounterSet()
+        self.windows = RateWindows(windows)
+        # Bound once: the hot path calls collector.add(...) straight into the counter set
+        self.add = self.counters.add
+
+    def totals(self):
+        """Current totals of every counter"""
+        return self.counters.totals()
+
+    def sample(self):
+        """Record the current totals for the rate windows"""
+        self.windows.sample(self.totals())
+
+    def snapshot(self):
+        """(totals, {window: rates}) with rates covering the last 1s, 10s and 60s"""
+        sampler.register(self)
+        totals = self.totals()
+        return totals, self.windows.rates(totals)
+
+
+def window_rates(rates, key):
+    """{'1s': rate, '10s': rate, '60s': rate} of one counter"""
+    return {f'{window}s': values.get(key, 0.0) for window, values in rates.items()}
+
+
+def group(totals, rates, name):
+    """Totals and rates of every counter in a (name, member) group, e.g. docs per index"""
+    return {
+        key[1]: dict(total=value, **window_rates(rates, key))
+        for key, value in totals.items() if isinstance(key, tuple) and key[0] == name
+    }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Live statistics stream for the Observability Data Generator
+One producer aggregates stats on a fixed cadence and fans the snapshot out to every Server-Sent Events viewer
+"""
+
+import threading
+import time
+
+from encoding import dumps
+
+
+class StatsBroadcaster:
+    """Publishes the latest stats snapshot to any number of subscribers from a single producer thread
+
+    Each tick the producer calls source() once and serializes the result
+    once; viewers only wait for the next sequence number, so ten dashboards
+    cost the same as one. A slow viewer skips to the newest snapshot instead
+    of queueing old ones. The producer only runs while someone is watching.
+    """
+
+    def __init__(self, source, interval_seconds=1.0):
+        self.source = source
+        self.interval_seconds = interval_seconds
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._payload = None
+        self._subscribers = 0
+        self._thread = None
+        self.ticks = 0
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def subscribe(self):
+        """Register a viewer, starting the producer if it is the first"""
+        with self._condition:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stats-broadcaster', daemon=True)
+                self._thread.start()
+            return self._sequence
+
+    def unsubscribe(self):
+        """Remove a viewer; the producer stops after its current tick when none are left"""
+        with self._condition:
+            self._subscribers -= 1
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            with self._condition:
+                if self._subscribers <= 0:
+                    self._thread = None
+                    return
+            try:
+                payload = dumps(self.source())
+            except Exception as e:
+                payload = dumps({'error': f'Stats unavailable: {e}'})
+            with self._condition:
+                self._payload = payload
+                self._sequence += 1
+                self.ticks += 1
+                self._condition.notify_all()
+
+            next_tick += self.interval_seconds
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def wait(self, last_sequence, timeout=15.0):
+        """(sequence, JSON bytes) of the first snapshot newer than last_sequence, or None on timeout"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > last_sequence, timeout):
+                return None
+            return self._sequence, self._payload
+
+    def events(self, keepalive_seconds=15.0):
+        """Server-Sent Events for one viewer: a data event per snapshot and comments to keep idle proxies open"""
+        sequence = self.subscribe()
+        try:
+            yield f'retry: {int(self.interval_seconds * 3000)}\n\n'
+            while True:
+                published = self.wait(sequence, keepalive_seconds)
+                if published is None:
+                    yield ': keepalive\n\n'
+                    continue
+                sequence, payload = published
+                yield f'id: {sequence}\ndata: {payload.decode("utf-8")}\n\n'
+        finally:
+            # Runs when the viewer disconnects and the server closes the generator
+            self.unsubscribe()
@@ -2,7 +2,7 @@
 """Test if data generation works"""
 
 from elasticsearch import Elasticsearch
-from generator_advanced import ObservabilityDataGenerator
+from generator_enhanced import EnhancedObservabilityGenerator
 
 # Replace with your credentials
 CLOUD_ID = "your-cloud-id-here"
@@ -19,11 +19,12 @@ except Exception as e:
     exit(1)
 
 print("\nTesting data generation...")
-generator = ObservabilityDataGenerator(es, 'gaming')
+generator = EnhancedObservabilityGenerator(es, 'gaming')
 
 print("Generating 1 trace...")
 try:
-    generator.generate_trace()
+    generator.generate_distributed_trace()
+    generator.flush()
     print("✅ Trace generated")
 except Exception as e:
     print(f"❌ Trace generation failed: {e}")
@@ -31,6 +32,7 @@ except Exception as e:
 print("\nGenerating 1 log...")
 try:
     generator.generate_log()
+    generator.flush()
     print("✅ Log generated")
 except Exception as e:
     print(f"❌ Log generation failed: {e}")
@@ -41,7 +43,7 @@ print(f"Stats: {stats}")
 
 print("\nChecking indices...")
 try:
-    indices = es.cat.indices(index="apm*,logs*,synthetics*", format="json")
+    indices = es.cat.indices(index="*traces-apm*,*logs-*,*synthetics-*", format="json")
     for idx in indices:
         print(f"  {idx['index']}: {idx['docs.count']} docs")
 except Exception as e:
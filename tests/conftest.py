@@ -0,0 +1,6 @@
+"""Offline tests for the Observability Data Generator: run from the repository root with python -m pytest"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
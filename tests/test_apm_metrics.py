@@ -0,0 +1,79 @@
+"""APM metrics: 1-minute buckets close after a grace period, count every event and sample whole traces"""
+
+from apm_metrics import GRACE_US, INDICES, INTERVAL_US
+from fast_ids import TimestampParser
+from generator_enhanced import EnhancedObservabilityGenerator
+from sinks import MemorySink
+
+START_US = 1704067200 * 1000000
+
+
+def run(sample_rate=1.0, batches=6, close=True):
+    sink = MemorySink(keep_documents=True)
+    generator = EnhancedObservabilityGenerator(None, 'ecommerce', sink=sink, seed=9, start_time=START_US / 1000000,
+                                               events_per_second=4, apm_metrics={'sample_rate': sample_rate})
+    for _ in range(batches):
+        generator.generate_batch(100)
+    if close:
+        generator.close()
+    parse = TimestampParser()
+    metrics, events = {name: [] for name in INDICES}, []
+    names = {index: name for name, index in INDICES.items()}
+    for index, document in sink.documents:
+        if index in names:
+            metrics[names[index]].append(document)
+        elif index == 'traces-apm-default':
+            events.append(document)
+    return generator, metrics, events, parse
+
+
+def doc_count(documents, **match):
+    return sum(document['_doc_count'] for document in documents
+               if all(document['transaction'].get(key) == value for key, value in match.items()))
+
+
+def test_doc_counts_cover_every_event():
+    _, metrics, events, _ = run()
+    transactions = [event for event in events if event['processor']['event'] == 'transaction']
+    spans = [event for event in events if event['processor']['event'] == 'span']
+    assert transactions and spans
+    assert doc_count(metrics['transaction']) == len(transactions)
+    assert doc_count(metrics['transaction'], root=True) == sum('parent' not in event for event in transactions)
+    assert doc_count(metrics['service_transaction']) == len(transactions)
+    assert sum(document['_doc_count'] for document in metrics['service_destination']) == len(spans)
+    for document in metrics['transaction']:
+        duration = document['transaction']['duration']
+        assert sum(duration['histogram']['counts']) == duration['summary']['value_count'] == document['_doc_count']
+
+
+def test_buckets_close_a_grace_period_after_their_minute():
+    generator, metrics, events, parse = run(close=False)
+    timestamps = [event['timestamp']['us'] for event in events]
+    latest = max(timestamps)
+    minutes = {timestamp - timestamp % INTERVAL_US for timestamp in timestamps}
+    written = {parse(document['@timestamp']) for document in metrics['transaction']}
+    assert written
+    assert all(minute % INTERVAL_US == 0 for minute in written)
+    assert written == {minute for minute in minutes if minute + INTERVAL_US + GRACE_US <= latest}
+    assert generator.get_stats()['apm_metrics_buckets_open'] > 0
+
+    generator.close()
+    closed = {parse(document['@timestamp']) for index, document in generator.sink.documents
+              if index == INDICES['transaction']}
+    assert closed == minutes
+    assert generator.get_stats()['apm_metrics_buckets_open'] == 0
+
+
+def test_sampling_is_decided_at_the_root():
+    generator, metrics, events, _ = run(sample_rate=0.3)
+    traces = {}
+    for event in events:
+        traces.setdefault(event['trace']['id'], []).append(event)
+    roots = sum('parent' not in event for event in events if event['processor']['event'] == 'transaction')
+    sampled_out = generator.get_stats()['traces_sampled_out']
+    assert roots and sampled_out
+    assert 0.2 < roots / (roots + sampled_out) < 0.4
+    # A sampled trace is indexed whole, root included; metrics still count the sampled-out ones
+    for documents in traces.values():
+        assert sum('parent' not in document for document in documents) == 1
+    assert doc_count(metrics['transaction'], root=True) == roots + sampled_out
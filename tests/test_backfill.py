@@ -0,0 +1,94 @@
+"""Backfill chunking: every document lands inside [start_time, end_time]"""
+
+import pytest
+
+from backfill import BackfillRunner
+from fast_ids import TimestampParser, parse_time_us
+from generator_enhanced import EnhancedObservabilityGenerator
+from rate_profiles import create_profile
+from sinks import MemorySink
+
+START = '2024-01-01T00:00:00Z'
+END = '2024-01-01T00:05:00Z'
+
+
+def backfill(end=END, rate=17, profile=None, **options):
+    sink = MemorySink(keep_documents=True)
+    generator = EnhancedObservabilityGenerator(None, 'ecommerce', sink=sink, seed=1, **options)
+    runner = BackfillRunner(generator, START, end, events_per_second=rate)
+    if profile is not None:
+        runner.set_profile(profile)
+    runner.run()
+    parse = TimestampParser()
+    timestamps = [parse(document['@timestamp']) for _, document in sink.documents]
+    return runner, sink, timestamps
+
+
+@pytest.mark.parametrize('options', [{}, {'vectorized': True}, {'apm_metrics': True, 'correlated_logs': True}])
+def test_documents_stay_inside_the_range(options):
+    runner, _, timestamps = backfill(**options)
+    assert timestamps
+    assert min(timestamps) >= parse_time_us(START)
+    assert max(timestamps) <= parse_time_us(END)
+    assert runner.get_stats()['backfill_complete']
+
+
+def test_last_chunk_is_sized_to_the_remaining_range():
+    runner, _, _ = backfill()
+    # 300 simulated seconds at 17 events/second, not rounded up to whole 500-event chunks; the clock
+    # drops sub-microsecond steps, so one more event can still fit just before the end
+    assert 5100 <= runner.events_generated <= 5101
+
+
+def test_no_metrics_bucket_past_the_end():
+    _, sink, _ = backfill(apm_metrics=True)
+    buckets = {document['@timestamp'] for index, document in sink.documents if index.startswith('metrics-apm')}
+    assert max(buckets) == '2024-01-01T00:04:00.000000Z'
+
+
+def events_per_minute(timestamps):
+    counts = {}
+    for timestamp in timestamps:
+        minute = (timestamp - parse_time_us(START)) // 60000000
+        counts[minute] = counts.get(minute, 0) + 1
+    return counts
+
+
+def test_zero_rate_phase_is_skipped_not_stretched():
+    profile = create_profile({'type': 'step', 'steps': [[0, 0], [60, 10]]}, 10)
+    runner, _, timestamps = backfill(end='2024-01-01T01:00:00Z', rate=10, profile=profile)
+    assert min(timestamps) >= parse_time_us('2024-01-01T00:01:00Z')
+    assert max(timestamps) <= parse_time_us('2024-01-01T01:00:00Z')
+    # 59 minutes at 10 events/second
+    assert runner.events_generated == pytest.approx(59 * 60 * 10, abs=2)
+
+
+def test_profile_rate_changes_land_on_time():
+    profile = create_profile({'type': 'step', 'steps': [[120, 40]]}, 10)
+    runner, _, _ = backfill(rate=10, profile=profile)
+    # 2 minutes at 10/s, then 3 minutes at 40/s
+    assert runner.events_generated == pytest.approx(120 * 10 + 180 * 40, abs=2)
+
+
+def test_low_rates_carry_fractional_events():
+    runner, _, _ = backfill(end='2024-01-01T01:00:00Z', rate=0.05,
+                            profile=create_profile({'type': 'constant'}, 0.05))
+    # One event every 20 simulated seconds, even though each 10-second step is owed half an event
+    assert runner.events_generated == pytest.approx(180, abs=1)
+
+
+def test_ramp_profile_shapes_events_per_minute():
+    profile = create_profile({'type': 'ramp', 'from_rate': 0, 'to_rate': 50, 'seconds': 300}, 50)
+    runner, sink, _ = backfill(rate=50, profile=profile)
+    parse = TimestampParser()
+    roots = [parse(document['@timestamp']) for index, document in sink.documents
+             if index == 'synthetics-ecommerce']
+    per_minute = events_per_minute(roots)
+    assert [per_minute[minute] for minute in range(5)] == sorted(per_minute[minute] for minute in range(5))
+    assert runner.events_generated == pytest.approx(300 * 25, rel=0.01)
+
+
+def test_correlated_logs_keep_simulated_time_on_pace():
+    runner, _, _ = backfill(correlated_logs=True)
+    # Standalone logs are skipped in this mode but still take their share of simulated time
+    assert 5100 <= runner.events_generated <= 5101
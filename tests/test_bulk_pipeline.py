@@ -0,0 +1,73 @@
+"""Shared bulk pipeline: a job waiting out a retry backoff does not hold up the senders"""
+
+import threading
+import time
+
+from backpressure import Backoff
+from bulk_pipeline import BulkPipeline, PipelinedBulkSink
+
+REJECTED = {'create': {'status': 429, 'error': {'type': 'es_rejected_execution_exception'}}}
+CREATED = {'create': {'status': 201}}
+
+
+class FakeClient:
+    """Rejects every document of the overloaded index a number of times, accepts everything else"""
+
+    def __init__(self, overloaded, rejections):
+        self.overloaded = overloaded
+        self.rejections = rejections
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def bulk(self, index, operations):
+        docs = operations.count(b'\n') // 2
+        with self._lock:
+            self.requests.append((index, docs, time.monotonic()))
+            reject = index == self.overloaded and self.rejections > 0
+            if reject:
+                self.rejections -= 1
+        item = REJECTED if reject else CREATED
+        return {'errors': reject, 'items': [item] * docs}
+
+
+def fill(sink, index, docs):
+    for number in range(docs):
+        sink.add(index, {'n': number})
+    sink.flush()
+
+
+def test_backoff_does_not_block_other_jobs():
+    client = FakeClient('logs-overloaded', rejections=2)
+    pipeline = BulkPipeline(senders=1, adaptive=False)
+    overloaded = PipelinedBulkSink(client, pipeline, adaptive=False, backoff=Backoff(1.0, 1.0))
+    healthy = PipelinedBulkSink(client, pipeline, adaptive=False)
+
+    start = time.monotonic()
+    fill(overloaded, 'logs-overloaded', 10)
+    time.sleep(0.1)
+    fill(healthy, 'logs-healthy', 10)
+    healthy.close()
+    # One sender, and the other job's backoff is at least 0.5s: it must not have waited for it
+    assert time.monotonic() - start < 0.5
+    assert healthy.get_stats()['docs_indexed'] == 10
+    assert overloaded.pending() == 10
+
+    overloaded.close()
+    pipeline.close()
+    stats = overloaded.get_stats()
+    assert stats['docs_indexed'] == 10
+    assert stats['docs_rejected'] == 20
+    assert overloaded.pending() == 0
+    attempts = [at for index, _, at in client.requests if index == 'logs-overloaded']
+    assert len(attempts) == 3
+    assert all(later - earlier >= 0.5 for earlier, later in zip(attempts, attempts[1:]))
+
+
+def test_close_waits_for_scheduled_retries():
+    client = FakeClient('metrics-x', rejections=1)
+    pipeline = BulkPipeline(senders=2)
+    sink = PipelinedBulkSink(client, pipeline, backoff=Backoff(0.05, 0.05))
+    fill(sink, 'metrics-x', 5)
+    pipeline.close()
+    assert sink.get_stats()['docs_indexed'] == 5
+    assert pipeline.get_stats()['bulk_retries_waiting'] == 0
@@ -0,0 +1,95 @@
+"""Bulk sink: documents go out as create actions, and only overload rejections are resent"""
+
+import json
+
+from backpressure import Backoff
+from sinks import ElasticsearchBulkSink
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+
+
+class FakeClient:
+    """Answers each _bulk request from a script of per-item statuses (or an exception), then accepts"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = []
+
+    def bulk(self, index, operations):
+        lines = operations.splitlines()
+        self.requests.append((index, lines))
+        answer = self.script.pop(0) if self.script else None
+        if isinstance(answer, Exception):
+            raise answer
+        statuses = answer or [201] * (len(lines) // 2)
+        items = []
+        for status in statuses:
+            item = {'status': status}
+            if status == 429:
+                item['error'] = {'type': 'es_rejected_execution_exception', 'reason': 'queue full'}
+            elif status >= 300:
+                item['error'] = {'type': 'mapper_parsing_exception', 'reason': 'bad field'}
+            items.append({'create': item})
+        return {'errors': any(status >= 300 for status in statuses), 'items': items}
+
+
+def sink(client, **options):
+    options.setdefault('backoff', Backoff(0.001, 0.001))
+    return ElasticsearchBulkSink(client, adaptive=False, **options)
+
+
+def sent_documents(lines):
+    return [json.loads(line)['n'] for line in lines[1::2]]
+
+
+def test_documents_are_sent_as_create_actions():
+    client = FakeClient()
+    bulk = sink(client, max_docs=3)
+    for n in range(5):
+        bulk.add('logs-test-default', {'n': n})
+    bulk.flush()
+    assert [(index, sent_documents(lines)) for index, lines in client.requests] == [
+        ('logs-test-default', [0, 1, 2]), ('logs-test-default', [3, 4])]
+    for _, lines in client.requests:
+        assert all(json.loads(action) == {'create': {}} for action in lines[0::2])
+    stats = bulk.get_stats()
+    assert (stats['docs_indexed'], stats['bulk_requests'], stats['docs_failed']) == (5, 2, 0)
+
+
+def test_rejected_items_are_resent_alone():
+    client = FakeClient([201, 429, 400, 429])
+    bulk = sink(client)
+    for n in range(4):
+        bulk.add('traces-apm-default', {'n': n})
+    bulk.flush()
+    assert [sent_documents(lines) for _, lines in client.requests] == [[0, 1, 2, 3], [1, 3]]
+    stats = bulk.get_stats()
+    assert (stats['docs_indexed'], stats['docs_failed'], stats['docs_rejected']) == (3, 1, 2)
+    assert stats['failures_by_status'] == {'400': 1}
+    assert stats['backoff_seconds'] > 0
+    assert bulk.pending() == 0
+
+
+def test_overloaded_requests_are_retried_and_bad_ones_are_not():
+    client = FakeClient(ApiError(429), ApiError(503), None, ApiError(400))
+    bulk = sink(client, max_docs=2)
+    for n in range(4):
+        bulk.add('metrics-test-default', {'n': n})
+    stats = bulk.get_stats()
+    assert len(client.requests) == 4
+    assert (stats['docs_indexed'], stats['docs_failed'], stats['bulk_retries'], stats['bulk_errors']) == (2, 2, 2, 1)
+
+
+def test_retries_stop_after_max_retries():
+    client = FakeClient(*[[429]] * 5)
+    bulk = sink(client, max_retries=2)
+    bulk.add('logs-test-default', {'n': 0})
+    bulk.flush()
+    assert len(client.requests) == 3
+    stats = bulk.get_stats()
+    assert (stats['docs_indexed'], stats['docs_failed'], stats['docs_rejected']) == (0, 1, 2)
+    assert stats['failures_by_status'] == {'429': 1}
@@ -0,0 +1,78 @@
+"""Recorded datasets: default compression, segment reading and retimestamping"""
+
+import gzip
+import json
+
+from dataset import DEFAULT_COMPRESSION, DOCUMENT_BOUNDARY, EXTENSIONS, Retimestamper, load_segments, read_chunks
+from fast_ids import parse_time_us
+from generate_offline import main
+from sinks import create_sink
+
+START = '2024-01-01T00:00:00Z'
+
+
+def record(path, *extra):
+    assert main(['--sink', 'dataset', '--output', str(path), '--seed', '3', '--start-time', START,
+                 '--events', '2000', '--rate', '50', *extra]) == 0
+    return load_segments(str(path))
+
+
+def test_dataset_sink_compresses_by_default(tmp_path):
+    sink = create_sink({'type': 'dataset', 'path': str(tmp_path / 'sink')})
+    assert sink.compression == DEFAULT_COMPRESSION
+    sink.close()
+
+    segments = record(tmp_path / 'cli')
+    assert segments
+    for segment in segments:
+        assert segment['compression'] == DEFAULT_COMPRESSION
+        assert segment['file'].endswith(EXTENSIONS[DEFAULT_COMPRESSION])
+
+
+def test_explicit_compression_is_kept(tmp_path):
+    for segment in record(tmp_path, '--compression', 'gzip'):
+        assert segment['compression'] == 'gzip'
+        with gzip.open(segment['path'], 'rb') as file:
+            assert file.read(11) == b'{"create":{'
+
+
+def test_chunks_end_between_documents(tmp_path):
+    segment = max(record(tmp_path, '--compression', 'gzip'), key=lambda record: record['docs'])
+    chunks = list(read_chunks(segment['path'], segment['compression'], max_bytes=4096))
+    assert len(chunks) > 1
+    with gzip.open(segment['path'], 'rb') as file:
+        assert b''.join(chunks) == file.read()
+    documents = 0
+    for chunk in chunks:
+        assert chunk.startswith(DOCUMENT_BOUNDARY[1:])
+        assert chunk.endswith(b'\n')
+        lines = chunk.splitlines()
+        assert len(lines) % 2 == 0
+        documents += len(lines) // 2
+    assert documents == segment['docs']
+
+
+def test_retimestamper_shifts_both_timestamps(tmp_path):
+    offset_us = 86400 * 1000000 + 1234567
+    shift = Retimestamper(offset_us)
+    shifted_traces = 0
+    for segment in record(tmp_path, '--compression', 'gzip'):
+        with gzip.open(segment['path'], 'rb') as file:
+            lines = file.read().splitlines(keepends=True)[1::2]
+        for line in lines:
+            before = json.loads(line)
+            after = json.loads(shift(line))
+            assert parse_time_us(after['@timestamp']) == parse_time_us(before['@timestamp']) + offset_us
+            if 'timestamp' in before:
+                assert after['timestamp']['us'] == before['timestamp']['us'] + offset_us
+                shifted_traces += 1
+            del before['@timestamp'], after['@timestamp']
+            before.pop('timestamp', None)
+            after.pop('timestamp', None)
+            assert after == before
+    assert shifted_traces
+
+
+def test_retimestamper_leaves_untimed_lines_alone():
+    line = b'{"message":"no timestamp"}\n'
+    assert Retimestamper(1000000)(line) is line
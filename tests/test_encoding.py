@@ -0,0 +1,58 @@
+"""Pre-encoded trace templates: the bytes match serializing the generator's dict documents"""
+
+import json
+
+import pytest
+
+import encoding
+from generator_enhanced import EnhancedObservabilityGenerator
+from sinks import Sink, encode_document
+
+
+class LineSink(Sink):
+    """Keeps every document as the line a file or bulk sink would write, from either path"""
+
+    def __init__(self, accepts_encoded):
+        super().__init__()
+        self.accepts_encoded = accepts_encoded
+        self.lines = []
+
+    def add(self, index, document):
+        self.lines.append((index, encode_document(document)))
+
+    def add_encoded(self, index, line):
+        self.lines.append((index, line))
+
+
+def generate(accepts_encoded, industry, **options):
+    sink = LineSink(accepts_encoded)
+    generator = EnhancedObservabilityGenerator(None, industry, sink=sink, seed=5, start_time=1714521600,
+                                               events_per_second=200, **options)
+    for _ in range(4):
+        generator.generate_batch(250)
+    generator.close()
+    return sink.lines
+
+
+@pytest.mark.parametrize('industry', ['ecommerce', 'banking', 'healthcare'])
+@pytest.mark.parametrize('options', [{}, {'vectorized': True}, {'entities': True},
+                                     {'scenario': {'error_rate': 0.3, 'latency_multiplier': 4.0}}])
+def test_encoded_lines_equal_the_dict_path(industry, options):
+    encoded = generate(True, industry, **options)
+    assert any(index == 'traces-apm-default' for index, _ in encoded)
+    assert encoded == generate(False, industry, **options)
+
+
+def test_stdlib_encoder_matches_orjson():
+    pytest.importorskip('orjson')
+    stdlib = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+    for _, line in generate(False, 'ecommerce', entities=True):
+        document = json.loads(line)
+        assert stdlib.encode(document).encode('utf-8') + b'\n' == encoding.dumps(document) + b'\n' == line
+
+
+def test_templates_escape_braces_and_quote_strings():
+    template = encoding.compile_template({'a': {'b': 'x'}, 'n': 0, 'text': 'a {brace}'},
+                                         [(('a', 'b'), True), (('n',), False)])
+    line = template.format('id-1', 42)
+    assert json.loads(line) == {'a': {'b': 'id-1'}, 'n': 42, 'text': 'a {brace}'}
@@ -0,0 +1,71 @@
+"""Entity pools: Zipf alias sampling and host addressing"""
+
+import random
+
+import numpy
+import pytest
+
+import entity_pools
+from entity_pools import EntityPool, EntityPools, MAX_SIZES, ZipfSampler, _alias_tables, resolve_sizes
+
+
+def zipf(size, exponent):
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(size)]
+    return [weight / sum(weights) for weight in weights]
+
+
+def implied(threshold, alias):
+    """Probability of each rank that the alias tables encode"""
+    size = len(threshold)
+    probabilities = [value / size for value in threshold]
+    for rank in range(size):
+        probabilities[alias[rank]] += (1.0 - threshold[rank]) / size
+    return probabilities
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+@pytest.mark.parametrize('size, exponent', [(1, 1.0), (7, 1.0), (1000, 1.0), (1000, 1.3), (500, 0.6)])
+def test_alias_tables_encode_the_zipf_weights(monkeypatch, with_numpy, size, exponent):
+    if not with_numpy:
+        monkeypatch.setattr(entity_pools, 'numpy', None)
+    threshold, alias = _alias_tables(size, exponent)
+    assert implied(threshold, alias) == pytest.approx(zipf(size, exponent), rel=1e-9, abs=1e-12)
+    assert all(0 <= rank < size for rank in alias)
+
+
+def test_draws_follow_the_distribution():
+    size, draws = 20, 200000
+    sampler = ZipfSampler(size)
+    rng = random.Random(5)
+    counts = [0] * size
+    for _ in range(draws):
+        counts[sampler.sample(rng)] += 1
+    batch = numpy.bincount(sampler.sample_array(numpy.random.default_rng(5), draws), minlength=size)
+    for rank, probability in enumerate(zipf(size, 1.0)):
+        # Five standard deviations of a binomial count
+        tolerance = 5 * (draws * probability * (1 - probability)) ** 0.5
+        assert abs(counts[rank] - draws * probability) < tolerance
+        assert abs(batch[rank] - draws * probability) < tolerance
+
+
+def test_pool_ids_are_a_permutation_of_ranks():
+    pool = EntityPool(1000)
+    assert sorted(rank * pool.stride % pool.size for rank in range(pool.size)) == list(range(pool.size))
+    rng = random.Random(1)
+    assert all(0 <= pool.sample(rng) < pool.size for _ in range(1000))
+
+
+def test_host_addresses_are_unique_up_to_the_limit():
+    pools = EntityPools('ecommerce', hosts=10, pods=10, users=10)
+    limit = MAX_SIZES['hosts']
+    for host in list(range(0, limit, 65521)) + [255, 256, 65535, 65536, limit - 1]:
+        octets = [int(octet) for octet in pools.host_ip(host).split('.')]
+        assert octets[0] == 10
+        assert octets[1] << 16 | octets[2] << 8 | octets[3] == host + 1
+    assert pools.host_ip(limit - 1) == '10.255.255.255'
+
+
+def test_host_pool_is_capped_at_the_address_space():
+    assert resolve_sizes('ecommerce', {'hosts': MAX_SIZES['hosts']})['hosts'] == MAX_SIZES['hosts']
+    with pytest.raises(ValueError, match='entities.hosts'):
+        resolve_sizes('ecommerce', {'hosts': 1 << 24})
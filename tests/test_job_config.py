@@ -0,0 +1,73 @@
+"""Job requests: parse_job_config rejects bad settings with ValueError before anything starts"""
+
+import pytest
+
+import job_manager
+from job_manager import parse_job_config
+
+
+def parse(**settings):
+    return parse_job_config(dict({'industry': 'ecommerce'}, **settings))
+
+
+def test_defaults():
+    config = parse()
+    assert config['workers'] == 1 and config['concurrency'] == 4
+    assert config['seed'] is None and config['max_catchup_seconds'] == 2.0
+    assert config['backfill'] is None
+
+
+@pytest.mark.parametrize('settings', [
+    {'workers': 0}, {'workers': -2}, {'workers': 2.5}, {'workers': '4'}, {'workers': True},
+    {'concurrency': 0}, {'concurrency': 1.5}, {'concurrency': '8'}, {'concurrency': False},
+    {'seed': 1.5}, {'seed': '42'}, {'seed': True},
+    {'max_catchup_seconds': -1}, {'max_catchup_seconds': '2'}, {'max_catchup_seconds': float('nan')},
+    {'max_catchup_seconds': float('inf')},
+    {'trace_depth': -1}, {'trace_depth': '3'}, {'trace_depth': 2.5}, {'trace_depth': True},
+    {'fan_out': -1}, {'fan_out': '3'}, {'fan_out': 1.5},
+    {'vectorized': 'yes'}, {'vectorized': 1}
+])
+def test_invalid_settings(settings):
+    with pytest.raises(ValueError, match=next(iter(settings))):
+        parse(**settings)
+
+
+def test_valid_numbers():
+    config = parse(workers=4, concurrency=8, seed=0, max_catchup_seconds=0)
+    assert (config['workers'], config['concurrency'], config['seed'], config['max_catchup_seconds']) == (4, 8, 0, 0)
+
+
+def test_trace_shape_settings():
+    options = parse(trace_depth=0, fan_out=None, vectorized=True)['generator_options']
+    assert (options['max_depth'], options['max_fan_out'], options['vectorized']) == (0, None, True)
+
+
+def test_vectorized_requires_numpy(monkeypatch):
+    monkeypatch.setattr(job_manager, 'numpy', None)
+    with pytest.raises(ValueError, match='numpy'):
+        parse(vectorized=True)
+    assert parse(vectorized=False)['generator_options']['vectorized'] is False
+
+
+@pytest.mark.parametrize('backfill', [
+    '2024-01-01T00:00:00Z',
+    {'end_time': '2024-01-02T00:00:00Z'},
+    {'start_time': 'yesterday'},
+    {'start_time': True},
+    {'start_time': '2024-01-02T00:00:00Z', 'end_time': '2024-01-01T00:00:00Z'},
+    {'start_time': '2024-01-01T00:00:00Z', 'end_time': '2024-01-01T00:00:00Z'},
+    {'start_time': '2999-01-01T00:00:00Z'},
+    {'start_time': '2024-01-01T00:00:00Z', 'until': '2024-01-02T00:00:00Z'}
+])
+def test_invalid_backfill(backfill):
+    with pytest.raises(ValueError, match='backfill|Backfill'):
+        parse(backfill=backfill)
+
+
+@pytest.mark.parametrize('backfill', [
+    {'start_time': '2024-01-01T00:00:00Z', 'end_time': '2024-01-02T00:00:00Z'},
+    {'start_time': 1704067200, 'end_time': 1704153600.5},
+    {'start_time': '2024-01-01T00:00:00Z'}
+])
+def test_valid_backfill(backfill):
+    assert parse(backfill=backfill)['backfill'] == backfill
@@ -0,0 +1,37 @@
+"""Sampling profiler endpoint: bad settings get a 400 and never start the sampler"""
+
+import pytest
+
+import app_advanced
+from instrumentation import SamplingProfiler
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_advanced, 'profiler', SamplingProfiler())
+    yield app_advanced.app.test_client()
+    app_advanced.profiler.stop()
+
+
+@pytest.mark.parametrize('settings', [{'interval_ms': '5'}, {'interval_ms': 0}, {'interval_ms': -1},
+                                      {'interval_ms': True}, {'interval_ms': None}, {'top': 0}, {'top': 'all'}])
+def test_invalid_settings_are_rejected(client, settings):
+    response = client.post('/api/profile', json=dict({'action': 'start'}, **settings))
+    assert response.status_code == 400
+    assert not app_advanced.profiler.running
+
+
+def test_start_and_stop(client):
+    response = client.post('/api/profile', json={'action': 'start', 'interval_ms': 2, 'top': 5})
+    assert response.status_code == 200
+    assert app_advanced.profiler.running
+    assert app_advanced.profiler.interval == 0.002
+    assert client.post('/api/profile', json={'action': 'stop'}).status_code == 200
+    assert not app_advanced.profiler.running
+    assert client.get('/api/profile?top=-1').status_code == 400
+
+
+@pytest.mark.parametrize('interval', [0, -0.5, '0.005', float('nan')])
+def test_profiler_rejects_bad_intervals(interval):
+    with pytest.raises(ValueError):
+        SamplingProfiler().start(interval=interval)
@@ -0,0 +1,101 @@
+"""Rate scheduler: the token bucket holds the target rate, catches up after short stalls and drops the rest"""
+
+import pytest
+
+from rate_profiles import create_profile
+from rate_scheduler import RateScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def run(scheduler, clock, seconds, tick=1 / 64):
+    """Take every tick for seconds of fake time; ticks of 1/64s keep the float arithmetic exact"""
+    emitted = 0
+    for _ in range(round(seconds / tick)):
+        clock.advance(tick)
+        emitted += scheduler.take()
+    return emitted
+
+
+def test_steady_ticks_hold_the_rate():
+    clock = FakeClock()
+    scheduler = RateScheduler(250, clock=clock)
+    assert scheduler.take() == 0
+    assert run(scheduler, clock, 10) == pytest.approx(2500, abs=1)
+    assert scheduler.events_dropped == 0
+    assert scheduler.achieved_rate() == pytest.approx(250, rel=0.01)
+
+
+def test_low_rates_still_emit():
+    clock = FakeClock()
+    scheduler = RateScheduler(1, clock=clock)
+    scheduler.take()
+    assert run(scheduler, clock, 10) == 10
+
+
+def test_short_stall_is_made_up():
+    clock = FakeClock()
+    scheduler = RateScheduler(100, clock=clock, max_catchup_seconds=2.0)
+    scheduler.take()
+    clock.advance(1.5)
+    assert scheduler.take() == 150
+    assert scheduler.events_dropped == 0
+
+
+def test_long_stall_is_capped_at_max_catchup_and_counted_as_dropped():
+    clock = FakeClock()
+    scheduler = RateScheduler(100, clock=clock, max_catchup_seconds=2.0)
+    scheduler.take()
+    clock.advance(10)
+    assert scheduler.take() == 200
+    assert scheduler.events_dropped == 800
+    stats = scheduler.get_stats()
+    assert (stats['events_scheduled'], stats['events_dropped'], stats['backlog_events']) == (200, 800, 0)
+    # Back on schedule afterwards, without a second burst
+    assert run(scheduler, clock, 1) == 100
+
+
+def test_zero_catchup_still_releases_one_event():
+    clock = FakeClock()
+    scheduler = RateScheduler(10, clock=clock, max_catchup_seconds=0)
+    scheduler.take()
+    clock.advance(5)
+    assert scheduler.take() == 1
+    assert scheduler.events_dropped == 49
+
+
+def test_set_rate_keeps_accrued_tokens():
+    clock = FakeClock()
+    scheduler = RateScheduler(100, clock=clock)
+    scheduler.take()
+    clock.advance(0.5)
+    scheduler.set_rate(1000)
+    clock.advance(0.5)
+    assert scheduler.take() == 550
+
+
+def test_delay_waits_for_the_next_event():
+    clock = FakeClock()
+    scheduler = RateScheduler(10, clock=clock, tick_seconds=0.02)
+    scheduler.take()
+    assert scheduler.delay() == pytest.approx(0.1)
+    scheduler.set_rate(0.1)
+    assert scheduler.delay() == RateScheduler.MAX_DELAY_SECONDS
+
+
+def test_profile_sets_the_rate():
+    clock = FakeClock()
+    scheduler = RateScheduler(10, clock=clock, profile=create_profile({'type': 'step', 'steps': [[5, 100]]}, 10))
+    scheduler.take()
+    assert run(scheduler, clock, 5) == pytest.approx(50, abs=1)
+    assert run(scheduler, clock, 5) == pytest.approx(500, abs=2)
+    assert scheduler.get_stats()['rate_profile'] == 'step'
@@ -0,0 +1,26 @@
+"""Self-metrics settings: the report interval must be a positive number of seconds"""
+
+import pytest
+
+from job_manager import parse_job_config
+from self_metrics import reporter_interval
+
+
+@pytest.mark.parametrize('value, interval', [
+    (None, None), (False, None), (0, None),
+    (True, 10), (5, 5), (0.5, 0.5), ({'interval_seconds': 30}, 30)
+])
+def test_valid_settings(value, interval):
+    assert reporter_interval(value) == interval
+
+
+@pytest.mark.parametrize('value', [-5, '10', float('nan'), float('inf'), {'interval_seconds': 0},
+                                   {'interval_seconds': '10'}, {'interval_seconds': True}, {'interval': 10}, [10]])
+def test_invalid_settings_raise_value_error(value):
+    with pytest.raises(ValueError):
+        reporter_interval(value)
+
+
+def test_job_config_rejects_a_bad_interval():
+    with pytest.raises(ValueError, match='self_metrics'):
+        parse_job_config({'industry': 'ecommerce', 'self_metrics': -5})
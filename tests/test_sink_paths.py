@@ -0,0 +1,53 @@
+"""Sink paths from API requests stay inside the server's output directory"""
+
+import os
+
+import pytest
+
+import app_advanced
+from job_manager import parse_job_config
+from sinks import confine_path
+
+ESCAPES = ['/etc/cron.d/x', '../x.ndjson', 'runs/../../x.ndjson', 'runs\\..\\..\\x.ndjson', '', None, 7]
+
+
+@pytest.mark.parametrize('path', ESCAPES)
+def test_paths_outside_the_output_directory_are_rejected(tmp_path, path):
+    with pytest.raises(ValueError):
+        confine_path(path, str(tmp_path))
+
+
+def test_symlinks_out_of_the_output_directory_are_rejected(tmp_path):
+    root, outside = tmp_path / 'output', tmp_path / 'elsewhere'
+    root.mkdir()
+    outside.mkdir()
+    (root / 'link').symlink_to(outside)
+    with pytest.raises(ValueError, match='outside'):
+        confine_path('link/x.ndjson', str(root))
+
+
+def test_relative_paths_resolve_under_the_output_directory(tmp_path):
+    path = confine_path('runs/banking.ndjson.gz', str(tmp_path))
+    assert path == os.path.join(os.path.realpath(tmp_path), 'runs', 'banking.ndjson.gz')
+    config = parse_job_config({'industry': 'banking', 'sink': {'type': 'file', 'path': 'runs/banking.ndjson.gz'}},
+                              str(tmp_path))
+    assert config['sink']['path'] == path
+
+
+@pytest.mark.parametrize('sink_type', ['file', 'dataset'])
+@pytest.mark.parametrize('path', ['/etc/cron.d/x', '../../x'])
+def test_generate_returns_400_for_escaping_paths(monkeypatch, tmp_path, sink_type, path):
+    monkeypatch.setattr(app_advanced.job_manager, 'output_dir', str(tmp_path))
+    response = app_advanced.app.test_client().post('/api/generate', json={
+        'industry': 'ecommerce', 'sink': {'type': sink_type, 'path': path}
+    })
+    assert response.status_code == 400
+    assert 'output directory' in response.get_json()['error']
+
+
+def test_dataset_directories_resolve_under_the_output_directory(tmp_path):
+    config = parse_job_config({'industry': 'banking', 'sink': {'type': 'dataset', 'path': 'datasets/banking'}},
+                              str(tmp_path))
+    assert config['sink']['path'] == os.path.join(os.path.realpath(tmp_path), 'datasets', 'banking')
+    with pytest.raises(ValueError, match='output directory'):
+        parse_job_config({'industry': 'banking', 'sink': {'type': 'dataset', 'path': '/var/lib/x'}}, str(tmp_path))
@@ -0,0 +1,65 @@
+"""Trace trees: every parent id resolves inside its trace and children run within their parent"""
+
+import pytest
+
+from generator_enhanced import EnhancedObservabilityGenerator
+from sinks import MemorySink
+
+
+def traces(industry, **options):
+    sink = MemorySink(keep_documents=True)
+    generator = EnhancedObservabilityGenerator(None, industry, sink=sink, seed=11, start_time=1704067200,
+                                               events_per_second=50, **options)
+    generator.generate_batch(300)
+    generator.close()
+    grouped = {}
+    for index, document in sink.documents:
+        if index == 'traces-apm-default':
+            grouped.setdefault(document['trace']['id'], []).append(document)
+    assert grouped
+    return grouped
+
+
+def event_id(document):
+    return document['span']['id'] if document['processor']['event'] == 'span' else document['transaction']['id']
+
+
+def duration_us(document):
+    return (document['span'] if document['processor']['event'] == 'span' else document['transaction'])['duration']['us']
+
+
+@pytest.mark.parametrize('industry', ['ecommerce', 'banking', 'gaming'])
+@pytest.mark.parametrize('options', [{}, {'vectorized': True}, {'max_depth': 5, 'max_fan_out': None},
+                                     {'entities': True, 'correlated_logs': True}])
+def test_trace_trees_are_consistent(industry, options):
+    seen = set()
+    for trace_id, documents in traces(industry, **options).items():
+        events = {event_id(document): document for document in documents}
+        assert len(events) == len(documents), 'ids are unique within a trace'
+        assert not seen & events.keys(), 'ids are unique across traces'
+        seen |= events.keys()
+
+        roots = [document for document in documents if 'parent' not in document]
+        assert len(roots) == 1
+        assert roots[0]['processor']['event'] == 'transaction'
+
+        children = {}
+        for document in documents:
+            if document is roots[0]:
+                continue
+            parent = events.get(document['parent']['id'])
+            assert parent is not None, 'the parent is in the same trace'
+            children.setdefault(event_id(parent), []).append(document)
+            start, parent_start = document['timestamp']['us'], parent['timestamp']['us']
+            assert start >= parent_start
+            assert start + duration_us(document) <= parent_start + duration_us(parent)
+
+        for document in documents:
+            if document['processor']['event'] != 'transaction':
+                continue
+            # Transactions are only ever children of exit spans, and count the spans they start
+            if document is not roots[0]:
+                assert events[document['parent']['id']]['processor']['event'] == 'span'
+            spans = children.get(event_id(document), [])
+            assert all(child['processor']['event'] == 'span' for child in spans)
+            assert document['transaction']['span_count']['started'] == len(spans)
@@ -0,0 +1,46 @@
+"""Worker pools: the rate is shared by every worker, fractions included"""
+
+import pytest
+
+from job_manager import GenerationJob, parse_job_config
+from worker_pool import GenerationWorkerPool, live_workers, split_rate
+
+
+@pytest.mark.parametrize('rate, workers', [(3.5, 2), (17, 4), (1000, 8), (0.5, 1), (2.25, 3)])
+def test_shares_add_up_to_the_rate(rate, workers):
+    shares = split_rate(rate, workers)
+    assert len(shares) == workers
+    assert sum(shares) == pytest.approx(rate)
+    assert all(share == pytest.approx(rate / workers) for share in shares)
+
+
+@pytest.mark.parametrize('rate, workers, expected', [(3.5, 2, 2), (3, 8, 3), (3.5, 8, 4), (0.5, 4, 1), (1000, 8, 8)])
+def test_live_runs_get_no_idle_workers(rate, workers, expected):
+    assert live_workers(rate, workers) == expected
+    pool = GenerationWorkerPool('ecommerce', rate, workers=workers, sink_config={'type': 'memory'})
+    assert pool.workers == expected
+    assert len(pool.seeds) == expected
+
+
+def test_backfill_keeps_every_worker():
+    pool = GenerationWorkerPool('ecommerce', 2, workers=4, sink_config={'type': 'memory'},
+                                backfill={'start_time': '2024-01-01T00:00:00Z', 'end_time': '2024-01-02T00:00:00Z'})
+    assert pool.workers == 4
+
+
+@pytest.mark.parametrize('profile', [
+    {'type': 'ramp', 'from_rate': 1, 'to_rate': 5000, 'seconds': 600},
+    {'type': 'spike', 'multiplier': 5000},
+    {'type': 'step', 'steps': [[60, 5000]]},
+    {'type': 'constant', 'rate': 5000}
+])
+def test_live_pools_are_sized_for_the_profile_peak(profile):
+    pool = GenerationWorkerPool('ecommerce', 1, workers=8, sink_config={'type': 'memory'}, rate_profile=profile)
+    assert pool.workers == 8
+
+
+def test_jobs_report_the_pool_size():
+    job = GenerationJob('job-1', parse_job_config({'industry': 'ecommerce', 'rate': 2, 'workers': 8,
+                                                   'sink': {'type': 'memory'}}))
+    job.worker_pool = GenerationWorkerPool('ecommerce', 2, workers=8, sink_config={'type': 'memory'})
+    assert job.describe()['workers'] == 2
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Precompiled trace plans for the Observability Data Generator
+Resolves everything static about an industry's services once, so traces only draw random values
+"""
+
+# Entry-point transactions, matched by substring against the root service name
+TRANSACTION_TYPES = {
+    'web-frontend': [
+        ('GET /products', 'GET', '/products'),
+        ('GET /product/:id', 'GET', '/product/12345'),
+        ('POST /cart/add', 'POST', '/cart/add'),
+        ('GET /checkout', 'GET', '/checkout')
+    ],
+    'mobile-app': [
+        ('POST /api/login', 'POST', '/api/login'),
+        ('GET /api/products', 'GET', '/api/products'),
+        ('POST /api/orders', 'POST', '/api/orders')
+    ],
+    'mobile-banking': [
+        ('POST /api/transfer', 'POST', '/api/transfer'),
+        ('GET /api/accounts', 'GET', '/api/accounts'),
+        ('GET /api/transactions', 'GET', '/api/transactions')
+    ],
+    'game-client': [
+        ('POST /match/join', 'POST', '/match/join'),
+        ('GET /player/stats', 'GET', '/player/stats'),
+        ('POST /game/action', 'POST', '/game/action')
+    ],
+    'patient-portal': [
+        ('GET /appointments', 'GET', '/appointments'),
+        ('POST /appointments/book', 'POST', '/appointments/book'),
+        ('GET /records', 'GET', '/records')
+    ]
+}
+
+ENTRY_SERVICE_MARKERS = ('frontend', 'app', 'portal', 'gateway', 'client')
+
+# Typical span latency range in ms per service type
+DURATION_RANGES = {
+    'cache': (1, 10),
+    'db': (5, 50),
+    'messaging': (10, 100)
+}
+DEFAULT_DURATION_RANGE = (20, 200)
+
+
+def get_service_type(service_name):
+    """Determine service type and subtype for proper span configuration"""
+    service_lower = service_name.lower()
+
+    if any(x in service_lower for x in ['redis', 'cache', 'memcached']):
+        return 'cache', 'redis'
+    elif any(x in service_lower for x in ['postgres', 'mysql', 'db']):
+        return 'db', 'postgresql'
+    elif any(x in service_lower for x in ['mongo']):
+        return 'db', 'mongodb'
+    elif any(x in service_lower for x in ['kafka', 'queue', 'rabbitmq']):
+        return 'messaging', 'kafka'
+    elif any(x in service_lower for x in ['s3', 'storage', 'blob']):
+        return 'storage', 's3'
+    else:
+        return 'external', 'http'
+
+
+def get_span_name(service_name, service_type):
+    """Generate realistic span names"""
+    if service_type == 'db':
+        return f'SELECT FROM {service_name}'
+    elif service_type == 'cache':
+        return f'GET {service_name}'
+    elif service_type == 'messaging':
+        return f'SEND {service_name}'
+    else:
+        return f'POST {service_name}/process'
+
+
+class ServicePlan:
+    """Static attributes of one service, shared by every span and transaction that touches it"""
+
+    __slots__ = ('name', 'type', 'subtype', 'span_name', 'duration_range', 'node_names', 'host_names',
+                 'domain', 'transactions', 'downstream_transaction', 'instrumented', 'target', 'destination',
+                 'queue')
+
+    def __init__(self, name, industry):
+        self.name = name
+        self.type, self.subtype = get_service_type(name)
+        self.span_name = get_span_name(name, self.type)
+        self.duration_range = DURATION_RANGES.get(self.type, DEFAULT_DURATION_RANGE)
+        self.node_names = tuple(f'{name}-{i:02d}' for i in range(1, 4))
+        self.host_names = tuple(f'{name}-{i:02d}' for i in range(1, 6))
+        self.domain = f'{name}.{industry}.example.com'
+
+        # (transaction name, method, path, full url) for services that act as entry points
+        transactions = [('GET /', 'GET', '/')]
+        for key, txns in TRANSACTION_TYPES.items():
+            if key in name.lower():
+                transactions = txns
+                break
+        self.transactions = tuple(
+            (txn_name, method, path, f'https://{self.domain}{path}') for txn_name, method, path in transactions
+        )
+        # Transaction recorded when another service calls this one (matches the caller's span name)
+        self.downstream_transaction = ('POST /process', 'POST', '/process', f'https://{self.domain}/process')
+
+        # HTTP services run an agent and record their own transaction; backends only appear as exit spans
+        self.instrumented = self.type == 'external'
+
+        self.target = {'type': self.subtype, 'name': name}
+        self.destination = {
+            'service': {
+                'name': name,
+                'resource': f'{self.subtype}/{name}',
+                'type': self.subtype
+            }
+        }
+        self.queue = {'queue': {'name': f'{name}-queue'}}
+
+
+class TracePlan:
+    """Per-industry plan: entry services, resolved dependency edges and cached call trees"""
+
+    def __init__(self, industry, config):
+        self.industry = industry
+
+        names = list(config['services'])
+        for service, children in config['dependencies'].items():
+            names.extend(n for n in [service] + list(children) if n not in names)
+        self.services = {name: ServicePlan(name, industry) for name in names}
+
+        entry = [self.services[s] for s in config['services']
+                 if any(x in s.lower() for x in ENTRY_SERVICE_MARKERS)]
+        self.entry_services = tuple(entry) if entry else (self.services[config['services'][0]],)
+
+        self.children = {
+            service: tuple(self.services[child] for child in children)
+            for service, children in config['dependencies'].items()
+        }
+        self._call_trees = {}
+
+    def call_tree(self, root_name, max_depth):
+        """Get the call tree below an entry service, building it on first use"""
+        key = (root_name, max_depth)
+        tree = self._call_trees.get(key)
+        if tree is None:
+            tree = self._call_trees[key] = CallTree(self, self.services[root_name], max_depth)
+        return tree
+
+
+class CallTree:
+    """Dependency graph below one entry service, flattened into preorder arrays
+
+    Node 0 is the entry transaction; every other node is a call edge from
+    callers[i] to services[i]. A service is never called again further down
+    its own call path, which breaks cycles in the dependency config.
+    """
+
+    __slots__ = ('services', 'callers', 'parents', 'depths', 'children')
+
+    def __init__(self, plan, root, max_depth):
+        self.services = []
+        self.callers = []
+        self.parents = []
+        self.depths = []
+
+        # Iterative depth-first walk: (service, caller, parent node, depth, services on the path)
+        stack = [(root, None, -1, 0, frozenset((root.name,)))]
+        while stack:
+            service, caller, parent, depth, path = stack.pop()
+            node = len(self.services)
+            self.services.append(service)
+            self.callers.append(caller)
+            self.parents.append(parent)
+            self.depths.append(depth)
+
+            if depth >= max_depth or (caller is not None and not service.instrumented):
+                continue
+            for child in reversed(plan.children.get(service.name, ())):
+                if child.name not in path:
+                    stack.append((child, service, node, depth + 1, path | {child.name}))
+
+        children = [[] for _ in self.services]
+        for node in range(1, len(self.services)):
+            children[self.parents[node]].append(node)
+        self.children = tuple(tuple(nodes) for nodes in children)
+
+        self.services = tuple(self.services)
+        self.callers = tuple(self.callers)
+        self.parents = tuple(self.parents)
+        self.depths = tuple(self.depths)
+
+
+_PLANS = {}
+
+
+def get_trace_plan(industry, config):
+    """Compile an industry's plan on first use and reuse it afterwards"""
+    plan = _PLANS.get(industry)
+    if plan is None:
+        plan = _PLANS[industry] = TracePlan(industry, config)
+    return plan
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Vectorized trace generation for the Observability Data Generator
+Draws the random attributes of a whole batch of traces as NumPy arrays, then assembles documents
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TreeLayout:
+    """Per-node constants of one call tree, laid out as arrays that broadcast over a batch"""
+
+    def __init__(self, tree, latency_multipliers, max_fan_out, db_statements, cache_commands):
+        services = tree.services
+        self.tree = tree
+        self.size = len(services)
+
+        # Same latency rules as the scalar path: the root uses its own multiplier, calls the worse of both ends
+        multipliers = [latency_multipliers[services[0].name]]
+        multipliers.extend(max(latency_multipliers[services[node].name], latency_multipliers[tree.callers[node].name])
+                           for node in range(1, self.size))
+        self.multipliers = numpy.array(multipliers)
+
+        # Calls into instrumented services wrap a downstream transaction; the rest are plain exit spans
+        self.wraps_transaction = tuple(node != 0 and bool(tree.children[node] or services[node].instrumented)
+                                       for node in range(self.size))
+        self.leaves = numpy.array([node != 0 and not self.wraps_transaction[node] for node in range(self.size)])
+        self.duration_low = numpy.array([service.duration_range[0] for service in services])
+        self.duration_high = numpy.array([service.duration_range[1] for service in services]) + 1
+
+        # Statements attached to db and cache spans
+        self.statements = []
+        for service in services:
+            if service.type == 'db':
+                self.statements.append(db_statements.get(service.subtype, db_statements['postgresql']))
+            elif service.type == 'cache':
+                self.statements.append(cache_commands)
+            else:
+                self.statements.append(None)
+        self.statement_counts = numpy.array([len(choices) if choices else 1 for choices in self.statements])
+
+        # Services that call more dependencies than the fan-out allows pick a random subset per trace
+        self.fanned = tuple(
+            (node, list(children)) for node, children in enumerate(tree.children)
+            if max_fan_out is not None and len(children) > max_fan_out
+        )
+
+
+class VectorizedTraceBuilder:
+    """Generates batches of traces for an EnhancedObservabilityGenerator from array-wide random draws"""
+
+    def __init__(self, generator):
+        if numpy is None:
+            raise RuntimeError('Vectorized generation requires the numpy package')
+        self.generator = generator
+        # NumPy stream derived from the generator's, so seeded runs stay reproducible
+        self.rng = numpy.random.default_rng(generator.rng.getrandbits(64))
+        self._layouts = {}
+
+    def _layout(self, root):
+        """Get the array layout of an entry service's call tree, building it on first use"""
+        gen = self.generator
+        tree = gen.plan.call_tree(root.name, gen.max_depth)
+        layout = self._layouts.get(tree)
+        if layout is None:
+            layout = self._layouts[tree] = TreeLayout(tree, gen._latency_multipliers, gen.max_fan_out,
+                                                      gen.DB_STATEMENTS, gen.CACHE_COMMANDS)
+        return layout
+
+    def generate(self, count):
+        """Generate and index count traces"""
+        if count <= 0:
+            return
+        gen = self.generator
+        entries = gen.plan.entry_services
+        roots = self.rng.integers(0, len(entries), count)
+        timestamps = numpy.array([gen.clock() for _ in range(count)], dtype=numpy.int64)
+
+        # Traces that share an entry service share a call tree, so their draws form one rectangular batch
+        for index, root in enumerate(entries):
+            selected = roots == index
+            if selected.any():
+                self._generate_group(root, self._layout(root), timestamps[selected])
+        gen.stats.add('traces', count)
+
+    def _choose_calls(self, layout, traces):
+        """Boolean (traces, nodes) mask of the calls that happen in each trace"""
+        parents = layout.tree.parents
+        picked = numpy.ones((traces, layout.size), dtype=bool)
+        fan_out = self.generator.max_fan_out
+        for _, children in layout.fanned:
+            if fan_out <= 0:
+                picked[:, children] = False
+                continue
+            # Keep the fan_out children with the smallest random keys
+            keys = self.rng.random((traces, len(children)))
+            cutoff = numpy.partition(keys, fan_out - 1, axis=1)[:, fan_out - 1:fan_out]
+            picked[:, children] = keys <= cutoff
+
+        active = picked
+        for node in range(1, layout.size):
+            active[:, node] &= active[:, parents[node]]
+        return active
+
+    def _generate_group(self, root, layout, timestamps):
+        """Draw every random attribute of a group of traces at once, then emit their documents"""
+        gen = self.generator
+        rng = self.rng
+        traces = len(timestamps)
+        size = layout.size
+        shape = (traces, size)
+        tree = layout.tree
+        parents = tree.parents
+        wraps_transaction = layout.wraps_transaction
+
+        active = self._choose_calls(layout, traces)
+
+        # Durations bottom-up (ms): a caller waits for its calls one after another
+        gaps = rng.integers(1, 6, shape)
+        network = numpy.floor(rng.integers(5, 21, shape) * layout.multipliers) + rng.integers(1, 5, shape)
+        durations = numpy.where(
+            layout.leaves,
+            numpy.floor(rng.integers(layout.duration_low, layout.duration_high, shape) * layout.multipliers),
+            0.0
+        )
+        work = numpy.zeros(shape)
+        for node in range(size - 1, 0, -1):
+            if wraps_transaction[node]:
+                durations[:, node] = work[:, node] + network[:, node]
+            work[:, parents[node]] += numpy.where(active[:, node], durations[:, node] + gaps[:, node], 0)
+        durations[:, 0] = numpy.maximum(rng.integers(100, 801, traces) * layout.multipliers[0],
+                                        work[:, 0] + rng.integers(10, 51, traces))
+
+        # Offsets top-down (ms from trace start): each call starts where its previous sibling ended
+        offsets = numpy.zeros(shape)
+        network_time = numpy.zeros(shape)
+        cursor = numpy.zeros(shape)
+        cursor[:, 0] = 5  # Start 5ms after transaction
+        for node in range(1, size):
+            parent = parents[node]
+            offsets[:, node] = cursor[:, parent]
+            if wraps_transaction[node]:
+                network_time[:, node] = numpy.maximum(1, (durations[:, node] - work[:, node]) // 4)
+                cursor[:, node] = offsets[:, node] + network_time[:, node] + 1
+            cursor[:, parent] = numpy.where(active[:, node], offsets[:, node] + durations[:, node] + gaps[:, node],
+                                            cursor[:, parent])
+
+        span_counts = numpy.zeros(shape, dtype=numpy.int64)
+        for node in range(1, size):
+            span_counts[:, parents[node]] += active[:, node]
+
+        is_error = rng.random(traces) < gen._error_rate
+        span_error = is_error[:, None] & (rng.random(shape) < 0.3)  # Propagate some errors
+
+        if gen.end_us is not None:
+            # A trace that would run past the end of a backfill starts early enough to finish by then
+            timestamps = numpy.minimum(timestamps, gen.end_us - (durations[:, 0] * 1000).astype(numpy.int64))
+
+        # Everything below is converted to plain lists once, so the assembly loop only indexes Python objects
+        start = timestamps[:, None]
+        span_us = (start + (offsets * 1000).astype(numpy.int64)).tolist()
+        span_duration_us = (durations * 1000).astype(numpy.int64).tolist()
+        transaction_us = (start + ((offsets + network_time) * 1000).astype(numpy.int64)).tolist()
+        transaction_duration_us = ((durations - 2 * network_time) * 1000).astype(numpy.int64).tolist()
+        active = active.tolist()
+        span_counts = span_counts.tolist()
+        is_error = is_error.tolist()
+        span_error = span_error.tolist()
+        entities = gen.entities
+        if entities is None:
+            span_nodes = rng.integers(0, 3, shape).tolist()
+            transaction_nodes = rng.integers(0, 3, shape).tolist()
+            host_names = rng.integers(0, 5, (traces, size, 2)).tolist()
+            host_ips = rng.integers(1, 256, (traces, size, 4)).tolist()
+        else:
+            span_nodes = entities.pods.sample_array(rng, shape).tolist()
+            transaction_nodes = entities.pods.sample_array(rng, shape).tolist()
+            caller_hosts = entities.hosts.sample_array(rng, shape).tolist()
+            users = entities.users.sample_array(rng, traces).tolist()
+        statements = rng.integers(0, layout.statement_counts, shape).tolist()
+        transactions = rng.integers(0, len(root.transactions), traces).tolist()
+        if entities is None:
+            user_agents = rng.integers(0, len(gen.USER_AGENTS), traces).tolist()
+            client_ips = rng.integers((10, 1, 1, 1), (201, 256, 256, 256), (traces, 4)).tolist()
+
+        def instance(service, t, node):
+            """(node name, host, pooled instance) of the transaction a service records at one node"""
+            if entities is not None:
+                pod = entities.instance(service.name, transaction_nodes[t][node])
+                return pod.node_name, {'hostname': pod.host_name, 'name': pod.host_name, 'ip': pod.host_ip}, pod
+            names = host_names[t][node]
+            ips = host_ips[t][node]
+            return service.node_names[transaction_nodes[t][node]], {
+                'hostname': service.host_names[names[0]],
+                'name': service.host_names[names[1]],
+                'ip': f'10.0.{ips[0]}.{ips[1]}'
+            }, None
+
+        def span_node_name(caller, t, node):
+            if entities is not None:
+                return entities.instance(caller.name, span_nodes[t][node]).node_name
+            return caller.node_names[span_nodes[t][node]]
+
+        ids = gen.ids
+        index_transaction = gen._index_transaction
+        index_span = gen._index_span
+        services = tree.services
+        callers = tree.callers
+        for t in range(traces):
+            trace_id = ids.trace_id()
+            transaction_id = ids.span_id()
+            node_name, host, pod = instance(root, t, 0)
+            if entities is None:
+                index_transaction(
+                    root, trace_id, transaction_id, transaction_us[t][0], transaction_duration_us[t][0], is_error[t],
+                    span_counts[t][0], root.transactions[transactions[t]], node_name, host,
+                    '{}.{}.{}.{}'.format(*client_ips[t]), None, gen.USER_AGENTS[user_agents[t]]
+                )
+            else:
+                visitor = entities.visitor(users[t], transaction_us[t][0])
+                index_transaction(
+                    root, trace_id, transaction_id, transaction_us[t][0], transaction_duration_us[t][0], is_error[t],
+                    span_counts[t][0], root.transactions[transactions[t]], node_name, host, visitor.client_ip, None,
+                    visitor.user_agent, pod, visitor
+                )
+
+            # node -> id of the transaction its calls belong to
+            owners = [None] * size
+            owners[0] = transaction_id
+            trace_active = active[t]
+            for node in range(1, size):
+                if not trace_active[node]:
+                    continue
+                service = services[node]
+                caller = callers[node]
+                choices = layout.statements[node]
+                span_id = ids.span_id()
+                index_span(
+                    trace_id, owners[parents[node]], span_id, caller, service, span_us[t][node],
+                    span_duration_us[t][node], span_error[t][node], span_node_name(caller, t, node),
+                    choices[statements[t][node]] if choices else None
+                )
+
+                if wraps_transaction[node]:
+                    # The callee records its own transaction, parented to the caller's exit span
+                    node_name, host, pod = instance(service, t, node)
+                    if entities is None:
+                        ips = host_ips[t][node]
+                        client_ip = f'10.0.{ips[2]}.{ips[3]}'
+                    else:
+                        client_ip = entities.host_ip(caller_hosts[t][node])
+                    child_transaction_id = ids.span_id()
+                    index_transaction(
+                        service, trace_id, child_transaction_id, transaction_us[t][node],
+                        transaction_duration_us[t][node], span_error[t][node], span_counts[t][node],
+                        service.downstream_transaction, node_name, host, client_ip, span_id, None, pod
+                    )
+                    owners[node] = child_transaction_id
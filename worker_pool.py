@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Multi-process generation for the Observability Data Generator
+Shards the target event rate across worker processes to get past the GIL
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from backfill import BackfillRunner, split_time_range
+from fast_ids import now_us, parse_time_us
+from generator_enhanced import EnhancedObservabilityGenerator
+from rate_profiles import create_profile
+from rate_scheduler import RateScheduler
+from self_metrics import SelfMetricsReporter
+from sinks import bulk_options, create_sink
+from stats import RateWindows, sampler, window_rates
+
+# Counters each worker publishes into its row of the shared stats array
+STAT_FIELDS = (
+    'traces', 'logs', 'synthetics', 'apm_metrics', 'traces_sampled_out',
+    'docs_indexed', 'docs_failed', 'docs_pending',
+    'bulk_requests', 'bulk_errors', 'bulk_retries',
+    'docs_rejected', 'docs_retried',
+    'events_scheduled', 'events_dropped',
+    'simulated_seconds_covered'
+)
+
+# Fields with rolling rates in the pool's merged stats
+RATE_FIELDS = ('traces', 'logs', 'synthetics', 'docs_indexed', 'docs_failed', 'bulk_requests', 'bulk_errors')
+
+
+def split_rate(events_per_second, workers):
+    """Split a rate into equal per-worker shares that add up to the total, fractions included"""
+    return [events_per_second / workers] * workers
+
+
+def live_workers(events_per_second, workers):
+    """Worker count for a live run: at most one process per event/second (rounded up)"""
+    return max(1, min(workers, math.ceil(events_per_second)))
+
+
+def worker_sink_config(sink_config, worker_id):
+    """Give each worker its own output file (or dataset directory) so processes never share a handle"""
+    config = dict(sink_config or {'type': 'elasticsearch'})
+    path = config.get('path')
+    if config.get('type') == 'dataset' and path:
+        # One dataset per worker under the job's directory; the replayer reads them all
+        config['path'] = os.path.join(path, f'worker-{worker_id}')
+    elif config.get('type') == 'file' and path:
+        if '{worker}' in path:
+            config['path'] = path.format(worker=worker_id)
+        else:
+            root, ext = os.path.splitext(path)
+            if ext in ('.gz', '.zst'):
+                root, inner = os.path.splitext(root)
+                ext = inner + ext
+            config['path'] = f'{root}-{worker_id}{ext}'
+    return config
+
+
+def _publish(row, stats_array, stats, scheduler):
+    """Copy a generator and scheduler (or backfill runner) stats snapshot into the worker's row"""
+    if scheduler is not None:
+        stats = dict(stats, **scheduler.get_stats())
+    offset = row * len(STAT_FIELDS)
+    for i, field in enumerate(STAT_FIELDS):
+        stats_array[offset + i] = stats.get(field, 0)
+
+
+def _worker_main(worker_id, options, events_per_second, seed, stats_array, stop_event):
+    """Entry point of one worker process"""
+    # Each worker owns an independent random stream and a share of the (virtual) rate
+    generator_options = dict(options['generator_options'], seed=seed, events_per_second=events_per_second)
+
+    es_client = None
+    sink_config = worker_sink_config(options.get('sink'), worker_id)
+    if sink_config.get('type', 'elasticsearch') == 'elasticsearch' or options.get('engine') == 'async':
+        from elasticsearch import Elasticsearch
+        es_client = Elasticsearch(**options['es_config'])
+
+    duration_seconds = options['duration_seconds']
+    scheduler = None
+    backfill = options.get('backfill')
+    reporter = None
+
+    # Live workers follow the profile scaled to their share; backfill slices follow it from the overall start
+    profile = None
+    if options.get('rate_profile'):
+        if backfill:
+            profile = create_profile(options['rate_profile'], events_per_second, backfill['profile_start_us'])
+        else:
+            profile = create_profile(options['rate_profile'], options['total_rate'],
+                                     scale=events_per_second / options['total_rate'])
+
+    def start_reporter(generator, stats_source):
+        """Report this worker's own counters through its sink when self-metrics are on"""
+        if not options.get('self_metrics_interval'):
+            return None
+        labels = {'industry': options['industry'], 'worker': str(worker_id)}
+        reporter = SelfMetricsReporter(generator.sink, stats_source, options['self_metrics_interval'], labels)
+        reporter.start()
+        return reporter
+
+    if options.get('engine') == 'async':
+        from elasticsearch import AsyncElasticsearch
+        from async_engine import AsyncBulkSink, AsyncGenerationEngine
+
+        generator = EnhancedObservabilityGenerator(es_client, options['industry'], scenario=options.get('scenario'),
+                                                   sink=AsyncBulkSink(**bulk_options(sink_config)),
+                                                   **generator_options)
+
+        async def run():
+            client = AsyncElasticsearch(**options['es_config'])
+            engine = AsyncGenerationEngine(generator, client, concurrency=options.get('concurrency', 4),
+                                           max_catchup_seconds=options.get('max_catchup_seconds', 2.0),
+                                           rate_profile=None if backfill else profile)
+            runner = None
+            if backfill:
+                runner = BackfillRunner(generator, backfill['start_us'] / 1000000, backfill['end_us'] / 1000000,
+                                        events_per_second=events_per_second)
+                if profile:
+                    runner.set_profile(profile, backfill['profile_start_us'])
+            reporter = start_reporter(generator, lambda: dict(generator.get_stats(),
+                                                               **(runner or engine).get_stats()))
+
+            async def watch():
+                while True:
+                    _publish(worker_id, stats_array, generator.get_stats(), runner or engine.scheduler)
+                    if stop_event.is_set():
+                        engine.stop()
+                    await asyncio.sleep(0.5)
+
+            watcher = asyncio.create_task(watch())
+            try:
+                if runner:
+                    await runner.run_async(engine)
+                else:
+                    await engine.run(events_per_second, duration_seconds)
+            finally:
+                watcher.cancel()
+                if reporter:
+                    reporter.stop(final_report=False)
+                await client.close()
+                _publish(worker_id, stats_array, generator.get_stats(), runner or engine.scheduler)
+
+        asyncio.run(run())
+        return
+
+    generator = EnhancedObservabilityGenerator(es_client, options['industry'], scenario=options.get('scenario'),
+                                               sink=create_sink(sink_config, es_client),
+                                               **generator_options)
+    if backfill:
+        scheduler = BackfillRunner(generator, backfill['start_us'] / 1000000, backfill['end_us'] / 1000000,
+                                   events_per_second=events_per_second)
+        if profile:
+            scheduler.set_profile(profile, backfill['profile_start_us'])
+        reporter = start_reporter(generator, lambda: dict(generator.get_stats(), **scheduler.get_stats()))
+        scheduler.run(should_stop=stop_event.is_set,
+                      on_progress=lambda: _publish(worker_id, stats_array, generator.get_stats(), scheduler))
+        if reporter:
+            reporter.stop(final_report=False)
+    else:
+        scheduler = RateScheduler(events_per_second, max_catchup_seconds=options.get('max_catchup_seconds', 2.0),
+                                  profile=profile)
+        reporter = start_reporter(generator, lambda: dict(generator.get_stats(), **scheduler.get_stats()))
+        end_time = time.monotonic() + duration_seconds
+        next_publish = 0
+        while time.monotonic() < end_time and not stop_event.is_set():
+            count = scheduler.wait()
+            if count:
+                generator.generate_batch(count)
+            if time.monotonic() >= next_publish:
+                _publish(worker_id, stats_array, generator.get_stats(), scheduler)
+                next_publish = time.monotonic() + 0.5
+        if reporter:
+            reporter.stop()
+        generator.close()
+
+    _publish(worker_id, stats_array, generator.get_stats(), scheduler)
+
+
+class GenerationWorkerPool:
+    """Runs one generator per process, each producing a share of the target events/sec"""
+
+    def __init__(self, industry, events_per_second, workers=None, scenario=None,
+                 es_config=None, sink_config=None, engine='sync', concurrency=4, seed=None,
+                 max_catchup_seconds=2.0, generator_options=None, backfill=None, self_metrics_interval=None,
+                 rate_profile=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.events_per_second = events_per_second
+        self.options = {
+            'industry': industry,
+            'scenario': scenario,
+            'es_config': es_config,
+            'sink': sink_config,
+            'engine': engine,
+            'concurrency': concurrency,
+            'max_catchup_seconds': max_catchup_seconds,
+            'generator_options': generator_options or {},
+            'self_metrics_interval': self_metrics_interval,
+            'rate_profile': rate_profile,
+            'total_rate': events_per_second
+        }
+        # Backfills split the time range instead of the rate
+        self.backfill = None
+        if backfill:
+            start_us = parse_time_us(backfill['start_time'])
+            end_us = parse_time_us(backfill['end_time']) if backfill.get('end_time') else now_us()
+            if end_us <= start_us:
+                raise ValueError('Backfill end_time must be after start_time')
+            self.backfill = {'start_us': start_us, 'end_us': end_us}
+        # Fail here rather than in every worker when the profile is invalid
+        profile = create_profile(rate_profile, events_per_second)
+        if not self.backfill:
+            # Live runs split the rate, so extra processes would only get slivers of it; pools cannot be
+            # resized, so they are sized for the highest rate the profile reaches
+            peak_rate = max(events_per_second, profile.peak_rate()) if profile else events_per_second
+            self.workers = live_workers(peak_rate, self.workers)
+
+        # Every worker gets its own seed so processes never replay the same random stream
+        base_seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.seeds = [base_seed + i for i in range(self.workers)]
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._stats = self._ctx.Array('q', self.workers * len(STAT_FIELDS), lock=False)
+        self._stop_event = self._ctx.Event()
+        self._processes = []
+        self._rates = RateWindows()
+        self.start_time = None
+
+    def start(self, duration_seconds):
+        """Launch the worker processes"""
+        self.start_time = time.time()
+        if self.backfill:
+            # Each worker covers its own slice of the time range at the full simulated rate
+            slices = split_time_range(self.backfill['start_us'], self.backfill['end_us'], self.workers)
+            assignments = [(self.events_per_second, {'start_us': start, 'end_us': end,
+                                                     'profile_start_us': self.backfill['start_us']})
+                           for start, end in slices]
+        else:
+            assignments = [(rate, None) for rate in split_rate(self.events_per_second, self.workers)]
+
+        for worker_id, (rate, backfill) in enumerate(assignments):
+            options = dict(self.options, duration_seconds=duration_seconds, backfill=backfill)
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_id, options, rate, self.seeds[worker_id], self._stats, self._stop_event),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+    def stop(self):
+        """Ask every worker to flush and exit"""
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        """Wait for all workers to exit"""
+        for process in self._processes:
+            process.join(timeout)
+
+    def is_alive(self):
+        """True while any worker is still running"""
+        return any(process.is_alive() for process in self._processes)
+
+    def _totals(self):
+        """Sum of every worker's row in the shared stats array"""
+        totals = dict.fromkeys(STAT_FIELDS, 0)
+        for row in range(self.workers):
+            offset = row * len(STAT_FIELDS)
+            for i, field in enumerate(STAT_FIELDS):
+                totals[field] += self._stats[offset + i]
+        return totals
+
+    def sample(self):
+        """Record the merged totals for the rate windows"""
+        totals = self._totals()
+        self._rates.sample({field: totals[field] for field in RATE_FIELDS})
+
+    def get_stats(self):
+        """Aggregate the counters of all workers, with rolling rates of the merged totals"""
+        sampler.register(self)
+        totals = self._totals()
+        rates = self._rates.rates({field: totals[field] for field in RATE_FIELDS})
+
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        totals['elapsed_seconds'] = int(elapsed)
+        totals['traces_per_second'] = rates[10]['traces']
+        totals['traces_per_second_average'] = round(totals['traces'] / elapsed, 2) if elapsed > 0 else 0
+        totals['rates'] = {field: window_rates(rates, field) for field in RATE_FIELDS}
+        totals['target_rate'] = self.events_per_second
+        totals['average_rate'] = round(totals['events_scheduled'] / elapsed, 2) if elapsed > 0 else 0
+        if self.backfill:
+            total = (self.backfill['end_us'] - self.backfill['start_us']) / 1000000
+            totals['backfill_progress_percent'] = round(100 * totals['simulated_seconds_covered'] / total, 2)
+            totals['simulated_seconds_per_second'] = (round(totals['simulated_seconds_covered'] / elapsed, 2)
+                                                      if elapsed > 0 else 0)
+        totals['workers'] = self.workers
+        totals['workers_alive'] = sum(1 for process in self._processes if process.is_alive())
+        return totals